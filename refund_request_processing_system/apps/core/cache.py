@@ -0,0 +1,234 @@
+import threading
+import time
+import uuid
+import weakref
+from collections import OrderedDict
+from logging import getLogger
+
+from django.conf import settings
+from redis import Redis
+
+logger = getLogger('django')
+
+
+class LocalCacheStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def increment(self, name):
+        with self.lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def as_dict(self):
+        with self.lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+            }
+
+
+class TieredCache:
+    # In-process LRU cache in front of a shared Django cache
+    _instances = weakref.WeakSet()
+
+    def __init__(
+        self,
+        cache,
+        name,
+        max_size=None,
+        local_timeout=None,
+        broadcast_invalidations=None,
+    ):
+        self.cache = cache
+        self.name = name
+        self.max_size = max_size or settings.LOCAL_CACHE_MAX_SIZE
+        self.local_timeout = local_timeout or settings.LOCAL_CACHE_TIMEOUT
+        if broadcast_invalidations is None:
+            broadcast_invalidations = (
+                settings.LOCAL_CACHE_BROADCAST_INVALIDATIONS
+            )
+        self.broadcast_invalidations = broadcast_invalidations
+
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.stats = LocalCacheStats()
+
+        self.channel = f'local-cache-invalidation:{name}'
+        self.sender_id = uuid.uuid4().hex
+        self._redis_client = None
+        self._listener = None
+
+        self._instances.add(self)
+
+    @classmethod
+    def clear_all_local(cls):
+        for instance in list(cls._instances):
+            instance.clear_local()
+
+    def get(self, key, default=None):
+        found, value = self.get_local(key)
+        if found:
+            return value
+
+        value = self.cache.get(key, self)
+        if value is self:
+            return default
+
+        self.set_local(key, value)
+        return value
+
+    async def aget(self, key, default=None):
+        found, value = self.get_local(key)
+        if found:
+            return value
+
+        value = await self.cache.aget(key, self)
+        if value is self:
+            return default
+
+        self.set_local(key, value)
+        return value
+
+    def get_many(self, keys):
+        results, remote_keys = self._get_many_local(keys)
+        if remote_keys:
+            results.update(
+                self._set_many_local(self.cache.get_many(remote_keys))
+            )
+        return results
+
+    async def aget_many(self, keys):
+        results, remote_keys = self._get_many_local(keys)
+        if remote_keys:
+            results.update(
+                self._set_many_local(await self.cache.aget_many(remote_keys))
+            )
+        return results
+
+    def set(self, key, value, timeout):
+        self.cache.set(key, value, timeout)
+        self.set_local(key, value, timeout)
+        self.publish_invalidation(key)
+
+    async def aset(self, key, value, timeout):
+        await self.cache.aset(key, value, timeout)
+        self.set_local(key, value, timeout)
+        self.publish_invalidation(key)
+
+    def delete(self, key):
+        self.cache.delete(key)
+        self.delete_local(key)
+        self.publish_invalidation(key)
+
+    def _get_many_local(self, keys):
+        results = {}
+        remote_keys = []
+        for key in keys:
+            found, value = self.get_local(key)
+            if found:
+                results[key] = value
+            else:
+                remote_keys.append(key)
+        return results, remote_keys
+
+    def _set_many_local(self, remote_results):
+        for key, value in remote_results.items():
+            self.set_local(key, value)
+        return remote_results
+
+    def get_local(self, key):
+        self.start_listener()
+        with self.lock:
+            if key not in self.entries:
+                self.stats.increment('misses')
+                return False, None
+
+            value, expires_at = self.entries[key]
+            if expires_at <= time.monotonic():
+                del self.entries[key]
+                self.stats.increment('expirations')
+                self.stats.increment('misses')
+                return False, None
+
+            self.entries.move_to_end(key)
+            self.stats.increment('hits')
+            return True, value
+
+    def set_local(self, key, value, timeout=None):
+        local_timeout = self.local_timeout
+        if timeout is not None:
+            local_timeout = min(local_timeout, timeout)
+
+        with self.lock:
+            self.entries[key] = (value, time.monotonic() + local_timeout)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.stats.increment('evictions')
+
+    def delete_local(self, key):
+        with self.lock:
+            return self.entries.pop(key, None) is not None
+
+    def clear_local(self):
+        with self.lock:
+            self.entries.clear()
+
+    def get_stats(self):
+        with self.lock:
+            size = len(self.entries)
+        return self.stats.as_dict() | {'size': size, 'max_size': self.max_size}
+
+    def get_redis_client(self):
+        if self._redis_client is None:
+            self._redis_client = Redis.from_url(
+                settings.REDIS_CACHE['LOCATION']
+            )
+        return self._redis_client
+
+    def publish_invalidation(self, key):
+        if not self.broadcast_invalidations:
+            return
+
+        try:
+            self.get_redis_client().publish(
+                self.channel, f'{self.sender_id}:{key}'
+            )
+        except Exception as e:
+            logger.exception(e)
+
+    def handle_invalidation(self, message):
+        data = message['data']
+        if isinstance(data, bytes):
+            data = data.decode()
+
+        sender_id, _, key = data.partition(':')
+        if sender_id != self.sender_id and self.delete_local(key):
+            self.stats.increment('invalidations')
+
+    def start_listener(self):
+        if not self.broadcast_invalidations or self._listener is not None:
+            return
+
+        with self.lock:
+            if self._listener is not None:
+                return
+
+            try:
+                pubsub = self.get_redis_client().pubsub(
+                    ignore_subscribe_messages=True
+                )
+                pubsub.subscribe(**{self.channel: self.handle_invalidation})
+                self._listener = pubsub.run_in_thread(sleep_time=1, daemon=True)
+            except Exception as e:
+                # Without the listener the local tier only relies on its TTL
+                logger.exception(e)
+                self.broadcast_invalidations = False
@@ -0,0 +1,116 @@
+import time
+from logging import getLogger
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+
+logger = getLogger('django')
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    # The state is kept in the shared cache, so all worker processes share it
+    def __init__(
+        self,
+        name,
+        failure_rate_threshold,
+        slow_call_threshold,
+        min_calls,
+        window,
+        open_timeout,
+    ):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.slow_call_threshold = slow_call_threshold
+        self.min_calls = min_calls
+        self.window = window
+        self.open_timeout = open_timeout
+
+        self.key_prefix = f'circuit-breaker:{name}'
+        self.open_until_key = f'{self.key_prefix}:open-until'
+        self.probe_key = f'{self.key_prefix}:probe'
+
+    def get_state(self):
+        open_until = cache.get(self.open_until_key)
+        if open_until is None:
+            return self.CLOSED
+        if time.time() < open_until:
+            return self.OPEN
+        return self.HALF_OPEN
+
+    def allow_request(self):
+        # Returns the state to be passed to `record`, or None to skip the call
+        state = self.get_state()
+        if state == self.OPEN or (
+            state == self.HALF_OPEN
+            and not cache.add(self.probe_key, True, self.open_timeout)
+        ):
+            return None
+        return state
+
+    async def aallow_request(self):
+        return await sync_to_async(self.allow_request, thread_sensitive=False)()
+
+    def record(self, latency, failed, state=CLOSED):
+        failed = failed or latency >= self.slow_call_threshold
+
+        if state == self.HALF_OPEN:
+            # Result of the probe call
+            if failed:
+                self.open()
+            else:
+                self.close()
+            return
+
+        if self.get_state() != self.CLOSED:
+            # Result of a call started before the circuit opened
+            return
+
+        calls, failures = self._count_call(failed)
+        if (
+            calls >= self.min_calls
+            and failures / calls >= self.failure_rate_threshold
+        ):
+            self.open()
+
+    async def arecord(self, latency, failed, state=CLOSED):
+        await sync_to_async(self.record, thread_sensitive=False)(
+            latency, failed, state
+        )
+
+    def open(self):
+        cache.set(self.open_until_key, time.time() + self.open_timeout, None)
+        cache.delete(self.probe_key)
+        logger.warning(
+            f'Circuit breaker {self.name} opened for {self.open_timeout} s.'
+        )
+
+    def close(self):
+        window_keys = self._get_window_keys()
+        cache.delete_many(
+            [self.open_until_key, self.probe_key, *window_keys.values()]
+        )
+        logger.info(f'Circuit breaker {self.name} closed.')
+
+    def _get_window_keys(self):
+        window_start = int(time.time() // self.window)
+        return {
+            'calls': f'{self.key_prefix}:{window_start}:calls',
+            'failures': f'{self.key_prefix}:{window_start}:failures',
+        }
+
+    def _count_call(self, failed):
+        window_keys = self._get_window_keys()
+        counts = {}
+        for name, key in window_keys.items():
+            if name == 'failures' and not failed:
+                counts[name] = cache.get(key, 0)
+                continue
+
+            cache.add(key, 0, self.window * 2)
+            counts[name] = cache.incr(key)
+
+        return counts['calls'], counts['failures']
@@ -1,16 +1,130 @@
+import functools
+import re
+from datetime import timedelta
+from logging import getLogger
+
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.core.mail import EmailMultiAlternatives
-from django.db import models
-from django.template.loader import render_to_string
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import models, transaction
+from django.db.models import Count, F, Q, prefetch_related_objects
+from django.template.loader import get_template
 from django.utils import timezone
+from django.utils.html import conditional_escape
+
+from apps.core.enums import EmailPriority
+
+logger = getLogger('django')
+
+
+def get_outbox_index(name):
+    return models.Index(
+        fields=['priority', 'next_attempt_at'],
+        name=name,
+        condition=Q(sent_at__isnull=True, dead_at__isnull=True),
+    )
+
+
+PLACEHOLDER_PATTERN = re.compile(r'\[\[personal:(\w+)\]\]')
+
+
+@functools.lru_cache(maxsize=settings.EMAIL_TEMPLATE_CACHE_SIZE)
+def render_email_skeleton(template_name, shared_context, personal_fields):
+    # Returns literal parts alternating with personal field names, or None
+    # if any field isn't output as it is (e.g. is changed by a filter)
+    context = dict(shared_context) | {
+        field: f'[[personal:{field}]]' for field in personal_fields
+    }
+    parts = PLACEHOLDER_PATTERN.split(
+        get_template(template_name).render(context)
+    )
+    if set(parts[1::2]) != set(personal_fields) or any(
+        '[[' in part for part in parts[::2]
+    ):
+        return None
+    return parts
+
+
+def render_email_template(template_name, shared_context, personal_context):
+    # Empty fields could take other branches of `if` tags
+    parts = None
+    if not settings.DEBUG and all(personal_context.values()):
+        parts = render_email_skeleton(
+            template_name,
+            tuple(sorted(shared_context.items())),
+            tuple(sorted(personal_context)),
+        )
+    if parts is None:
+        return get_template(template_name).render(
+            shared_context | personal_context
+        )
+
+    return ''.join(
+        (
+            part
+            if index % 2 == 0
+            else str(conditional_escape(personal_context[part]))
+        )
+        for index, part in enumerate(parts)
+    )
+
+
+def get_relay_connection(relay):
+    return get_connection(**settings.EMAIL_RELAYS[relay].get('options', {}))
+
+
+class EmailSender:
+    # Restarts the SMTP session after every `batch_size` messages
+    def __init__(self, connection=None, batch_size=None):
+        self.connection = connection or get_connection()
+        self.batch_size = batch_size or settings.EMAIL_SEND_BATCH_SIZE
+        self.session_message_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def send(self, messages):
+        try:
+            while messages:
+                if self.session_message_count >= self.batch_size:
+                    self.close()
+                # Opening an already open connection does nothing
+                self.connection.open()
+
+                batch_size = self.batch_size - self.session_message_count
+                self.connection.send_messages(messages[:batch_size])
+                self.session_message_count += len(messages[:batch_size])
+                messages = messages[batch_size:]
+        except Exception:
+            # The session may be broken, so the next messages start a new one
+            self.close()
+            raise
+
+    def close(self):
+        self.connection.close()
+        self.session_message_count = 0
 
 
 class BaseEmailMessage(models.Model):
+    # Outbox of emails sent by the `send_emails` worker
     recipients = models.ManyToManyField(User)
     sent_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    dead_at = models.DateTimeField(null=True, blank=True)
+    # Emails with lower values are sent first (see EmailPriority)
+    priority = models.PositiveSmallIntegerField(default=EmailPriority.NORMAL)
 
     from_email = settings.DEFAULT_FROM_EMAIL
+    # Key of EMAIL_RELAYS, which sets the connection and the rate limit
+    relay = 'default'
+    # Relations used by the email subject and context
+    select_related_fields = ()
+    prefetch_related_fields = ()
     cc = None
     bcc = None
 
@@ -22,15 +136,56 @@ class BaseEmailMessage(models.Model):
     def subject(self):
         raise NotImplementedError
 
-    def get_email_context(self, user):
+    def get_shared_context(self):
+        # Context which is the same for many emails, e.g. the new status
+        return {}
+
+    def get_personal_context(self, user):
         raise NotImplementedError
 
+    def get_email_context(self, user):
+        return self.get_shared_context() | self.get_personal_context(user)
+
     def send(self):
-        for user in self.recipients.all():
-            email_context = self.get_email_context(user)
+        with EmailSender(get_relay_connection(self.relay)) as sender:
+            self.deliver(sender)
+        self.sent_at = timezone.now()
+        self.save(update_fields=["sent_at"])
+
+    def deliver(self, sender):
+        sender.send(self.get_email_messages())
+
+    @classmethod
+    def send_many(cls, email_messages):
+        # Returns errors of the emails (None if delivered) in order
+        errors = cls.deliver_many(email_messages)
+        cls.mark_sent(
+            [
+                email_message
+                for email_message, error in zip(email_messages, errors)
+                if error is None
+            ]
+        )
+        return errors
 
-            txt_content = self.get_txt_content(email_context)
-            html_content = self.get_html_content(email_context)
+    @classmethod
+    def deliver_many(cls, email_messages):
+        errors = []
+        with EmailSender(get_relay_connection(cls.relay)) as sender:
+            for email_message in email_messages:
+                try:
+                    email_message.deliver(sender)
+                except Exception as e:
+                    errors.append(e)
+                else:
+                    errors.append(None)
+        return errors
+
+    def get_email_messages(self):
+        email_messages = []
+        for user in self.recipients.all():
+            txt_content = self.get_txt_content(user)
+            html_content = self.get_html_content(user)
 
             email = EmailMultiAlternatives(
                 subject=self.subject,
@@ -41,17 +196,129 @@ class BaseEmailMessage(models.Model):
                 bcc=self.bcc,
             )
             email.attach_alternative(html_content, "text/html")
+            email_messages.append(email)
+        return email_messages
 
-            email.send()
+    @classmethod
+    def bulk_create_with_recipients(cls, email_messages, recipient_ids):
+        email_messages = cls.objects.bulk_create(email_messages)
 
-        self.sent_at = timezone.now()
-        self.save(update_fields=["sent_at"])
+        through_model = cls.recipients.through
+        email_message_field = f'{cls.recipients.field.m2m_field_name()}_id'
+        user_field = f'{cls.recipients.field.m2m_reverse_field_name()}_id'
+        through_model.objects.bulk_create(
+            through_model(
+                **{email_message_field: email_message.pk, user_field: user_id}
+            )
+            for email_message, user_ids in zip(email_messages, recipient_ids)
+            for user_id in user_ids
+        )
+        return email_messages
+
+    @classmethod
+    def get_pending(cls):
+        return cls.objects.filter(
+            sent_at__isnull=True,
+            dead_at__isnull=True,
+            next_attempt_at__lte=timezone.now(),
+        )
+
+    @classmethod
+    def get_due_priorities(cls):
+        return list(
+            cls.get_pending()
+            .values_list('priority', flat=True)
+            .distinct()
+            .order_by('priority')
+        )
+
+    @classmethod
+    def get_queue_stats(cls):
+        queue_stats = {
+            priority.name.lower(): {'due': 0, 'scheduled': 0}
+            for priority in EmailPriority
+        }
+        now = timezone.now()
+        for priority, due, scheduled in (
+            cls.objects.filter(sent_at__isnull=True, dead_at__isnull=True)
+            .values_list('priority')
+            .annotate(
+                due=Count('pk', filter=Q(next_attempt_at__lte=now)),
+                scheduled=Count('pk', filter=Q(next_attempt_at__gt=now)),
+            )
+            .order_by()
+        ):
+            queue_stats[EmailPriority(priority).name.lower()] = {
+                'due': due,
+                'scheduled': scheduled,
+            }
+        queue_stats['dead'] = cls.objects.filter(dead_at__isnull=False).count()
+        return queue_stats
+
+    @classmethod
+    def claim_pending(cls, batch_size, priority=None):
+        # Claimed emails are retried after the timeout if the worker died
+        claimed_until = timezone.now() + timedelta(
+            seconds=settings.EMAIL_OUTBOX_CLAIM_TIMEOUT
+        )
+        with transaction.atomic():
+            pending = cls.get_pending()
+            if priority is not None:
+                pending = pending.filter(priority=priority)
+            email_messages = list(
+                pending.select_related(*cls.select_related_fields)
+                .select_for_update(skip_locked=True, of=('self',))
+                .order_by('priority', 'next_attempt_at')[:batch_size]
+            )
+            cls.objects.filter(
+                pk__in=[email_message.pk for email_message in email_messages]
+            ).update(attempts=F('attempts') + 1, next_attempt_at=claimed_until)
+
+        for email_message in email_messages:
+            email_message.attempts += 1
+            email_message.next_attempt_at = claimed_until
+        prefetch_related_objects(
+            email_messages, 'recipients', *cls.prefetch_related_fields
+        )
+        return email_messages
+
+    @classmethod
+    def mark_sent(cls, email_messages):
+        cls.objects.filter(
+            pk__in=[email_message.pk for email_message in email_messages]
+        ).update(sent_at=timezone.now())
+
+    def record_failure(self, error):
+        self.last_error = str(error)
+        if self.attempts >= settings.EMAIL_OUTBOX_MAX_ATTEMPTS:
+            self.dead_at = timezone.now()
+            logger.error(
+                f'Sending {self._meta.label} #{self.pk} failed '
+                f'{self.attempts} times, giving up: {error}'
+            )
+        else:
+            self.next_attempt_at = timezone.now() + timedelta(
+                seconds=settings.EMAIL_OUTBOX_RETRY_BACKOFF
+                * 2 ** (self.attempts - 1)
+            )
+            logger.warning(
+                f'Sending {self._meta.label} #{self.pk} failed, retrying at '
+                f'{self.next_attempt_at}: {error}'
+            )
+        self.save(update_fields=['last_error', 'dead_at', 'next_attempt_at'])
+
+    def get_txt_content(self, user):
+        return self.get_content(f"{self.template_name}.txt", user)
 
-    def get_txt_content(self, context):
-        return render_to_string(f"{self.template_name}.txt", context)
+    def get_html_content(self, user):
+        return self.get_content(f"{self.template_name}.html", user)
 
-    def get_html_content(self, context):
-        return render_to_string(f"{self.template_name}.html", context)
+    def get_content(self, template_name, user):
+        return render_email_template(
+            template_name,
+            self.get_shared_context(),
+            self.get_personal_context(user),
+        )
 
     class Meta:
         abstract = True
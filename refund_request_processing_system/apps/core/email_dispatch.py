@@ -0,0 +1,201 @@
+import math
+import time
+from collections import defaultdict
+from logging import getLogger
+
+from django.conf import settings
+from django.core.cache import cache
+
+logger = getLogger('django')
+
+
+class TokenBucket:
+    # The state is kept in the shared cache, so all worker processes share it
+    LOCK_TIMEOUT = 5
+
+    def __init__(self, name, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+
+        self.key = f'token-bucket:{name}'
+        self.lock_key = f'{self.key}:lock'
+
+    def acquire(self, count):
+        # Returns 0 when the bucket is empty or used by another process
+        if not cache.add(self.lock_key, True, self.LOCK_TIMEOUT):
+            return 0
+
+        try:
+            tokens = self._get_tokens()
+            granted = min(count, math.floor(tokens))
+            cache.set(self.key, (tokens - granted, time.time()), None)
+            return granted
+        finally:
+            cache.delete(self.lock_key)
+
+    def release(self, count):
+        if count <= 0 or not cache.add(self.lock_key, True, self.LOCK_TIMEOUT):
+            return
+
+        try:
+            tokens = min(self.capacity, self._get_tokens() + count)
+            cache.set(self.key, (tokens, time.time()), None)
+        finally:
+            cache.delete(self.lock_key)
+
+    def get_wait_time(self):
+        # Seconds until the next token is available
+        return max(0, (1 - self._get_tokens()) / self.rate)
+
+    def _get_tokens(self):
+        tokens, updated_at = cache.get(self.key, (self.capacity, time.time()))
+        return min(
+            self.capacity, tokens + (time.time() - updated_at) * self.rate
+        )
+
+
+class DispatchStats:
+    STATS_WINDOW = 15
+
+    def __init__(self, relay):
+        self.key_prefix = f'email-dispatch:{relay}'
+
+    def increment(self, name, delta=1):
+        if not delta:
+            return
+        key = f'{self.key_prefix}:{int(time.time() // 60)}:{name}'
+        cache.add(key, 0, (self.STATS_WINDOW + 1) * 60)
+        cache.incr(key, delta)
+
+    def get_counts(self, name, minutes):
+        current_minute = int(time.time() // 60)
+        keys = [
+            f'{self.key_prefix}:{minute}:{name}'
+            for minute in range(
+                current_minute - minutes + 1, current_minute + 1
+            )
+        ]
+        return sum(cache.get_many(keys).values())
+
+    def as_dict(self):
+        return {
+            'sent_last_minute': self.get_counts('sent', 1),
+            'failed_last_minute': self.get_counts('failed', 1),
+            'throttled_last_minute': self.get_counts('throttled', 1),
+            'sent_per_minute': self.get_counts('sent', self.STATS_WINDOW)
+            / self.STATS_WINDOW,
+        }
+
+
+class EmailDispatcher:
+    def __init__(
+        self, email_models, batch_size, executor, concurrency, log=logger.info
+    ):
+        self.log = log
+        self.batch_size = batch_size
+        self.executor = executor
+        self.concurrency = concurrency
+
+        self.relay_models = defaultdict(list)
+        for model in email_models:
+            self.relay_models[model.relay].append(model)
+
+    @staticmethod
+    def get_bucket(relay):
+        relay_settings = settings.EMAIL_RELAYS[relay]
+        return TokenBucket(
+            f'email-relay:{relay}',
+            relay_settings['rate_per_minute'] / 60,
+            relay_settings['burst'],
+        )
+
+    def dispatch(self):
+        # Returns seconds until more emails can be sent, or None if none are due
+        wait_times = []
+        for relay, models in self.relay_models.items():
+            bucket = self.get_bucket(relay)
+            stats = DispatchStats(relay)
+            while tokens := bucket.acquire(self.batch_size):
+                sent_count = self.dispatch_relay(models, tokens, stats)
+                bucket.release(tokens - sent_count)
+                if sent_count < tokens:
+                    break
+            else:
+                # Throttled, unless the bucket was empty with nothing due
+                if self.has_pending(models):
+                    stats.increment('throttled')
+                    wait_times.append(bucket.get_wait_time())
+
+        return max(wait_times, default=None)
+
+    def dispatch_relay(self, models, tokens, stats):
+        # One token is used per email, regardless of the recipients number
+        due_priorities = {model: model.get_due_priorities() for model in models}
+        sent_count = 0
+        for priority in sorted(set().union(*due_priorities.values())):
+            for model in models:
+                if priority not in due_priorities[model]:
+                    continue
+                while sent_count < tokens:
+                    claim_size = tokens - sent_count
+                    email_messages = model.claim_pending(
+                        claim_size, priority=priority
+                    )
+                    if email_messages:
+                        self.send(model, email_messages, stats)
+                        sent_count += len(email_messages)
+                    if len(email_messages) < claim_size:
+                        break
+        return sent_count
+
+    def send(self, model, email_messages, stats):
+        chunk_size = math.ceil(len(email_messages) / self.concurrency)
+        errors = [
+            error
+            for chunk_errors in self.executor.map(
+                model.deliver_many,
+                [
+                    email_messages[start : start + chunk_size]
+                    for start in range(0, len(email_messages), chunk_size)
+                ],
+            )
+            for error in chunk_errors
+        ]
+
+        sent_email_messages = []
+        for email_message, error in zip(email_messages, errors):
+            if error is None:
+                sent_email_messages.append(email_message)
+            else:
+                email_message.record_failure(error)
+        model.mark_sent(sent_email_messages)
+
+        failed_count = len(email_messages) - len(sent_email_messages)
+        stats.increment('sent', len(sent_email_messages))
+        stats.increment('failed', failed_count)
+        self.log(
+            f'{model._meta.verbose_name_plural}: '
+            f'sent {len(sent_email_messages)}, failed {failed_count}.'
+        )
+        return sent_email_messages
+
+    @staticmethod
+    def has_pending(models):
+        return any(model.get_pending().exists() for model in models)
+
+    @classmethod
+    def get_stats(cls, email_models):
+        relay_stats = {}
+        for model in email_models:
+            relay = relay_stats.setdefault(
+                model.relay,
+                DispatchStats(model.relay).as_dict()
+                | {
+                    'available_tokens': math.floor(
+                        cls.get_bucket(model.relay)._get_tokens()
+                    ),
+                    'queues': {},
+                },
+            )
+            relay['queues'][model._meta.label] = model.get_queue_stats()
+        return relay_stats
@@ -0,0 +1,39 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from apps.core.email_dispatch import EmailDispatcher
+from apps.core.management.commands.send_emails import get_email_models
+
+
+class Command(BaseCommand):
+    help = 'Shows email outbox queue depths and send rates per relay.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--json', action='store_true', help='Output stats as JSON.'
+        )
+
+    def handle(self, *args, **options):
+        stats = EmailDispatcher.get_stats(get_email_models())
+
+        if options['json']:
+            self.stdout.write(json.dumps(stats, indent=2))
+            return
+
+        for relay, relay_stats in stats.items():
+            self.stdout.write(
+                f'Relay {relay}: '
+                f'{relay_stats["sent_per_minute"]:.1f} sent/min '
+                f'(last minute: {relay_stats["sent_last_minute"]} sent, '
+                f'{relay_stats["failed_last_minute"]} failed, '
+                f'throttled {relay_stats["throttled_last_minute"]} times), '
+                f'{relay_stats["available_tokens"]} tokens available'
+            )
+            for label, queue_stats in relay_stats['queues'].items():
+                self.stdout.write(
+                    f'  {label}: '
+                    + ', '.join(
+                        f'{name} {count}' for name, count in queue_stats.items()
+                    )
+                )
@@ -0,0 +1,62 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.core.email import BaseEmailMessage
+from apps.core.email_dispatch import EmailDispatcher
+
+
+def get_email_models():
+    return [
+        model
+        for model in apps.get_models()
+        if issubclass(model, BaseEmailMessage)
+    ]
+
+
+class Command(BaseCommand):
+    help = 'Sends pending emails from the outbox.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Send pending emails once and exit, instead of polling.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.EMAIL_OUTBOX_BATCH_SIZE,
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=settings.EMAIL_OUTBOX_CONCURRENCY,
+        )
+
+    def handle(self, *args, **options):
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            dispatcher = EmailDispatcher(
+                get_email_models(),
+                options['batch_size'],
+                executor,
+                options['concurrency'],
+                log=self.stdout.write,
+            )
+            while True:
+                wait_time = dispatcher.dispatch()
+                if options['once']:
+                    return
+
+                close_old_connections()
+                # Throttled relays are retried as soon as they have tokens
+                poll_interval = settings.EMAIL_OUTBOX_POLL_INTERVAL
+                time.sleep(
+                    poll_interval
+                    if wait_time is None
+                    else min(wait_time, poll_interval)
+                )
@@ -2,6 +2,8 @@ from django import forms
 from django.conf import settings
 from redis import Redis
 
+from apps.core.cache import TieredCache
+
 
 class BootstrapFormMixin:
     template_name_div = "forms/bootstrap_div.html"
@@ -38,3 +40,4 @@ class FlushRedisDBTestMixin:
     def setUp(self):
         super().setUp()
         self.redis_client.flushdb()
+        TieredCache.clear_all_local()
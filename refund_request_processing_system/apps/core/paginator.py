@@ -0,0 +1,49 @@
+import json
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+def get_estimated_count(queryset):
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+
+    if not queryset.query.has_filters() and not queryset.query.distinct:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        # -1 until the table is first vacuumed or analyzed
+        return row[0] if row and row[0] >= 0 else None
+
+    plan = json.loads(queryset.order_by().explain(format='json'))
+    if isinstance(plan, list):
+        plan = plan[0]
+    return plan['Plan']['Plan Rows']
+
+
+class EstimatedCountPaginator(Paginator):
+    # The last pages of estimated counts may be shorter, or empty
+    def __init__(self, *args, exact_count_threshold=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.exact_count_threshold = (
+            settings.PAGINATOR_EXACT_COUNT_THRESHOLD
+            if exact_count_threshold is None
+            else exact_count_threshold
+        )
+
+    @cached_property
+    def count(self):
+        if hasattr(self.object_list, 'query'):
+            estimated_count = get_estimated_count(self.object_list)
+            if (
+                estimated_count is not None
+                and estimated_count >= self.exact_count_threshold
+            ):
+                return estimated_count
+        return super().count
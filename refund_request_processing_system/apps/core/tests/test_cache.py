@@ -0,0 +1,113 @@
+from unittest.mock import patch
+
+from django.core.cache.backends.locmem import LocMemCache
+from django.test import SimpleTestCase
+
+from apps.core.cache import TieredCache
+
+
+class TieredCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.shared_cache = LocMemCache('tiered-cache-tests', {})
+        self.shared_cache.clear()
+        self.cache = TieredCache(
+            self.shared_cache,
+            'test',
+            max_size=2,
+            local_timeout=60,
+            broadcast_invalidations=False,
+        )
+
+    def test_set_writes_both_tiers(self):
+        self.cache.set('key', 'value', 300)
+
+        self.assertEqual(self.shared_cache.get('key'), 'value')
+        self.assertEqual(self.cache.get_local('key'), (True, 'value'))
+
+    def test_local_hit_skips_shared_cache(self):
+        self.cache.set('key', 'value', 300)
+
+        with patch.object(self.shared_cache, 'get') as mock_get:
+            self.assertEqual(self.cache.get('key'), 'value')
+
+        mock_get.assert_not_called()
+        self.assertEqual(self.cache.get_stats()['hits'], 1)
+
+    def test_shared_hit_is_kept_locally(self):
+        self.shared_cache.set('key', 'value')
+
+        self.assertEqual(self.cache.get('key'), 'value')
+        self.assertEqual(self.cache.get_local('key'), (True, 'value'))
+
+    def test_miss_returns_default(self):
+        self.assertEqual(self.cache.get('key', 'default'), 'default')
+        self.assertEqual(self.cache.get_local('key'), (False, None))
+
+    def test_cached_none_is_a_hit(self):
+        self.cache.set('key', None, 300)
+
+        self.assertIsNone(self.cache.get('key', 'default'))
+
+    def test_least_recently_used_entry_is_evicted(self):
+        self.cache.set_local('first', 1)
+        self.cache.set_local('second', 2)
+        self.cache.get_local('first')
+        self.cache.set_local('third', 3)
+
+        self.assertEqual(self.cache.get_local('second'), (False, None))
+        self.assertEqual(self.cache.get_local('first'), (True, 1))
+        self.assertEqual(self.cache.get_stats()['evictions'], 1)
+        self.assertEqual(self.cache.get_stats()['size'], 2)
+
+    @patch('apps.core.cache.time.monotonic')
+    def test_local_entry_expires(self, mock_monotonic):
+        mock_monotonic.return_value = 100
+        self.cache.set_local('key', 'value', timeout=10)
+
+        mock_monotonic.return_value = 110
+        self.assertEqual(self.cache.get_local('key'), (False, None))
+        self.assertEqual(self.cache.get_stats()['expirations'], 1)
+
+    def test_delete_removes_both_tiers(self):
+        self.cache.set('key', 'value', 300)
+        self.cache.delete('key')
+
+        self.assertIsNone(self.shared_cache.get('key'))
+        self.assertEqual(self.cache.get_local('key'), (False, None))
+
+    async def test_aget_many_combines_tiers(self):
+        self.cache.set_local('local', 1)
+        self.shared_cache.set('shared', 2)
+
+        results = await self.cache.aget_many(['local', 'shared', 'missing'])
+
+        self.assertEqual(results, {'local': 1, 'shared': 2})
+        self.assertEqual(self.cache.get_local('shared'), (True, 2))
+
+    def test_invalidation_from_other_process(self):
+        self.cache.set_local('key', 'value')
+
+        self.cache.handle_invalidation({'data': b'other-process:key'})
+
+        self.assertEqual(self.cache.get_local('key'), (False, None))
+        self.assertEqual(self.cache.get_stats()['invalidations'], 1)
+
+    def test_own_invalidation_is_ignored(self):
+        self.cache.set_local('key', 'value')
+
+        self.cache.handle_invalidation(
+            {'data': f'{self.cache.sender_id}:key'.encode()}
+        )
+
+        self.assertEqual(self.cache.get_local('key'), (True, 'value'))
+
+    @patch('apps.core.cache.Redis.publish')
+    def test_set_publishes_invalidation(self, mock_publish):
+        self.cache.broadcast_invalidations = True
+        self.cache._listener = object()
+
+        self.cache.set('key', 'value', 300)
+
+        mock_publish.assert_called_once_with(
+            'local-cache-invalidation:test', f'{self.cache.sender_id}:key'
+        )
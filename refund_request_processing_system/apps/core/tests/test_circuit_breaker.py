@@ -0,0 +1,143 @@
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.test import SimpleTestCase
+
+from apps.core.circuit_breaker import CircuitBreaker
+from apps.core.mixins import FlushRedisDBTestMixin
+
+
+class CircuitBreakerTests(FlushRedisDBTestMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.circuit_breaker = CircuitBreaker(
+            'test',
+            failure_rate_threshold=0.5,
+            slow_call_threshold=1,
+            min_calls=4,
+            window=60,
+            open_timeout=30,
+        )
+
+    def record_calls(self, *failed):
+        for call_failed in failed:
+            self.circuit_breaker.record(0.1, failed=call_failed)
+
+    def test_closed_by_default(self):
+        self.assertEqual(
+            self.circuit_breaker.get_state(), CircuitBreaker.CLOSED
+        )
+        self.assertTrue(self.circuit_breaker.allow_request())
+
+    def test_opens_on_failure_rate(self):
+        self.record_calls(False, True, False)
+        self.assertTrue(self.circuit_breaker.allow_request())
+
+        with self.assertLogs('django', level='WARNING'):
+            self.record_calls(True)
+
+        self.assertEqual(self.circuit_breaker.get_state(), CircuitBreaker.OPEN)
+        self.assertFalse(self.circuit_breaker.allow_request())
+
+    def test_stays_closed_below_min_calls(self):
+        self.record_calls(True, True, True)
+
+        self.assertEqual(
+            self.circuit_breaker.get_state(), CircuitBreaker.CLOSED
+        )
+
+    def test_slow_calls_count_as_failures(self):
+        with self.assertLogs('django', level='WARNING'):
+            for _ in range(4):
+                self.circuit_breaker.record(1.5, failed=False)
+
+        self.assertEqual(self.circuit_breaker.get_state(), CircuitBreaker.OPEN)
+
+    def test_state_is_shared(self):
+        with self.assertLogs('django', level='WARNING'):
+            self.circuit_breaker.open()
+
+        other_circuit_breaker = CircuitBreaker(
+            'test',
+            failure_rate_threshold=0.5,
+            slow_call_threshold=1,
+            min_calls=4,
+            window=60,
+            open_timeout=30,
+        )
+        self.assertFalse(other_circuit_breaker.allow_request())
+
+    @patch('apps.core.circuit_breaker.time.time')
+    def test_half_open_allows_single_probe(self, mock_time):
+        mock_time.return_value = 1000
+        with self.assertLogs('django', level='WARNING'):
+            self.circuit_breaker.open()
+
+        mock_time.return_value = 1031
+        self.assertEqual(
+            self.circuit_breaker.get_state(), CircuitBreaker.HALF_OPEN
+        )
+        self.assertTrue(self.circuit_breaker.allow_request())
+        self.assertFalse(self.circuit_breaker.allow_request())
+
+    @patch('apps.core.circuit_breaker.time.time')
+    def test_successful_probe_closes(self, mock_time):
+        mock_time.return_value = 1000
+        with self.assertLogs('django', level='WARNING'):
+            self.circuit_breaker.open()
+
+        mock_time.return_value = 1031
+        state = self.circuit_breaker.allow_request()
+        with self.assertLogs('django', level='INFO'):
+            self.circuit_breaker.record(0.1, failed=False, state=state)
+
+        self.assertEqual(
+            self.circuit_breaker.get_state(), CircuitBreaker.CLOSED
+        )
+        self.assertIsNone(cache.get(self.circuit_breaker.probe_key))
+
+    @patch('apps.core.circuit_breaker.time.time')
+    def test_failed_probe_reopens(self, mock_time):
+        mock_time.return_value = 1000
+        with self.assertLogs('django', level='WARNING'):
+            self.circuit_breaker.open()
+
+        mock_time.return_value = 1031
+        state = self.circuit_breaker.allow_request()
+        with self.assertLogs('django', level='WARNING'):
+            self.circuit_breaker.record(0.1, failed=True, state=state)
+
+        self.assertEqual(self.circuit_breaker.get_state(), CircuitBreaker.OPEN)
+        self.assertFalse(self.circuit_breaker.allow_request())
+
+    @patch('apps.core.circuit_breaker.time.time')
+    def test_only_probe_result_changes_state(self, mock_time):
+        mock_time.return_value = 1000
+        with self.assertLogs('django', level='WARNING'):
+            self.circuit_breaker.open()
+
+        # Calls started before the circuit opened
+        self.record_calls(False, False)
+        self.assertEqual(self.circuit_breaker.get_state(), CircuitBreaker.OPEN)
+
+        mock_time.return_value = 1031
+        state = self.circuit_breaker.allow_request()
+        self.record_calls(False, True)
+        self.assertEqual(
+            self.circuit_breaker.get_state(), CircuitBreaker.HALF_OPEN
+        )
+
+        with self.assertLogs('django', level='INFO'):
+            self.circuit_breaker.record(0.1, failed=False, state=state)
+        self.assertEqual(
+            self.circuit_breaker.get_state(), CircuitBreaker.CLOSED
+        )
+
+    async def test_async_methods(self):
+        self.assertTrue(await self.circuit_breaker.aallow_request())
+
+        with self.assertLogs('django', level='WARNING'):
+            for _ in range(4):
+                await self.circuit_breaker.arecord(0.1, failed=True)
+
+        self.assertFalse(await self.circuit_breaker.aallow_request())
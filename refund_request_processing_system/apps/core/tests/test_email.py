@@ -0,0 +1,45 @@
+from smtplib import SMTPException
+from unittest.mock import MagicMock
+
+from django.core.mail import EmailMessage
+from django.test import SimpleTestCase
+
+from apps.core.email import EmailSender
+
+
+class EmailSenderTests(SimpleTestCase):
+    def setUp(self):
+        self.connection = MagicMock()
+        self.messages = [
+            EmailMessage(subject=f'Message {i}', to=['john@example.com'])
+            for i in range(5)
+        ]
+
+    def test_messages_are_sent_in_batches(self):
+        with EmailSender(self.connection, batch_size=2) as sender:
+            sender.send(self.messages[:3])
+            sender.send(self.messages[3:])
+
+        self.assertEqual(
+            [
+                len(call.args[0])
+                for call in self.connection.send_messages.call_args_list
+            ],
+            [2, 1, 1, 1],
+        )
+        # The session is restarted after each full batch, and once finished
+        self.assertEqual(self.connection.close.call_count, 3)
+
+    def test_session_is_restarted_after_error(self):
+        self.connection.send_messages.side_effect = [
+            SMTPException('Connection lost'),
+            1,
+        ]
+        sender = EmailSender(self.connection, batch_size=10)
+
+        with self.assertRaises(SMTPException):
+            sender.send(self.messages[:1])
+        sender.send(self.messages[1:2])
+
+        self.connection.close.assert_called_once()
+        self.assertEqual(sender.session_message_count, 1)
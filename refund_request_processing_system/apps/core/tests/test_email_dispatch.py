@@ -0,0 +1,34 @@
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from apps.core.email_dispatch import TokenBucket
+from apps.core.mixins import FlushRedisDBTestMixin
+
+
+@patch('apps.core.email_dispatch.time.time', return_value=1000.0)
+class TokenBucketTests(FlushRedisDBTestMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        self.bucket = TokenBucket('test', rate=2, capacity=10)
+
+    def test_tokens_are_granted_up_to_capacity(self, mock_time):
+        self.assertEqual(self.bucket.acquire(6), 6)
+        self.assertEqual(self.bucket.acquire(6), 4)
+        self.assertEqual(self.bucket.acquire(1), 0)
+        self.assertEqual(self.bucket.get_wait_time(), 0.5)
+
+    def test_tokens_are_refilled_at_rate(self, mock_time):
+        self.bucket.acquire(10)
+
+        mock_time.return_value += 2
+        self.assertEqual(self.bucket.acquire(10), 4)
+
+        mock_time.return_value += 60
+        self.assertEqual(self.bucket.acquire(20), 10)
+
+    def test_unused_tokens_are_released(self, mock_time):
+        self.bucket.acquire(10)
+        self.bucket.release(3)
+
+        self.assertEqual(self.bucket.acquire(10), 3)
@@ -0,0 +1,43 @@
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+
+from apps.core.paginator import EstimatedCountPaginator, get_estimated_count
+
+
+class EstimatedCountPaginatorTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        User.objects.bulk_create(User(username=f'user{i}') for i in range(5))
+
+    def get_paginator(self):
+        return EstimatedCountPaginator(
+            User.objects.order_by('id'), 2, exact_count_threshold=1000
+        )
+
+    @patch('apps.core.paginator.get_estimated_count', return_value=50000)
+    def test_estimated_count_above_threshold_is_used(self, mock_estimate):
+        paginator = self.get_paginator()
+
+        with self.assertNumQueries(0):
+            self.assertEqual(paginator.count, 50000)
+        self.assertEqual(paginator.num_pages, 25000)
+        self.assertEqual(len(paginator.page(1)), 2)
+
+    @patch('apps.core.paginator.get_estimated_count', return_value=10)
+    def test_rows_are_counted_below_threshold(self, mock_estimate):
+        self.assertEqual(self.get_paginator().count, 5)
+
+    def test_lists_are_counted(self):
+        paginator = EstimatedCountPaginator(list(range(5)), 2)
+
+        self.assertEqual(paginator.count, 5)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Postgres planner')
+    def test_filtered_queryset_count_is_estimated(self):
+        self.assertIsInstance(
+            get_estimated_count(User.objects.filter(username='user1')), int
+        )
@@ -1,2 +1,10 @@
+from django.core.handlers.asgi import ASGIRequest
+
+
 def comma_join_str(sequence):
     return ', '.join(str(item) for item in sequence)
+
+
+def is_asgi_request(request):
+    # REST framework requests wrap the HttpRequest
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
@@ -0,0 +1,368 @@
+import json
+import queue
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import Client, override_settings
+from django.urls import reverse
+
+from apps.core.cache import TieredCache
+from apps.core.models import UserProfile
+from apps.loadtest.management.commands.run_api_ninjas_stub import (
+    add_stub_arguments,
+    create_stub_server,
+)
+from apps.refunds.clients import APINinjasClient
+from apps.refunds.enums import RefundReason
+from apps.refunds.iban import build_iban
+from apps.refunds.models import IBANVerification, RefundRequest
+from apps.refunds.utils import IBANValidator, iban_results_cache
+from apps.refunds.views import ValidateIBANView
+
+BENCHMARK_USERNAME = 'iban-benchmark'
+BENCHMARK_COUNTRY = 'DE'
+
+VALIDATION_COUNTERS = (
+    'local_errors',
+    'hits',
+    'stale_hits',
+    'coalesced',
+    'misses',
+    'store_hits',
+    'upstream_valid',
+    'upstream_invalid',
+    'upstream_unavailable',
+)
+
+
+def get_percentile(sorted_values, percentile):
+    index = min(int(len(sorted_values) * percentile), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Sends IBAN validation and refund request creation requests to the '
+        'views in-process at a target rate, and reports throughput, latency '
+        'percentiles, cache hit ratio and upstream calls. For development '
+        'only, as throttling is disabled for the run.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scenario',
+            choices=['validate', 'create', 'mixed'],
+            default='validate',
+            help=(
+                'mixed validates each IBAN and then submits a refund request '
+                'with it, like the create form does.'
+            ),
+        )
+        parser.add_argument('--rps', type=float, default=20)
+        parser.add_argument(
+            '--duration', type=float, default=10, help='Seconds.'
+        )
+        parser.add_argument('--concurrency', type=int, default=10)
+        parser.add_argument(
+            '--unique-ibans',
+            type=int,
+            default=100,
+            help='IBANs are reused in a round robin, which sets the hit ratio.',
+        )
+        parser.add_argument(
+            '--cold',
+            action='store_true',
+            help='Remove cached and stored results for the IBANs first.',
+        )
+        parser.add_argument(
+            '--with-stub',
+            action='store_true',
+            help='Validate IBANs with a local API Ninjas stub.',
+        )
+        add_stub_arguments(parser, prefix='stub-')
+        parser.add_argument('--json', action='store_true')
+
+    def handle(self, *args, **options):
+        if options['rps'] <= 0 or options['duration'] <= 0:
+            raise CommandError('--rps and --duration must be positive.')
+
+        self.user = self.get_benchmark_user()
+        self.ibans = [
+            build_iban(BENCHMARK_COUNTRY, f'{number:018d}')
+            for number in range(1, options['unique_ibans'] + 1)
+        ]
+        if options['cold']:
+            self.clear_results()
+
+        with ExitStack() as stack:
+            stub_server = None
+            if options['with_stub']:
+                stub_server = self.start_stub_server(options)
+                stack.callback(stub_server.server_close)
+                stack.callback(stub_server.shutdown)
+                stack.enter_context(
+                    override_settings(
+                        API_NINJAS_API_KEY='stub',
+                        API_NINJAS_IBAN_VALIDATION_URL=stub_server.url,
+                    )
+                )
+            stack.enter_context(self.disable_throttling())
+
+            validation_stats = IBANValidator.get_stats()
+            client_stats = APINinjasClient.get_stats()
+            results, elapsed = self.run(options)
+            report = self.get_report(
+                options,
+                results,
+                elapsed,
+                validation_stats,
+                client_stats,
+                stub_server,
+            )
+
+        RefundRequest.objects.filter(user=self.user).delete()
+        self.write_report(report, options['json'])
+
+    def get_benchmark_user(self):
+        user, _ = User.objects.get_or_create(
+            username=BENCHMARK_USERNAME,
+            defaults={
+                'first_name': 'IBAN',
+                'last_name': 'Benchmark',
+                'email': 'iban-benchmark@example.com',
+            },
+        )
+        UserProfile.objects.get_or_create(
+            user=user, defaults={'phone_number': '+48123456789'}
+        )
+        return user
+
+    def clear_results(self):
+        validators = [
+            IBANValidator(iban, BENCHMARK_COUNTRY) for iban in self.ibans
+        ]
+        for validator in validators:
+            iban_results_cache.delete(validator.cache_key)
+        TieredCache.clear_all_local()
+        IBANVerification.objects.filter(
+            iban_hash__in=[validator.iban_hash for validator in validators]
+        ).delete()
+
+    def start_stub_server(self, options):
+        stub_server = create_stub_server(
+            ('127.0.0.1', 0),
+            options['stub_latency'],
+            options['stub_error_rate'],
+            options['stub_rate_limit'],
+            options['stub_seed'],
+        )
+        stub_server.start_in_thread()
+        return stub_server
+
+    @contextmanager
+    def disable_throttling(self):
+        # The default user throttle would reject most of the requests
+        throttle_classes = ValidateIBANView.throttle_classes
+        ValidateIBANView.throttle_classes = []
+        try:
+            yield
+        finally:
+            ValidateIBANView.throttle_classes = throttle_classes
+
+    def get_request(self, index, scenario):
+        if scenario == 'mixed':
+            kind = ('validate', 'create')[index % 2]
+            index //= 2
+        else:
+            kind = scenario
+        return kind, self.ibans[index % len(self.ibans)]
+
+    def run(self, options):
+        # Latency is measured from the scheduled time, including queueing
+        pending = queue.Queue()
+        results = []
+        workers = [
+            threading.Thread(target=self.work, args=(pending, results))
+            for _ in range(options['concurrency'])
+        ]
+        for worker in workers:
+            worker.start()
+
+        interval = 1 / options['rps']
+        request_count = int(options['rps'] * options['duration'])
+        start = time.perf_counter()
+        for index in range(request_count):
+            scheduled_at = start + index * interval
+            time.sleep(max(0, scheduled_at - time.perf_counter()))
+            pending.put(
+                (*self.get_request(index, options['scenario']), scheduled_at)
+            )
+
+        for _ in workers:
+            pending.put(None)
+        for worker in workers:
+            worker.join()
+
+        return results, time.perf_counter() - start
+
+    def work(self, pending, results):
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0].lstrip('.'))
+        client.force_login(self.user)
+
+        try:
+            while (item := pending.get()) is not None:
+                kind, iban, scheduled_at = item
+                try:
+                    succeeded = self.send_request(client, kind, iban)
+                except Exception as e:
+                    self.stderr.write(f'{kind} request failed: {e}')
+                    succeeded = False
+                results.append(
+                    (kind, time.perf_counter() - scheduled_at, succeeded)
+                )
+        finally:
+            connections.close_all()
+
+    def send_request(self, client, kind, iban):
+        if kind == 'validate':
+            response = client.post(
+                reverse('validate_iban'),
+                {'iban': iban, 'country': BENCHMARK_COUNTRY},
+                content_type='application/json',
+            )
+            return response.status_code == 200
+
+        response = client.post(
+            reverse('create_refund'), self.get_refund_data(iban)
+        )
+        return response.status_code == 302
+
+    def get_refund_data(self, iban):
+        return {
+            'order_number': 'BENCHMARK',
+            'order_date': '2024-03-10',
+            'products': 'Benchmark Product',
+            'reason_choice': RefundReason.WRONG_PRODUCT,
+            'first_name': self.user.first_name,
+            'last_name': self.user.last_name,
+            'phone_number': '+48123456789',
+            'email': self.user.email,
+            'address': 'Benchmark Street 1',
+            'postal_code': '12345',
+            'city': 'Benchmark City',
+            'country': BENCHMARK_COUNTRY,
+            'iban': iban,
+            'bank_name': 'Benchmark Bank',
+            'account_type': 'private',
+        }
+
+    def get_report(
+        self,
+        options,
+        results,
+        elapsed,
+        validation_stats,
+        client_stats,
+        stub_server,
+    ):
+        report = {
+            'scenario': options['scenario'],
+            'target_rps': options['rps'],
+            'elapsed': elapsed,
+            'requests': {},
+        }
+        for kind in ('validate', 'create'):
+            kind_results = [result for result in results if result[0] == kind]
+            if kind_results:
+                report['requests'][kind] = self.summarize(kind_results, elapsed)
+        report['requests']['total'] = self.summarize(results, elapsed)
+
+        # Stats are shared by the process, so only the difference is reported
+        current_stats = IBANValidator.get_stats()
+        validation = {
+            name: current_stats[name] - validation_stats[name]
+            for name in VALIDATION_COUNTERS
+        }
+        lookups = sum(
+            validation[name]
+            for name in ('hits', 'stale_hits', 'coalesced', 'misses')
+        )
+        validation['hit_ratio'] = (
+            (lookups - validation['misses']) / lookups if lookups else None
+        )
+        report['validation'] = validation
+
+        current_client_stats = APINinjasClient.get_stats()
+        report['upstream'] = {
+            name: current_client_stats[name] - client_stats[name]
+            for name in ('calls', 'failures')
+        }
+        if stub_server is not None:
+            report['stub'] = stub_server.get_stats()
+        return report
+
+    def summarize(self, results, elapsed):
+        latencies = sorted(result[1] for result in results)
+        summary = {
+            'count': len(results),
+            'errors': sum(not result[2] for result in results),
+            'throughput': len(results) / elapsed,
+        }
+        if latencies:
+            summary['latency_ms'] = {
+                name: get_percentile(latencies, percentile) * 1000
+                for name, percentile in (
+                    ('p50', 0.5),
+                    ('p90', 0.9),
+                    ('p99', 0.99),
+                    ('max', 1),
+                )
+            }
+        return summary
+
+    def write_report(self, report, as_json):
+        if as_json:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+
+        self.stdout.write(
+            f'Scenario: {report["scenario"]}, target: '
+            f'{report["target_rps"]:g} req/s, elapsed: '
+            f'{report["elapsed"]:.1f} s'
+        )
+        for kind, summary in report['requests'].items():
+            line = (
+                f'{kind}: {summary["count"]} requests, '
+                f'{summary["errors"]} errors, '
+                f'{summary["throughput"]:.1f} req/s'
+            )
+            if latency := summary.get('latency_ms'):
+                line += ', latency ' + ', '.join(
+                    f'{name} {value:.1f} ms' for name, value in latency.items()
+                )
+            self.stdout.write(line)
+
+        validation = report['validation']
+        hit_ratio = validation.pop('hit_ratio')
+        self.stdout.write(
+            'Cache hit ratio: '
+            + ('n/a' if hit_ratio is None else f'{hit_ratio:.1%}')
+        )
+        self.stdout.write(
+            'Validation: '
+            + ', '.join(f'{name} {value}' for name, value in validation.items())
+        )
+        self.stdout.write(
+            f'Upstream calls: {report["upstream"]["calls"]}, '
+            f'failures: {report["upstream"]["failures"]}'
+        )
+        if stub := report.get('stub'):
+            self.stdout.write(
+                'Stub: '
+                + ', '.join(f'{name} {value}' for name, value in stub.items())
+            )
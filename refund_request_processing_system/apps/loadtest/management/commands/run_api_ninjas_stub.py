@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.loadtest.stub import APINinjasStubServer
+
+
+def add_stub_arguments(parser, prefix=''):
+    parser.add_argument(
+        f'--{prefix}latency',
+        default='fixed:50',
+        help=(
+            'Latency distribution in ms: fixed:<ms>, uniform:<min>:<max>, '
+            'exponential:<mean> or lognormal:<median>:<sigma>.'
+        ),
+    )
+    parser.add_argument(
+        f'--{prefix}error-rate',
+        type=float,
+        default=0,
+        help='Share of requests failed with status code 500.',
+    )
+    parser.add_argument(
+        f'--{prefix}rate-limit',
+        type=float,
+        help='Requests per second above which 429 is returned.',
+    )
+    parser.add_argument(f'--{prefix}seed', type=int)
+
+
+def create_stub_server(address, latency, error_rate, rate_limit, seed):
+    try:
+        return APINinjasStubServer(
+            address,
+            latency=latency,
+            error_rate=error_rate,
+            rate_limit=rate_limit,
+            seed=seed,
+        )
+    except ValueError as e:
+        raise CommandError(str(e))
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs a local stand-in for the API Ninjas IBAN validation endpoint. '
+        'Point API_NINJAS_IBAN_VALIDATION_URL at it for load tests.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8001)
+        add_stub_arguments(parser)
+
+    def handle(self, *args, **options):
+        server = create_stub_server(
+            (options['host'], options['port']),
+            options['latency'],
+            options['error_rate'],
+            options['rate_limit'],
+            options['seed'],
+        )
+        self.stdout.write(f'Serving API Ninjas stub at {server.url}')
+
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+            self.stdout.write(f'Stub stats: {server.get_stats()}')
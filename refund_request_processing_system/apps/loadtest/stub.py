@@ -0,0 +1,177 @@
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from logging import getLogger
+from urllib.parse import parse_qs, urlparse
+
+from apps.refunds.iban import LocalIBANValidator, canonicalize_iban
+
+logger = getLogger('django')
+
+IBAN_VALIDATION_PATH = '/v1/iban'
+
+
+class LatencyDistribution:
+    # e.g. `fixed:50`, `uniform:20:80`, `exponential:50` or `lognormal:50:0.5`
+    PARAMETER_COUNTS = {
+        'fixed': 1,
+        'uniform': 2,
+        'exponential': 1,
+        'lognormal': 2,
+    }
+
+    def __init__(self, spec):
+        name, *parameters = spec.split(':')
+        if len(parameters) != self.PARAMETER_COUNTS.get(name):
+            raise ValueError(f'Invalid latency distribution: {spec}.')
+
+        self.spec = spec
+        self.name = name
+        self.parameters = [float(parameter) for parameter in parameters]
+
+    def sample(self, rng):
+        match self.name, self.parameters:
+            case 'fixed', [latency]:
+                milliseconds = latency
+            case 'uniform', [low, high]:
+                milliseconds = rng.uniform(low, high)
+            case 'exponential', [mean]:
+                milliseconds = rng.expovariate(1 / mean) if mean else 0
+            case 'lognormal', [median, sigma]:
+                milliseconds = median * rng.lognormvariate(0, sigma)
+        return milliseconds / 1000
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def consume(self):
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(
+                self.capacity,
+                self.tokens + (now - self.updated_at) * self.rate,
+            )
+            self.updated_at = now
+
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+
+class APINinjasStubServer(ThreadingHTTPServer):
+    # Stands in for the API Ninjas IBAN endpoint in load tests
+    daemon_threads = True
+
+    def __init__(
+        self,
+        address,
+        latency='fixed:0',
+        error_rate=0,
+        rate_limit=None,
+        seed=None,
+    ):
+        super().__init__(address, APINinjasStubRequestHandler)
+        self.latency = LatencyDistribution(latency)
+        self.error_rate = error_rate
+        self.rate_limiter = TokenBucket(rate_limit) if rate_limit else None
+
+        self.rng = random.Random(seed)
+        self.rng_lock = threading.Lock()
+        self.stats_lock = threading.Lock()
+        self.stats = Counter()
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}{IBAN_VALIDATION_PATH}'
+
+    def start_in_thread(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return thread
+
+    def get_delay_and_failure(self):
+        with self.rng_lock:
+            return (
+                self.latency.sample(self.rng),
+                self.rng.random() < self.error_rate,
+            )
+
+    def increment(self, name):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+    def get_stats(self):
+        with self.stats_lock:
+            return {
+                name: self.stats[name]
+                for name in (
+                    'requests',
+                    'valid',
+                    'invalid',
+                    'errors',
+                    'rate_limited',
+                )
+            }
+
+
+class APINinjasStubRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path != IBAN_VALIDATION_PATH:
+            self.send_json(404, {'error': 'Not found.'})
+            return
+
+        self.server.increment('requests')
+        if (
+            self.server.rate_limiter is not None
+            and not self.server.rate_limiter.consume()
+        ):
+            self.server.increment('rate_limited')
+            self.send_json(429, {'error': 'Too many requests.'})
+            return
+
+        delay, failed = self.server.get_delay_and_failure()
+        time.sleep(delay)
+        if failed:
+            self.server.increment('errors')
+            self.send_json(500, {'error': 'Internal server error.'})
+            return
+
+        iban = canonicalize_iban(parse_qs(url.query).get('iban', [''])[0])
+        response = self.get_validation_response(iban)
+        self.server.increment('valid' if response['valid'] else 'invalid')
+        self.send_json(200, response)
+
+    def get_validation_response(self, iban):
+        validator = LocalIBANValidator(iban, iban[:2])
+        return {
+            'iban': iban,
+            'valid': validator.is_valid(),
+            'country': iban[:2],
+            'checksum': iban[2:4],
+            'bban': iban[4:],
+        }
+
+    def send_json(self, status_code, data):
+        body = json.dumps(data).encode()
+        self.send_response(status_code)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f'API Ninjas stub: {format % args}')
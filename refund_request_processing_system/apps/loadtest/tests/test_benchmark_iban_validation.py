@@ -0,0 +1,58 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TransactionTestCase
+
+from apps.core.mixins import FlushRedisDBTestMixin
+from apps.loadtest.management.commands.benchmark_iban_validation import (
+    Command,
+)
+from apps.refunds.models import IBANVerification, RefundRequest
+
+
+class BenchmarkIBANValidationCommandTests(
+    FlushRedisDBTestMixin, TransactionTestCase
+):
+    def call_command(self, *args):
+        stdout = StringIO()
+        # The app is only installed in debug mode, so the command is passed
+        # directly
+        call_command(
+            Command(),
+            '--rps',
+            '20',
+            '--duration',
+            '0.5',
+            '--concurrency',
+            '2',
+            '--unique-ibans',
+            '2',
+            '--with-stub',
+            '--stub-latency',
+            'fixed:0',
+            '--json',
+            *args,
+            stdout=stdout,
+        )
+        return json.loads(stdout.getvalue())
+
+    def test_validate_scenario(self):
+        report = self.call_command('--scenario', 'validate', '--cold')
+
+        self.assertEqual(report['requests']['total']['count'], 10)
+        self.assertEqual(report['requests']['total']['errors'], 0)
+        self.assertEqual(report['upstream']['calls'], 2)
+        self.assertEqual(report['stub']['valid'], 2)
+        self.assertEqual(report['validation']['upstream_valid'], 2)
+        self.assertEqual(report['validation']['hit_ratio'], 0.8)
+        self.assertIn('p99', report['requests']['validate']['latency_ms'])
+        self.assertEqual(IBANVerification.objects.count(), 2)
+
+    def test_mixed_scenario_removes_refund_requests(self):
+        report = self.call_command('--scenario', 'mixed')
+
+        self.assertEqual(report['requests']['validate']['count'], 5)
+        self.assertEqual(report['requests']['create']['count'], 5)
+        self.assertEqual(report['requests']['total']['errors'], 0)
+        self.assertFalse(RefundRequest.objects.exists())
@@ -0,0 +1,72 @@
+import random
+
+from django.test import SimpleTestCase, override_settings
+
+from apps.core.mixins import FlushRedisDBTestMixin
+from apps.loadtest.stub import APINinjasStubServer, LatencyDistribution
+from apps.refunds.clients import APINinjasClient
+
+
+class APINinjasStubServerTests(FlushRedisDBTestMixin, SimpleTestCase):
+    def start_server(self, **kwargs):
+        server = APINinjasStubServer(('127.0.0.1', 0), **kwargs)
+        server.start_in_thread()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def validate_iban(self, server, iban):
+        with override_settings(API_NINJAS_IBAN_VALIDATION_URL=server.url):
+            return APINinjasClient().validate_iban(iban)
+
+    def test_validates_iban(self):
+        server = self.start_server()
+
+        self.assertEqual(
+            self.validate_iban(server, 'DE89370400440532013000'),
+            {
+                'iban': 'DE89370400440532013000',
+                'valid': True,
+                'country': 'DE',
+                'checksum': '89',
+                'bban': '370400440532013000',
+            },
+        )
+        self.assertFalse(
+            self.validate_iban(server, 'DE00370400440532013000')['valid']
+        )
+        self.assertEqual(server.get_stats()['valid'], 1)
+        self.assertEqual(server.get_stats()['invalid'], 1)
+
+    def test_errors(self):
+        server = self.start_server(error_rate=1)
+
+        self.assertIsNone(self.validate_iban(server, 'DE89370400440532013000'))
+        self.assertEqual(server.get_stats()['errors'], 1)
+
+    def test_rate_limit(self):
+        server = self.start_server(rate_limit=1)
+
+        self.assertIsNotNone(
+            self.validate_iban(server, 'DE89370400440532013000')
+        )
+        self.assertIsNone(self.validate_iban(server, 'DE89370400440532013000'))
+        self.assertEqual(server.get_stats()['rate_limited'], 1)
+
+
+class LatencyDistributionTests(SimpleTestCase):
+    def test_samples_seconds(self):
+        rng = random.Random(0)
+
+        self.assertEqual(LatencyDistribution('fixed:50').sample(rng), 0.05)
+        self.assertTrue(
+            0.02 <= LatencyDistribution('uniform:20:80').sample(rng) <= 0.08
+        )
+        self.assertGreater(
+            LatencyDistribution('lognormal:50:0.5').sample(rng), 0
+        )
+
+    def test_invalid_spec(self):
+        for spec in ('normal:50', 'fixed', 'uniform:20'):
+            with self.assertRaises(ValueError):
+                LatencyDistribution(spec)
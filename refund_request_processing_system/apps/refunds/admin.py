@@ -1,20 +1,116 @@
 import textwrap
+from datetime import datetime, timedelta
 
+from django.conf import settings
 from django.contrib import admin
-from django.db.models import Case, IntegerField, Value, When
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR
+from django.contrib.postgres.search import TrigramSimilarity
+from django.core.exceptions import PermissionDenied
+from django.db import connection
+from django.db.models.functions import Greatest
+from django.http import (
+    FileResponse,
+    HttpRequest,
+    QueryDict,
+    StreamingHttpResponse,
+)
+from django.shortcuts import get_object_or_404, redirect
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils import timezone
+from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from import_export import resources
 from import_export.admin import ImportExportModelAdmin
 
+from apps.core.paginator import EstimatedCountPaginator
 from apps.core.utils import comma_join_str
-from apps.refunds.enums import RefundStatus
-from apps.refunds.models import RefundRequest
-from apps.refunds.utils import IBANValidator
+from apps.refunds.enums import ExportJobStatus, RefundFacet, RefundStatus
+from apps.refunds.export import (
+    iter_csv,
+    iter_encoded,
+    iter_export_rows,
+    iter_gzipped,
+)
+from apps.refunds.forms import ExportJobForm
+from apps.refunds.models import (
+    REFUND_REQUEST_SEARCH_FIELDS,
+    ExportJob,
+    RefundRequest,
+    RefundRequestFacetCount,
+)
+from apps.refunds.utils import (
+    SERVICE_UNAVAILABLE_ERROR,
+    verify_refund_request_ibans,
+)
 
 
 class RefundRequestResource(resources.ModelResource):
     class Meta:
         model = RefundRequest
+        exclude = ['status_order']
+
+
+class FacetCountListFilter(admin.SimpleListFilter):
+    facet = None
+
+    def lookups(self, request, model_admin):
+        counts = RefundRequestFacetCount.get_counts(self.facet)
+        return [
+            (value, f'{label} ({counts[value]})')
+            for value, label in self.get_choices(counts)
+        ]
+
+    def get_choices(self, counts):
+        return [(value, value) for value in sorted(counts)]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(**{self.parameter_name: self.value()})
+        return queryset
+
+
+class StatusListFilter(FacetCountListFilter):
+    title = 'status'
+    parameter_name = 'status'
+    facet = RefundFacet.STATUS
+
+    def get_choices(self, counts):
+        return [
+            (value, label)
+            for value, label in RefundRequest.STATUS_CHOICES
+            if value in counts
+        ]
+
+
+class CountryListFilter(FacetCountListFilter):
+    title = 'country'
+    parameter_name = 'country'
+    facet = RefundFacet.COUNTRY
+
+
+class CreatedMonthListFilter(FacetCountListFilter):
+    title = 'creation month'
+    parameter_name = 'created_month'
+    facet = RefundFacet.CREATED_MONTH
+
+    def get_choices(self, counts):
+        return [(value, value) for value in sorted(counts, reverse=True)]
+
+    def queryset(self, request, queryset):
+        if not self.value():
+            return queryset
+        try:
+            month_start = timezone.make_aware(
+                datetime.strptime(self.value(), '%Y-%m')
+            )
+        except ValueError as e:
+            raise IncorrectLookupParameters(e)
+        next_month_start = (month_start + timedelta(days=31)).replace(day=1)
+        return queryset.filter(
+            created_at__gte=month_start, created_at__lt=next_month_start
+        )
 
 
 class RefundRequestAdmin(ImportExportModelAdmin):
@@ -51,12 +147,24 @@ class RefundRequestAdmin(ImportExportModelAdmin):
         'account_type',
         'iban',
         'iban_verified',
+        'iban_verification_error',
         'created_at',
         'updated_at',
         'status',
     ]
-    list_filter = ['status', 'created_at', 'country']
+    list_filter = [StatusListFilter, CreatedMonthListFilter, CountryListFilter]
+    show_facets = admin.ShowFacets.NEVER
     list_per_page = 20
+    search_fields = REFUND_REQUEST_SEARCH_FIELDS
+    search_help_text = (
+        'Search by order number, email, name, IBAN, products or notes.'
+    )
+    import_export_change_list_template = (
+        'admin/refunds/refundrequest/change_list.html'
+    )
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    ordering = ['status_order', '-created_at']
 
     actions = [
         'approve_refund_requests',
@@ -119,20 +227,14 @@ class RefundRequestAdmin(ImportExportModelAdmin):
 
     @admin.action(description='Validate IBAN')
     def validate_iban(self, request, queryset):
-        errors = {}
-        valid_ids = []
-        for refund_request in queryset.filter(iban_verified=False):
-            validator = IBANValidator(
-                refund_request.iban, refund_request.country
-            )
-            if error := validator.get_error():
-                errors[refund_request.id] = error
-            else:
-                valid_ids.append(refund_request.id)
+        valid_ids, errors, unavailable_ids = verify_refund_request_ibans(
+            list(queryset.filter(iban_verified=False))
+        )
 
-        message_level = 'ERROR' if errors else 'SUCCESS'
+        message_level = 'ERROR' if errors or unavailable_ids else 'SUCCESS'
         success_message = ''
         error_message = ''
+        unavailable_message = ''
         if valid_ids:
             success_message = (
                 'IBANs for the following refund requests were successfully '
@@ -144,31 +246,204 @@ class RefundRequestAdmin(ImportExportModelAdmin):
             )
             for refund_request_id, error in errors.items():
                 error_message += f'<br>    - {refund_request_id}: {error}'
+        if unavailable_ids:
+            unavailable_message = (
+                f'<br>{SERVICE_UNAVAILABLE_ERROR} IBANs for the following '
+                'refund requests were not validated: '
+                f'{comma_join_str(unavailable_ids)}'
+            )
 
         self.message_user(
             request,
-            mark_safe(f'{success_message}{error_message}'),
+            mark_safe(f'{success_message}{error_message}{unavailable_message}'),
             level=message_level,
         )
 
-    def _change_refund_requests_status(self, queryset, status):
-        queryset.update(status=status)
-        for refund_request in queryset:
-            refund_request.emit_status_change_email()
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.annotate(
-            _status_order=Case(
-                When(status=RefundStatus.PENDING, then=Value(1)),
-                When(status=RefundStatus.APPROVED, then=Value(2)),
-                When(status=RefundStatus.REJECTED, then=Value(3)),
-                output_field=IntegerField(),
+    def get_search_results(self, request, queryset, search_term):
+        # Matches are ranked by similarity, unless sorted by a column
+        queryset, may_have_duplicates = super().get_search_results(
+            request, queryset, search_term
+        )
+        if search_term and connection.vendor == 'postgresql':
+            queryset = queryset.annotate(
+                search_rank=Greatest(
+                    *[
+                        TrigramSimilarity(field, search_term)
+                        for field in self.search_fields
+                    ]
+                )
             )
-        ).order_by('_status_order', '-created_at')
+            if ORDER_VAR not in request.GET:
+                queryset = queryset.order_by(
+                    '-search_rank', *queryset.query.order_by
+                )
+        return queryset, may_have_duplicates
+
+    def _change_refund_requests_status(self, queryset, status):
+        # Emails are sent by the `send_emails` worker once committed
+        RefundRequest.bulk_change_status(queryset, status)
 
     def has_import_permission(self, request):
         return False
 
+    def get_urls(self):
+        info = self.get_model_info()
+        stream_export_view = self.admin_site.admin_view(self.stream_export_view)
+        return [
+            path(
+                'export/background/',
+                self.admin_site.admin_view(self.export_job_view),
+                name='%s_%s_export_job' % info,
+            ),
+            path(
+                'export/stream/',
+                stream_export_view,
+                {'compress': False},
+                name='%s_%s_stream_export' % info,
+            ),
+            path(
+                'export/stream/gzip/',
+                stream_export_view,
+                {'compress': True},
+                name='%s_%s_stream_export_gzip' % info,
+            ),
+        ] + super().get_urls()
+
+    def export_job_view(self, request):
+        if not self.has_export_permission(request):
+            raise PermissionDenied
+
+        form = ExportJobForm(request.POST or None)
+        if form.is_valid():
+            export_job = ExportJob.objects.create(
+                user=request.user,
+                format=form.cleaned_data['format'],
+                query_string=request.GET.urlencode(),
+            )
+            self.message_user(
+                request,
+                f'Export #{export_job.id} was queued. The file can be '
+                'downloaded from the export jobs list once ready.',
+            )
+            return redirect('admin:refunds_exportjob_changelist')
+
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Export in background',
+            'opts': self.opts,
+            'form': form,
+        }
+        return TemplateResponse(
+            request, 'admin/refunds/refundrequest/export_job.html', context
+        )
+
+    def get_export_job_queryset(self, export_job):
+        # Changelist filters of the export request are applied as they were
+        request = HttpRequest()
+        request.GET = QueryDict(export_job.query_string)
+        request.user = export_job.user
+        return self.get_export_queryset(request)
+
+    def stream_export_view(self, request, compress):
+        # django-import-export builds the whole file in memory
+        if not self.has_export_permission(request):
+            raise PermissionDenied
+
+        resource = RefundRequestResource()
+        queryset = self.get_export_queryset(request)
+        content = iter_encoded(
+            iter_csv(
+                resource.get_export_headers(),
+                iter_export_rows(
+                    resource, queryset, settings.EXPORT_CHUNK_SIZE
+                ),
+            ),
+            settings.EXPORT_BUFFER_SIZE,
+        )
+        filename = (
+            f'{self.model.__name__}-{timezone.now().strftime("%Y-%m-%d")}.csv'
+        )
+        if compress:
+            content = iter_gzipped(content)
+            filename += '.gz'
+
+        response = StreamingHttpResponse(
+            content,
+            content_type='application/gzip' if compress else 'text/csv',
+        )
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+class ExportJobAdmin(admin.ModelAdmin):
+    model = ExportJob
+    list_display = [
+        'id',
+        'user',
+        'format',
+        'status',
+        'progress_display',
+        'created_at',
+        'finished_at',
+        'download_link',
+    ]
+    list_filter = ['status', 'format']
+    readonly_fields = [
+        'user',
+        'format',
+        'query_string',
+        'status',
+        'total_rows',
+        'exported_rows',
+        'file',
+        'error',
+        'created_at',
+        'started_at',
+        'heartbeat_at',
+        'finished_at',
+    ]
+
+    @admin.display(description='progress')
+    def progress_display(self, obj):
+        return f'{obj.progress}%'
+
+    @admin.display(description='file')
+    def download_link(self, obj):
+        if obj.status != ExportJobStatus.DONE:
+            return '-'
+        return format_html(
+            '<a href="{}">Download</a>',
+            reverse('admin:refunds_exportjob_download', args=[obj.pk]),
+        )
+
+    def get_urls(self):
+        return [
+            path(
+                '<int:object_id>/download/',
+                self.admin_site.admin_view(self.download_view),
+                name='refunds_exportjob_download',
+            ),
+        ] + super().get_urls()
+
+    def download_view(self, request, object_id):
+        export_job = get_object_or_404(
+            ExportJob, pk=object_id, status=ExportJobStatus.DONE
+        )
+        if not self.has_view_permission(request, export_job):
+            raise PermissionDenied
+
+        return FileResponse(
+            export_job.file.open('rb'),
+            as_attachment=True,
+            filename=export_job.get_filename(),
+        )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 
 admin.site.register(RefundRequest, RefundRequestAdmin)
+admin.site.register(ExportJob, ExportJobAdmin)
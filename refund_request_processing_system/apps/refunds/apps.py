@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RefundsAppConfig(AppConfig):
     name = 'apps.refunds'
     default_auto_field = 'django.db.models.AutoField'
+
+    def ready(self):
+        import apps.refunds.signals  # noqa
@@ -1,12 +1,111 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+import weakref
+from collections import deque
 from logging import getLogger
 
+import httpx
 import requests
 from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import InvalidHeader
+from urllib3.util.retry import Retry
+
+from apps.core.circuit_breaker import CircuitBreaker
 
 logger = getLogger('django')
 
 
+class RequestStats:
+    def __init__(self, max_samples=1000):
+        self.lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.latencies = deque(maxlen=max_samples)
+
+    def record(self, latency, failed):
+        with self.lock:
+            self.calls += 1
+            self.failures += int(failed)
+            self.latencies.append(latency)
+
+    def as_dict(self):
+        with self.lock:
+            latencies = sorted(self.latencies)
+            stats = {'calls': self.calls, 'failures': self.failures}
+
+        if latencies:
+            stats['latency'] = {
+                'avg': statistics.fmean(latencies),
+                'p50': latencies[int(len(latencies) * 0.5)],
+                'p95': latencies[int(len(latencies) * 0.95)],
+                'max': latencies[-1],
+            }
+        return stats
+
+
+class AsyncRetryTransport(httpx.AsyncBaseTransport):
+    # Applies the urllib3 Retry policy of the sync session
+    def __init__(self, transport, retry):
+        self.transport = transport
+        self.retry = retry
+
+    async def handle_async_request(self, request):
+        retries = 0
+        while True:
+            can_retry = (
+                retries < self.retry.total
+                and request.method in self.retry.allowed_methods
+            )
+            try:
+                response = await self.transport.handle_async_request(request)
+            except httpx.TransportError:
+                if not can_retry:
+                    raise
+                response = None
+            else:
+                if (
+                    not can_retry
+                    or response.status_code not in self.retry.status_forcelist
+                ):
+                    return response
+                await response.aclose()
+
+            retries += 1
+            await asyncio.sleep(self.get_wait_time(retries, response))
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+    def get_wait_time(self, retries, response):
+        if (
+            response is not None
+            and response.status_code in Retry.RETRY_AFTER_STATUS_CODES
+            and (retry_after := response.headers.get('Retry-After'))
+        ):
+            try:
+                return self.retry.parse_retry_after(retry_after)
+            except InvalidHeader:
+                pass
+
+        # No backoff before the first retry, as in urllib3
+        if retries <= 1:
+            return 0
+        return min(
+            self.retry.backoff_max,
+            self.retry.backoff_factor * 2 ** (retries - 1),
+        )
+
+
 class APINinjasClient:
+    _session = None
+    _session_lock = threading.Lock()
+    _async_clients = weakref.WeakKeyDictionary()
+    stats = RequestStats()
+
     def __init__(self):
         self.api_key = settings.API_NINJAS_API_KEY
         self.iban_validation_url = settings.API_NINJAS_IBAN_VALIDATION_URL
@@ -17,17 +116,178 @@ class APINinjasClient:
             'X-Api-Key': self.api_key,
         }
 
+    @property
+    def timeout(self):
+        return (
+            settings.API_NINJAS_CONNECT_TIMEOUT,
+            settings.API_NINJAS_READ_TIMEOUT,
+        )
+
+    @property
+    def circuit_breaker(self):
+        return CircuitBreaker(
+            'api-ninjas', **settings.API_NINJAS_CIRCUIT_BREAKER
+        )
+
+    @classmethod
+    def get_session(cls):
+        if cls._session is None:
+            with cls._session_lock:
+                if cls._session is None:
+                    cls._session = cls.create_session()
+        return cls._session
+
+    @classmethod
+    def create_retry(cls):
+        return Retry(
+            total=settings.API_NINJAS_MAX_RETRIES,
+            backoff_factor=settings.API_NINJAS_RETRY_BACKOFF_FACTOR,
+            status_forcelist=[502, 503, 504],
+            allowed_methods=['GET'],
+            raise_on_status=False,
+        )
+
+    @classmethod
+    def create_session(cls):
+        adapter = HTTPAdapter(
+            pool_connections=settings.API_NINJAS_POOL_CONNECTIONS,
+            pool_maxsize=settings.API_NINJAS_POOL_MAXSIZE,
+            max_retries=cls.create_retry(),
+        )
+
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    @classmethod
+    async def get_async_client(cls):
+        # httpx.AsyncClient is bound to the event loop it was first used in
+        loop = asyncio.get_running_loop()
+        if (entry := cls._async_clients.get(loop)) is None:
+            lifetime = cls._async_client_lifetime()
+            entry = cls._async_clients.setdefault(
+                loop, (await anext(lifetime), lifetime)
+            )
+        return entry[0]
+
+    @classmethod
+    async def _async_client_lifetime(cls):
+        # Closed when the event loop shuts down its async generators
+        async with cls.create_async_client() as client:
+            yield client
+
+    @classmethod
+    def create_async_client(cls):
+        transport = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=settings.API_NINJAS_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.API_NINJAS_POOL_MAXSIZE,
+            ),
+        )
+        return httpx.AsyncClient(
+            transport=AsyncRetryTransport(transport, cls.create_retry()),
+            timeout=httpx.Timeout(
+                settings.API_NINJAS_READ_TIMEOUT,
+                connect=settings.API_NINJAS_CONNECT_TIMEOUT,
+            ),
+        )
+
+    @classmethod
+    def get_stats(cls):
+        return cls.stats.as_dict() | {'pools': cls.get_pool_stats()}
+
+    @classmethod
+    def get_pool_stats(cls):
+        if cls._session is None:
+            return []
+
+        pool_stats = []
+        for adapter in set(cls._session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in pools.keys():
+                pool = pools[key]
+                pool_stats.append(
+                    {
+                        'host': pool.host,
+                        'maxsize': pool.pool.maxsize,
+                        'idle_connections': pool.pool.qsize(),
+                        'opened_connections': pool.num_connections,
+                        'requests': pool.num_requests,
+                    }
+                )
+        return pool_stats
+
     def make_request(self, url, method, params=None):
+        circuit_breaker = self.circuit_breaker
+        circuit_state = circuit_breaker.allow_request()
+        if circuit_state is None:
+            logger.warning(f'Request to {url} skipped, circuit is open.')
+            return None
+
+        start = time.perf_counter()
+        try:
+            response = self.get_session().request(
+                method,
+                url,
+                headers=self.headers,
+                params=params,
+                timeout=self.timeout,
+            )
+        except requests.exceptions.RequestException as e:
+            latency = time.perf_counter() - start
+            self.stats.record(latency, failed=True)
+            circuit_breaker.record(latency, failed=True, state=circuit_state)
+            logger.exception(e)
+            return None
+
+        latency = self.record_response(method, url, response, start)
+        circuit_breaker.record(
+            latency, failed=self.is_failure(response), state=circuit_state
+        )
+        return self.handle_response(response)
+
+    async def amake_request(self, url, method, params=None):
+        circuit_breaker = self.circuit_breaker
+        circuit_state = await circuit_breaker.aallow_request()
+        if circuit_state is None:
+            logger.warning(f'Request to {url} skipped, circuit is open.')
+            return None
+
+        client = await self.get_async_client()
+        start = time.perf_counter()
         try:
-            response = requests.request(
+            response = await client.request(
                 method, url, headers=self.headers, params=params
             )
-        except requests.exceptions.ConnectionError as e:
+        except httpx.HTTPError as e:
+            latency = time.perf_counter() - start
+            self.stats.record(latency, failed=True)
+            await circuit_breaker.arecord(
+                latency, failed=True, state=circuit_state
+            )
             logger.exception(e)
             return None
 
+        latency = self.record_response(method, url, response, start)
+        await circuit_breaker.arecord(
+            latency, failed=self.is_failure(response), state=circuit_state
+        )
         return self.handle_response(response)
 
+    def record_response(self, method, url, response, start):
+        latency = time.perf_counter() - start
+        self.stats.record(latency, failed=response.status_code >= 400)
+        logger.debug(
+            f'{method} request to {url} took {latency * 1000:.0f} ms '
+            f'with status code {response.status_code}.'
+        )
+        return latency
+
+    def is_failure(self, response):
+        # Client errors other than rate limiting don't open the circuit
+        return response.status_code >= 500 or response.status_code == 429
+
     def handle_response(self, response):
         if response.status_code >= 400:
             logger.error(
@@ -39,7 +299,7 @@ class APINinjasClient:
 
         try:
             return response.json()
-        except requests.exceptions.JSONDecodeError as e:
+        except (requests.exceptions.JSONDecodeError, json.JSONDecodeError) as e:
             logger.error(
                 f'Error parsing response for request to '
                 f'{response.request.url}: {e}'
@@ -50,3 +310,8 @@ class APINinjasClient:
         return self.make_request(
             self.iban_validation_url, 'GET', params={'iban': iban}
         )
+
+    async def avalidate_iban(self, iban):
+        return await self.amake_request(
+            self.iban_validation_url, 'GET', params={'iban': iban}
+        )
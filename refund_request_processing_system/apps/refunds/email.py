@@ -1,6 +1,21 @@
-from django.db import models
+from datetime import timedelta
 
-from apps.core.email import BaseEmailMessage
+from django.conf import settings
+from django.db import models, transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from apps.core.email import BaseEmailMessage, get_outbox_index
+from apps.core.enums import EmailPriority
+
+
+def get_refund_request_personal_context(refund_request, user):
+    return {
+        "first_name": user.first_name,
+        "refund_request_id": refund_request.id,
+        "refund_request_link": refund_request.full_link,
+        "order_number": refund_request.order_number,
+    }
 
 
 class RefundRequestStatusChangeEmailMessage(BaseEmailMessage):
@@ -8,18 +23,145 @@ class RefundRequestStatusChangeEmailMessage(BaseEmailMessage):
         'refunds.RefundRequest',
         on_delete=models.CASCADE,
         related_name="status_change_emails",
+        null=True,
+        blank=True,
     )
-    new_status = models.CharField(max_length=20)
+    new_status = models.CharField(max_length=20, blank=True)
+    is_digest = models.BooleanField(default=False)
+    refund_requests = models.ManyToManyField(
+        'refunds.RefundRequest',
+        related_name="status_change_digest_emails",
+        blank=True,
+    )
+
+    select_related_fields = ("refund_request",)
+    prefetch_related_fields = ("refund_requests",)
 
-    template_name = "refunds/emails/request_status_change"
+    @property
+    def template_name(self):
+        if self.is_digest:
+            return "refunds/emails/request_status_change_digest"
+        return "refunds/emails/request_status_change"
 
     @property
     def subject(self):
+        if self.is_digest:
+            return "Status update for your refund requests"
         return f"Status update for refund request #{self.refund_request.id}"
 
-    def get_email_context(self, user):
-        return {
-            "first_name": user.first_name,
-            "new_status": self.new_status,
-            "refund_request": self.refund_request,
-        }
+    @classmethod
+    def create_for_status_change(cls, refund_requests, status):
+        # Takes (refund request id, user id) pairs of changed refund requests
+        if settings.REFUND_STATUS_CHANGE_DIGEST_WINDOW:
+            return cls.add_to_digests(refund_requests)
+
+        return cls.bulk_create_with_recipients(
+            [
+                cls(refund_request_id=refund_request_id, new_status=status)
+                for refund_request_id, _ in refund_requests
+            ],
+            [[user_id] for _, user_id in refund_requests],
+        )
+
+    @classmethod
+    @transaction.atomic
+    def add_to_digests(cls, refund_requests):
+        user_ids = {user_id for _, user_id in refund_requests}
+        # Locked, so that the outbox worker skips them until they're updated
+        digest_ids = dict(
+            cls.objects.filter(
+                is_digest=True,
+                sent_at__isnull=True,
+                dead_at__isnull=True,
+                attempts=0,
+                recipients__in=user_ids,
+            )
+            .select_for_update(of=('self',))
+            .values_list('recipients', 'id')
+        )
+
+        new_digest_user_ids = [
+            user_id for user_id in user_ids if user_id not in digest_ids
+        ]
+        send_at = timezone.now() + timedelta(
+            seconds=settings.REFUND_STATUS_CHANGE_DIGEST_WINDOW
+        )
+        new_digests = cls.bulk_create_with_recipients(
+            [
+                cls(
+                    is_digest=True,
+                    next_attempt_at=send_at,
+                    priority=EmailPriority.LOW,
+                )
+                for _ in new_digest_user_ids
+            ],
+            [[user_id] for user_id in new_digest_user_ids],
+        )
+        for user_id, digest in zip(new_digest_user_ids, new_digests):
+            digest_ids[user_id] = digest.pk
+
+        through_model = cls.refund_requests.through
+        digest_field = f'{cls.refund_requests.field.m2m_field_name()}_id'
+        refund_request_field = (
+            f'{cls.refund_requests.field.m2m_reverse_field_name()}_id'
+        )
+        through_model.objects.bulk_create(
+            [
+                through_model(
+                    **{
+                        digest_field: digest_ids[user_id],
+                        refund_request_field: refund_request_id,
+                    }
+                )
+                for refund_request_id, user_id in refund_requests
+            ],
+            ignore_conflicts=True,
+        )
+        return new_digests
+
+    def get_shared_context(self):
+        if self.is_digest:
+            return {}
+        return {"new_status": self.new_status}
+
+    def get_personal_context(self, user):
+        if self.is_digest:
+            return {
+                "first_name": user.first_name,
+                "refund_requests": list(self.refund_requests.all()),
+            }
+        return get_refund_request_personal_context(self.refund_request, user)
+
+    def get_content(self, template_name, user):
+        # Digests list many refund requests, so they are rendered in full
+        if self.is_digest:
+            return render_to_string(template_name, self.get_email_context(user))
+        return super().get_content(template_name, user)
+
+    class Meta:
+        indexes = [get_outbox_index('status_change_email_outbox')]
+
+
+class IBANVerificationFailedEmailMessage(BaseEmailMessage):
+    refund_request = models.ForeignKey(
+        'refunds.RefundRequest',
+        on_delete=models.CASCADE,
+        related_name="iban_verification_failed_emails",
+    )
+    error = models.CharField(max_length=200)
+
+    select_related_fields = ("refund_request",)
+    template_name = "refunds/emails/iban_verification_failed"
+
+    @property
+    def subject(self):
+        return f"IBAN verification failed for refund request #{self.refund_request.id}"
+
+    def get_shared_context(self):
+        return {"error": self.error}
+
+    def get_personal_context(self, user):
+        return get_refund_request_personal_context(self.refund_request, user)
+
+    class Meta:
+        indexes = [get_outbox_index('iban_failed_email_outbox')]
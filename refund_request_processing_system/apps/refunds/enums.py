@@ -7,6 +7,24 @@ class RefundStatus(StrEnum):
     REJECTED = 'rejected'
 
 
+class RefundFacet(StrEnum):
+    STATUS = 'status'
+    COUNTRY = 'country'
+    CREATED_MONTH = 'created_month'
+
+
+class ExportFormat(StrEnum):
+    CSV = 'csv'
+    JSONL = 'jsonl'
+
+
+class ExportJobStatus(StrEnum):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
 class RefundReason(StrEnum):
     WRONG_PRODUCT = 'Wrong product'
     PRODUCT_DAMAGED = 'Product damaged'
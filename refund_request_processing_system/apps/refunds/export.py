@@ -0,0 +1,58 @@
+import csv
+import json
+import zlib
+
+from apps.refunds.enums import ExportFormat
+
+
+class Echo:
+    # File-like object for csv.writer, returning written rows instead
+    def write(self, value):
+        return value
+
+
+def iter_export_rows(resource, queryset, chunk_size):
+    for instance in queryset.iterator(chunk_size=chunk_size):
+        yield resource.export_resource(instance)
+
+
+def iter_csv(headers, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def iter_jsonl(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, row)), default=str) + '\n'
+
+
+EXPORT_SERIALIZERS = {
+    ExportFormat.CSV: iter_csv,
+    ExportFormat.JSONL: iter_jsonl,
+}
+
+
+def iter_encoded(chunks, buffer_size):
+    # Single rows are too small to be sent or compressed separately
+    buffer = []
+    buffered_size = 0
+    for chunk in chunks:
+        chunk = chunk.encode()
+        buffer.append(chunk)
+        buffered_size += len(chunk)
+        if buffered_size >= buffer_size:
+            yield b''.join(buffer)
+            buffer = []
+            buffered_size = 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def iter_gzipped(blocks):
+    compressor = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+    for block in blocks:
+        if compressed := compressor.compress(block):
+            yield compressed
+    yield compressor.flush()
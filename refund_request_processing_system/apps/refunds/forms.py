@@ -1,10 +1,11 @@
 from contextlib import suppress
 
 from django import forms
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
 from apps.core.mixins import BootstrapFormMixin
-from apps.refunds.enums import RefundReason
+from apps.refunds.enums import ExportFormat, RefundReason
 from apps.refunds.models import RefundRequest
 from apps.refunds.utils import IBANValidator
 
@@ -95,14 +96,26 @@ class RefundRequestForm(BootstrapFormMixin, forms.ModelForm):
     def _custom_clean_iban(self, cleaned_data):
         iban = cleaned_data.get('iban')
         country = cleaned_data.get('country')
+        if not iban or not country:
+            return
 
         iban_validator = IBANValidator(iban, country)
         with suppress(RuntimeError):
-            if error := iban_validator.get_error():
+            error = self._get_iban_error(iban_validator)
+            if error == IBANValidator.NOT_CACHED:
+                return
+            if error:
                 raise ValidationError(error, code='invalid')
 
+            # Includes IBANs accepted by the 'local' fallback
             self.instance.iban_verified = True
 
+    def _get_iban_error(self, iban_validator):
+        # Uncached IBANs are verified later by the `verify_ibans` command
+        if settings.IBAN_DEFERRED_VERIFICATION:
+            return iban_validator.get_cached_error()
+        return iban_validator.get_error()
+
     def _custom_clean_reason(self, cleaned_data):
         reason_choice = cleaned_data.get('reason_choice')
         other_reason = cleaned_data.get('other_reason')
@@ -114,3 +127,14 @@ class RefundRequestForm(BootstrapFormMixin, forms.ModelForm):
                 self.instance.reason = other_reason
         else:
             self.instance.reason = reason_choice
+
+
+class ExportJobForm(forms.Form):
+    format = forms.ChoiceField(
+        choices=[
+            (export_format, export_format.upper())
+            for export_format in ExportFormat
+        ],
+        initial=ExportFormat.CSV,
+        widget=forms.RadioSelect,
+    )
@@ -0,0 +1,174 @@
+import re
+
+INVALID_IBAN_ERROR = 'Provided number is not a valid IBAN.'
+COUNTRY_MISMATCH_ERROR = (
+    'Provided IBAN number comes from {iban_country}, '
+    'while {country} was provided.'
+)
+
+# BBAN formats from the SWIFT IBAN registry: n - digits, a - letters, c - both
+IBAN_BBAN_FORMATS = {
+    'AD': '4n4n12c',
+    'AE': '3n16n',
+    'AL': '8n16c',
+    'AT': '16n',
+    'AZ': '4a20c',
+    'BA': '16n',
+    'BE': '12n',
+    'BG': '4a6n8c',
+    'BH': '4a14c',
+    'BI': '23n',
+    'BR': '23n1a1c',
+    'BY': '4c4n16c',
+    'CH': '5n12c',
+    'CR': '18n',
+    'CY': '8n16c',
+    'CZ': '20n',
+    'DE': '18n',
+    'DJ': '23n',
+    'DK': '14n',
+    'DO': '4c20n',
+    'EE': '16n',
+    'EG': '25n',
+    'ES': '20n',
+    'FI': '14n',
+    'FK': '2a12n',
+    'FO': '14n',
+    'FR': '10n11c2n',
+    'GB': '4a14n',
+    'GE': '2a16n',
+    'GI': '4a15c',
+    'GL': '14n',
+    'GR': '7n16c',
+    'GT': '4c20c',
+    'HN': '4a20n',
+    'HR': '17n',
+    'HU': '24n',
+    'IE': '4a14n',
+    'IL': '19n',
+    'IQ': '4a15n',
+    'IS': '22n',
+    'IT': '1a10n12c',
+    'JO': '4a4n18c',
+    'KW': '4a22c',
+    'KZ': '3n13c',
+    'LB': '4n20c',
+    'LC': '4a24c',
+    'LI': '5n12c',
+    'LT': '16n',
+    'LU': '3n13c',
+    'LV': '4a13c',
+    'LY': '21n',
+    'MC': '10n11c2n',
+    'MD': '20c',
+    'ME': '18n',
+    'MK': '3n10c2n',
+    'MN': '16n',
+    'MR': '23n',
+    'MT': '4a5n18c',
+    'MU': '4a19n3a',
+    'NI': '4a20n',
+    'NL': '4a10n',
+    'NO': '11n',
+    'OM': '3n16c',
+    'PK': '4a16c',
+    'PL': '24n',
+    'PS': '4a21c',
+    'PT': '21n',
+    'QA': '4a21c',
+    'RO': '4a16c',
+    'RS': '18n',
+    'RU': '14n15c',
+    'SA': '2n18c',
+    'SC': '4a20n3a',
+    'SD': '14n',
+    'SE': '20n',
+    'SI': '15n',
+    'SK': '20n',
+    'SM': '1a10n12c',
+    'SO': '19n',
+    'ST': '21n',
+    'SV': '4a20n',
+    'TL': '19n',
+    'TN': '20n',
+    'TR': '6n16c',
+    'UA': '6n19c',
+    'VA': '18n',
+    'VG': '4a16n',
+    'XK': '16n',
+    'YE': '4a4n18c',
+}
+
+BBAN_CHARACTER_CLASSES = {'n': '[0-9]', 'a': '[A-Z]', 'c': '[0-9A-Z]'}
+
+
+def compile_bban_format(bban_format):
+    return re.compile(
+        ''.join(
+            f'{BBAN_CHARACTER_CLASSES[character_type]}{{{length}}}'
+            for length, character_type in re.findall(
+                r'(\d+)([nac])', bban_format
+            )
+        )
+    )
+
+
+IBAN_BBAN_PATTERNS = {
+    country_code: compile_bban_format(bban_format)
+    for country_code, bban_format in IBAN_BBAN_FORMATS.items()
+}
+
+
+def canonicalize_iban(iban):
+    return ''.join((iban or '').split()).upper()
+
+
+def canonicalize_country(country):
+    return ' '.join((country or '').split()).upper()
+
+
+def build_iban(country_code, bban):
+    # Computes check digits for the given country code and BBAN
+    numeric_iban = ''.join(
+        str(int(char, 36)) for char in f'{bban}{country_code}00'
+    )
+    return f'{country_code}{98 - int(numeric_iban) % 97:02d}{bban}'
+
+
+class LocalIBANValidator:
+    IBAN_PATTERN = re.compile(r'[A-Z]{2}[0-9]{2}[0-9A-Z]+')
+
+    def __init__(self, iban, country):
+        self.iban = canonicalize_iban(iban)
+        self.country = canonicalize_country(country)
+
+    @property
+    def iban_country(self):
+        return self.iban[:2]
+
+    def get_error(self):
+        if not self.is_valid():
+            return INVALID_IBAN_ERROR
+
+        if self.iban_country != self.country:
+            return COUNTRY_MISMATCH_ERROR.format(
+                iban_country=self.iban_country, country=self.country
+            )
+
+        return None
+
+    def is_valid(self):
+        if not self.IBAN_PATTERN.fullmatch(self.iban):
+            return False
+
+        bban_pattern = IBAN_BBAN_PATTERNS.get(self.iban_country)
+        if bban_pattern is None or not bban_pattern.fullmatch(self.iban[4:]):
+            return False
+
+        return self.has_valid_checksum()
+
+    def has_valid_checksum(self):
+        # ISO 7064 MOD 97-10
+        rearranged_iban = self.iban[4:] + self.iban[:4]
+        numeric_iban = ''.join(str(int(char, 36)) for char in rearranged_iban)
+        return int(numeric_iban) % 97 == 1
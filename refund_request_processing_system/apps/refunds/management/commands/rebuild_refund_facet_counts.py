@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from apps.refunds.models import RefundRequestFacetCount
+
+
+class Command(BaseCommand):
+    help = (
+        'Recounts refund requests by status, country and creation month, '
+        'used by the admin list filters.'
+    )
+
+    def handle(self, *args, **options):
+        RefundRequestFacetCount.rebuild()
+        self.stdout.write(
+            f'Rebuilt {RefundRequestFacetCount.objects.count()} facet counts.'
+        )
@@ -0,0 +1,86 @@
+import tempfile
+import time
+from logging import getLogger
+
+from django.conf import settings
+from django.contrib import admin
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from apps.core.paginator import EstimatedCountPaginator
+from apps.refunds.admin import RefundRequestResource
+from apps.refunds.enums import ExportJobStatus
+from apps.refunds.export import (
+    EXPORT_SERIALIZERS,
+    iter_encoded,
+    iter_export_rows,
+    iter_gzipped,
+)
+from apps.refunds.models import ExportJob, RefundRequest
+
+logger = getLogger('django')
+
+
+class Command(BaseCommand):
+    help = 'Runs refund request export jobs requested in the admin.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Run pending jobs once and exit, instead of polling.',
+        )
+
+    def handle(self, *args, **options):
+        # Several workers can run at once, each running one job at a time
+        model_admin = admin.site.get_model_admin(RefundRequest)
+        while True:
+            while export_job := ExportJob.claim():
+                self.run(export_job, model_admin)
+            if options['once']:
+                return
+
+            close_old_connections()
+            time.sleep(settings.EXPORT_JOB_POLL_INTERVAL)
+
+    def run(self, export_job, model_admin):
+        try:
+            queryset = model_admin.get_export_job_queryset(export_job)
+            export_job.total_rows = EstimatedCountPaginator(queryset, 1).count
+            export_job.save(update_fields=['total_rows'])
+
+            resource = RefundRequestResource()
+            rows = export_job.track_progress(
+                iter_export_rows(
+                    resource, queryset, settings.EXPORT_CHUNK_SIZE
+                ),
+                settings.EXPORT_CHUNK_SIZE,
+            )
+            content = iter_gzipped(
+                iter_encoded(
+                    EXPORT_SERIALIZERS[export_job.format](
+                        resource.get_export_headers(), rows
+                    ),
+                    settings.EXPORT_BUFFER_SIZE,
+                )
+            )
+            with tempfile.TemporaryFile() as file:
+                for block in content:
+                    file.write(block)
+                export_job.file.save(
+                    export_job.get_filename(), File(file), save=False
+                )
+            export_job.status = ExportJobStatus.DONE
+        except Exception as e:
+            logger.exception(f'Export #{export_job.id} failed.')
+            export_job.status = ExportJobStatus.FAILED
+            export_job.error = str(e)
+
+        export_job.finished_at = timezone.now()
+        export_job.save()
+        self.stdout.write(
+            f'Export #{export_job.id}: {export_job.status}, '
+            f'{export_job.exported_rows} rows.'
+        )
@@ -0,0 +1,51 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from apps.refunds.models import RefundRequest
+from apps.refunds.utils import verify_refund_request_ibans
+
+
+class Command(BaseCommand):
+    help = 'Verifies IBANs of refund requests saved as not verified.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process the queue once and exit, instead of polling it.',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.IBAN_VERIFICATION_BATCH_SIZE,
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            self.process_queue(options['batch_size'])
+            if options['once']:
+                return
+
+            close_old_connections()
+            time.sleep(settings.IBAN_VERIFICATION_POLL_INTERVAL)
+
+    def process_queue(self, batch_size):
+        # Refund requests which couldn't be validated stay in the queue
+        last_id = 0
+        while refund_requests := list(
+            RefundRequest.objects.filter(
+                iban_verified=False, iban_verification_error='', id__gt=last_id
+            ).order_by('id')[:batch_size]
+        ):
+            verified_ids, errors, unavailable_ids = verify_refund_request_ibans(
+                refund_requests
+            )
+            last_id = refund_requests[-1].id
+
+            self.stdout.write(
+                f'Verified: {len(verified_ids)}, invalid: {len(errors)}, '
+                f'unavailable: {len(unavailable_ids)}.'
+            )
@@ -0,0 +1,46 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refunds', '0003_alter_refundrequest_options_refundrequest_notes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IBANVerificationFailedEmailMessage',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('error', models.CharField(max_length=200)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.AddField(
+            model_name='refundrequest',
+            name='iban_verification_error',
+            field=models.CharField(blank=True, max_length=200),
+        ),
+        migrations.AddIndex(
+            model_name='refundrequest',
+            index=models.Index(condition=models.Q(('iban_verification_error', ''), ('iban_verified', False)), fields=['id'], name='refund_iban_verification_queue'),
+        ),
+        migrations.AddField(
+            model_name='ibanverificationfailedemailmessage',
+            name='recipients',
+            field=models.ManyToManyField(to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='ibanverificationfailedemailmessage',
+            name='refund_request',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='iban_verification_failed_emails', to='refunds.refundrequest'),
+        ),
+    ]
@@ -0,0 +1,64 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:10
+
+import hashlib
+
+from django.db import migrations, models
+
+
+def backfill_iban_verifications(apps, schema_editor):
+    # IBANs of refund requests verified so far were validated by the
+    # external service, so they are stored as verified at the last update.
+    RefundRequest = apps.get_model('refunds', 'RefundRequest')
+    IBANVerification = apps.get_model('refunds', 'IBANVerification')
+
+    verified_at_by_key = {}
+    refund_requests = RefundRequest.objects.filter(
+        iban_verified=True
+    ).values_list('iban', 'country', 'updated_at')
+    for iban, country, updated_at in refund_requests.iterator():
+        iban = ''.join(iban.split()).upper()
+        country = ' '.join(country.split()).upper()
+        key = (hashlib.sha256(iban.encode()).hexdigest(), country)
+        verified_at_by_key[key] = max(
+            updated_at, verified_at_by_key.get(key, updated_at)
+        )
+
+    IBANVerification.objects.bulk_create(
+        [
+            IBANVerification(
+                iban_hash=iban_hash,
+                country=country,
+                is_valid=True,
+                verified_at=verified_at,
+            )
+            for (iban_hash, country), verified_at in verified_at_by_key.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refunds', '0004_refundrequest_iban_verification_error'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IBANVerification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('iban_hash', models.CharField(max_length=64)),
+                ('country', models.CharField(max_length=100)),
+                ('is_valid', models.BooleanField()),
+                ('error', models.CharField(blank=True, max_length=200)),
+                ('verified_at', models.DateTimeField()),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('iban_hash', 'country'), name='unique_iban_verification')],
+            },
+        ),
+        migrations.RunPython(
+            backfill_iban_verifications, migrations.RunPython.noop
+        ),
+    ]
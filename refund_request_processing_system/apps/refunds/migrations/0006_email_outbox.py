@@ -0,0 +1,64 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:16
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refunds', '0005_ibanverification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ibanverificationfailedemailmessage',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='ibanverificationfailedemailmessage',
+            name='dead_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ibanverificationfailedemailmessage',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='ibanverificationfailedemailmessage',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddField(
+            model_name='refundrequeststatuschangeemailmessage',
+            name='attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='refundrequeststatuschangeemailmessage',
+            name='dead_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='refundrequeststatuschangeemailmessage',
+            name='last_error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='refundrequeststatuschangeemailmessage',
+            name='next_attempt_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.AddIndex(
+            model_name='ibanverificationfailedemailmessage',
+            index=models.Index(condition=models.Q(('dead_at__isnull', True), ('sent_at__isnull', True)), fields=['next_attempt_at'], name='iban_failed_email_outbox'),
+        ),
+        migrations.AddIndex(
+            model_name='refundrequeststatuschangeemailmessage',
+            index=models.Index(condition=models.Q(('dead_at__isnull', True), ('sent_at__isnull', True)), fields=['next_attempt_at'], name='status_change_email_outbox'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refunds', '0006_email_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='refundrequeststatuschangeemailmessage',
+            name='is_digest',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='refundrequeststatuschangeemailmessage',
+            name='refund_requests',
+            field=models.ManyToManyField(blank=True, related_name='status_change_digest_emails', to='refunds.refundrequest'),
+        ),
+        migrations.AlterField(
+            model_name='refundrequeststatuschangeemailmessage',
+            name='new_status',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='refundrequeststatuschangeemailmessage',
+            name='refund_request',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='status_change_emails', to='refunds.refundrequest'),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:25
+
+from django.conf import settings
+from django.db import migrations, models
+
+import apps.core.enums
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refunds', '0007_status_change_digest'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='ibanverificationfailedemailmessage',
+            name='iban_failed_email_outbox',
+        ),
+        migrations.RemoveIndex(
+            model_name='refundrequeststatuschangeemailmessage',
+            name='status_change_email_outbox',
+        ),
+        migrations.AddField(
+            model_name='ibanverificationfailedemailmessage',
+            name='priority',
+            field=models.PositiveSmallIntegerField(default=apps.core.enums.EmailPriority['NORMAL']),
+        ),
+        migrations.AddField(
+            model_name='refundrequeststatuschangeemailmessage',
+            name='priority',
+            field=models.PositiveSmallIntegerField(default=apps.core.enums.EmailPriority['NORMAL']),
+        ),
+        migrations.AddIndex(
+            model_name='ibanverificationfailedemailmessage',
+            index=models.Index(condition=models.Q(('dead_at__isnull', True), ('sent_at__isnull', True)), fields=['priority', 'next_attempt_at'], name='iban_failed_email_outbox'),
+        ),
+        migrations.AddIndex(
+            model_name='refundrequeststatuschangeemailmessage',
+            index=models.Index(condition=models.Q(('dead_at__isnull', True), ('sent_at__isnull', True)), fields=['priority', 'next_attempt_at'], name='status_change_email_outbox'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:27
+
+from django.conf import settings
+from django.db import migrations, models
+
+import apps.refunds.enums
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refunds', '0008_email_priority'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='refundrequest',
+            name='status_order',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(status=apps.refunds.enums.RefundStatus['PENDING'], then=models.Value(1)), models.When(status=apps.refunds.enums.RefundStatus['APPROVED'], then=models.Value(2)), models.When(status=apps.refunds.enums.RefundStatus['REJECTED'], then=models.Value(3))), output_field=models.PositiveSmallIntegerField()),
+        ),
+    ]
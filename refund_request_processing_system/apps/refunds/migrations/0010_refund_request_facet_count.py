@@ -0,0 +1,66 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:30
+
+from django.db import migrations, models
+from django.db.models.functions import TruncMonth
+
+import apps.refunds.enums
+
+
+def backfill_facet_counts(apps, schema_editor):
+    RefundRequest = apps.get_model('refunds', 'RefundRequest')
+    RefundRequestFacetCount = apps.get_model(
+        'refunds', 'RefundRequestFacetCount'
+    )
+
+    refund_requests = RefundRequest.objects.order_by()
+    counts = [
+        ('status', status, count)
+        for status, count in refund_requests.values_list('status').annotate(
+            count=models.Count('id')
+        )
+    ]
+    counts += [
+        ('country', country, count)
+        for country, count in refund_requests.values_list('country').annotate(
+            count=models.Count('id')
+        )
+    ]
+    counts += [
+        ('created_month', month.strftime('%Y-%m'), count)
+        for month, count in refund_requests.annotate(
+            month=TruncMonth('created_at')
+        )
+        .values_list('month')
+        .annotate(count=models.Count('id'))
+    ]
+
+    RefundRequestFacetCount.objects.bulk_create(
+        [
+            RefundRequestFacetCount(facet=facet, value=value, count=count)
+            for facet, value, count in counts
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refunds', '0009_refund_request_status_order'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RefundRequestFacetCount',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('facet', models.CharField(choices=[(apps.refunds.enums.RefundFacet['STATUS'], apps.refunds.enums.RefundFacet['STATUS']), (apps.refunds.enums.RefundFacet['COUNTRY'], apps.refunds.enums.RefundFacet['COUNTRY']), (apps.refunds.enums.RefundFacet['CREATED_MONTH'], apps.refunds.enums.RefundFacet['CREATED_MONTH'])], max_length=20)),
+                ('value', models.CharField(max_length=100)),
+                ('count', models.IntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('facet', 'value'), name='unique_refund_facet_value')],
+            },
+        ),
+        migrations.RunPython(backfill_facet_counts, migrations.RunPython.noop),
+    ]
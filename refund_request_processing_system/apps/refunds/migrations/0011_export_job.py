@@ -0,0 +1,37 @@
+# Generated by Django 5.1.15 on 2026-10-18 15:35
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+import apps.refunds.enums
+import apps.refunds.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('refunds', '0010_refund_request_facet_count'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('format', models.CharField(choices=[(apps.refunds.enums.ExportFormat['CSV'], apps.refunds.enums.ExportFormat['CSV']), (apps.refunds.enums.ExportFormat['JSONL'], apps.refunds.enums.ExportFormat['JSONL'])], max_length=10)),
+                ('query_string', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[(apps.refunds.enums.ExportJobStatus['PENDING'], apps.refunds.enums.ExportJobStatus['PENDING']), (apps.refunds.enums.ExportJobStatus['RUNNING'], apps.refunds.enums.ExportJobStatus['RUNNING']), (apps.refunds.enums.ExportJobStatus['DONE'], apps.refunds.enums.ExportJobStatus['DONE']), (apps.refunds.enums.ExportJobStatus['FAILED'], apps.refunds.enums.ExportJobStatus['FAILED'])], default=apps.refunds.enums.ExportJobStatus['PENDING'], max_length=10)),
+                ('total_rows', models.PositiveBigIntegerField(blank=True, null=True)),
+                ('exported_rows', models.PositiveBigIntegerField(default=0)),
+                ('file', models.FileField(blank=True, storage=apps.refunds.models.get_export_storage, upload_to='')),
+                ('error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
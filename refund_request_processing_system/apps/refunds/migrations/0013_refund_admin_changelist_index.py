@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # The index is created without locking the table for writes
+    atomic = False
+
+    dependencies = [
+        ('refunds', '0012_refund_request_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='refundrequest',
+            index=models.Index(fields=['status_order', '-created_at', '-id'], name='refund_admin_changelist'),
+        ),
+    ]
@@ -1,10 +1,38 @@
+import operator
+from collections import Counter
+from datetime import timedelta
+from functools import reduce
+
 from django.conf import settings
 from django.contrib.auth.models import User
-from django.db import models
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.core.files.storage import FileSystemStorage
+from django.db import connection, models, transaction
+from django.db.models.functions import TruncMonth, Upper
 from django.urls import reverse
+from django.utils import timezone
+
+from apps.refunds.email import (
+    IBANVerificationFailedEmailMessage,
+    RefundRequestStatusChangeEmailMessage,
+)
+from apps.refunds.enums import (
+    ExportFormat,
+    ExportJobStatus,
+    RefundFacet,
+    RefundStatus,
+)
 
-from apps.refunds.email import RefundRequestStatusChangeEmailMessage
-from apps.refunds.enums import RefundStatus
+# Fields searched in the refunds admin, see the refund_request_search index
+REFUND_REQUEST_SEARCH_FIELDS = [
+    'order_number',
+    'email',
+    'first_name',
+    'last_name',
+    'iban',
+    'products',
+    'notes',
+]
 
 
 class RefundRequest(models.Model):
@@ -41,6 +69,7 @@ class RefundRequest(models.Model):
     )
     iban = models.CharField(max_length=34)
     iban_verified = models.BooleanField(default=False)
+    iban_verification_error = models.CharField(max_length=200, blank=True)
 
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -48,6 +77,16 @@ class RefundRequest(models.Model):
         max_length=20, choices=STATUS_CHOICES, default='pending'
     )
     notes = models.TextField(blank=True)
+    # Pending first, stored to be indexed
+    status_order = models.GeneratedField(
+        expression=models.Case(
+            models.When(status=RefundStatus.PENDING, then=models.Value(1)),
+            models.When(status=RefundStatus.APPROVED, then=models.Value(2)),
+            models.When(status=RefundStatus.REJECTED, then=models.Value(3)),
+        ),
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+    )
 
     def __str__(self):
         return f"Refund #{self.id} - {self.order_number} - {self.status}"
@@ -56,13 +95,290 @@ class RefundRequest(models.Model):
     def full_link(self):
         return settings.BASE_URL + reverse('refund_detail', args=[self.id])
 
-    def emit_status_change_email(self):
-        email_message = RefundRequestStatusChangeEmailMessage.objects.create(
-            refund_request=self,
-            new_status=self.status,
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
+    @classmethod
+    @transaction.atomic
+    def bulk_change_status(cls, queryset, status):
+        # Returns ids of the changed refund requests
+        changed_refund_requests = list(
+            queryset.exclude(status=status)
+            .order_by()
+            .select_for_update()
+            .values_list('id', 'user_id', 'status')
+        )
+        changed_ids = [
+            refund_request_id
+            for refund_request_id, _, _ in changed_refund_requests
+        ]
+        if not changed_ids:
+            return changed_ids
+
+        cls.objects.filter(id__in=changed_ids).update(status=status)
+        RefundRequestStatusChangeEmailMessage.create_for_status_change(
+            [
+                (refund_request_id, user_id)
+                for refund_request_id, user_id, _ in changed_refund_requests
+            ],
+            status,
+        )
+
+        facet_deltas = Counter()
+        for _, _, old_status in changed_refund_requests:
+            facet_deltas[(RefundFacet.STATUS, old_status)] -= 1
+        facet_deltas[(RefundFacet.STATUS, status)] += len(changed_ids)
+        RefundRequestFacetCount.update_counts(facet_deltas)
+        return changed_ids
+
+    @staticmethod
+    def emit_iban_verification_failed_emails(refund_requests):
+        IBANVerificationFailedEmailMessage.bulk_create_with_recipients(
+            [
+                IBANVerificationFailedEmailMessage(
+                    refund_request=refund_request,
+                    error=refund_request.iban_verification_error,
+                )
+                for refund_request in refund_requests
+            ],
+            [[refund_request.user_id] for refund_request in refund_requests],
         )
-        email_message.recipients.add(self.user)
-        email_message.send()
+
+    def get_facet_values(self):
+        return [
+            (RefundFacet.STATUS, self.status),
+            (RefundFacet.COUNTRY, self.country),
+            (
+                RefundFacet.CREATED_MONTH,
+                timezone.localtime(self.created_at).strftime('%Y-%m'),
+            ),
+        ]
 
     class Meta:
         ordering = ('-created_at',)
+        indexes = [
+            # Queue of IBANs awaiting verification by the worker
+            models.Index(
+                fields=['id'],
+                condition=models.Q(
+                    iban_verified=False, iban_verification_error=''
+                ),
+                name='refund_iban_verification_queue',
+            ),
+            # The admin adds the primary key to the ordering
+            models.Index(
+                fields=['status_order', '-created_at', '-id'],
+                name='refund_admin_changelist',
+            ),
+            # The admin searches with UPPER(field) LIKE UPPER('%term%')
+            GinIndex(
+                *[
+                    OpClass(Upper(field), name='gin_trgm_ops')
+                    for field in REFUND_REQUEST_SEARCH_FIELDS
+                ],
+                name='refund_request_search',
+            ),
+        ]
+
+
+class RefundRequestFacetCount(models.Model):
+    facet = models.CharField(
+        max_length=20, choices=[(facet, facet) for facet in RefundFacet]
+    )
+    value = models.CharField(max_length=100)
+    count = models.IntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.facet}: {self.value} ({self.count})"
+
+    @classmethod
+    def update_counts(cls, deltas):
+        # Takes a mapping of (facet, value) pairs to count changes
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        cls.objects.bulk_create(
+            [cls(facet=facet, value=value) for facet, value in deltas],
+            ignore_conflicts=True,
+        )
+        conditions = {
+            key: models.Q(facet=key[0], value=key[1]) for key in deltas
+        }
+        cls.objects.filter(reduce(operator.or_, conditions.values())).update(
+            count=models.F('count')
+            + models.Case(
+                *[
+                    models.When(condition, then=models.Value(deltas[key]))
+                    for key, condition in conditions.items()
+                ],
+                output_field=models.IntegerField(),
+            )
+        )
+
+    @classmethod
+    def get_counts(cls, facet):
+        return dict(
+            cls.objects.filter(facet=facet, count__gt=0).values_list(
+                'value', 'count'
+            )
+        )
+
+    @classmethod
+    @transaction.atomic
+    def rebuild(cls):
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'LOCK TABLE {RefundRequest._meta.db_table} IN SHARE MODE'
+                )
+        refund_requests = RefundRequest.objects.order_by()
+        counts = [
+            (RefundFacet.STATUS, status, count)
+            for status, count in refund_requests.values_list('status').annotate(
+                count=models.Count('id')
+            )
+        ]
+        counts += [
+            (RefundFacet.COUNTRY, country, count)
+            for country, count in refund_requests.values_list(
+                'country'
+            ).annotate(count=models.Count('id'))
+        ]
+        counts += [
+            (RefundFacet.CREATED_MONTH, month.strftime('%Y-%m'), count)
+            for month, count in refund_requests.annotate(
+                month=TruncMonth('created_at')
+            )
+            .values_list('month')
+            .annotate(count=models.Count('id'))
+        ]
+
+        cls.objects.all().delete()
+        cls.objects.bulk_create(
+            cls(facet=facet, value=value, count=count)
+            for facet, value, count in counts
+        )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['facet', 'value'], name='unique_refund_facet_value'
+            ),
+        ]
+
+
+class IBANVerification(models.Model):
+    # SHA-256 hash of the canonical IBAN
+    iban_hash = models.CharField(max_length=64)
+    country = models.CharField(max_length=100)
+    is_valid = models.BooleanField()
+    error = models.CharField(max_length=200, blank=True)
+    verified_at = models.DateTimeField()
+
+    def __str__(self):
+        return f"IBAN verification - {self.country} - {self.verified_at}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['iban_hash', 'country'],
+                name='unique_iban_verification',
+            ),
+        ]
+
+
+def get_export_storage():
+    return FileSystemStorage(location=settings.EXPORT_ROOT)
+
+
+class ExportJob(models.Model):
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name='export_jobs'
+    )
+    format = models.CharField(
+        max_length=10,
+        choices=[
+            (export_format, export_format) for export_format in ExportFormat
+        ],
+    )
+    query_string = models.TextField(blank=True)
+    status = models.CharField(
+        max_length=10,
+        choices=[(status, status) for status in ExportJobStatus],
+        default=ExportJobStatus.PENDING,
+    )
+    total_rows = models.PositiveBigIntegerField(null=True, blank=True)
+    exported_rows = models.PositiveBigIntegerField(default=0)
+    file = models.FileField(storage=get_export_storage, blank=True)
+    error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Updated with the progress, so that jobs of dead workers are retried
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Export #{self.id} - {self.format} - {self.status}"
+
+    @property
+    def progress(self):
+        if self.status == ExportJobStatus.DONE:
+            return 100
+        if not self.total_rows:
+            return 0
+        # Total rows of large exports are estimated
+        return min(99, 100 * self.exported_rows // self.total_rows)
+
+    @classmethod
+    @transaction.atomic
+    def claim(cls):
+        # Includes running jobs of workers which stopped reporting progress
+        now = timezone.now()
+        job = (
+            cls.objects.filter(
+                models.Q(status=ExportJobStatus.PENDING)
+                | models.Q(
+                    status=ExportJobStatus.RUNNING,
+                    heartbeat_at__lt=now
+                    - timedelta(seconds=settings.EXPORT_JOB_TIMEOUT),
+                )
+            )
+            .select_for_update(skip_locked=True)
+            .order_by('created_at')
+            .first()
+        )
+        if job is not None:
+            job.status = ExportJobStatus.RUNNING
+            job.started_at = job.heartbeat_at = now
+            job.exported_rows = 0
+            job.save(
+                update_fields=[
+                    'status',
+                    'started_at',
+                    'heartbeat_at',
+                    'exported_rows',
+                ]
+            )
+        return job
+
+    def track_progress(self, rows, interval):
+        # Passes the rows through, saving their count every `interval` rows
+        for row in rows:
+            yield row
+            self.exported_rows += 1
+            if self.exported_rows % interval == 0:
+                self.heartbeat_at = timezone.now()
+                ExportJob.objects.filter(pk=self.pk).update(
+                    exported_rows=self.exported_rows,
+                    heartbeat_at=self.heartbeat_at,
+                )
+
+    def get_filename(self):
+        created_at = timezone.localtime(self.created_at)
+        return (
+            f'RefundRequest-{created_at.strftime("%Y-%m-%d")}-{self.pk}'
+            f'.{self.format}.gz'
+        )
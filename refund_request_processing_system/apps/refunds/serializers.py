@@ -1,3 +1,4 @@
+from django.conf import settings
 from rest_framework import serializers
 
 
@@ -7,3 +8,12 @@ class IBANSerializer(serializers.Serializer):
 
     class Meta:
         fields = ('iban', 'country')
+
+
+class IBANBatchSerializer(serializers.Serializer):
+    items = IBANSerializer(
+        many=True, allow_empty=False, max_length=settings.IBAN_BATCH_MAX_SIZE
+    )
+
+    class Meta:
+        fields = ('items',)
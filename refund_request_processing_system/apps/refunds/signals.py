@@ -0,0 +1,56 @@
+from collections import Counter
+
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from apps.refunds.models import (
+    ExportJob,
+    RefundRequest,
+    RefundRequestFacetCount,
+)
+
+FACET_FIELDS = {'status', 'country', 'created_at'}
+
+
+def counts_facets(update_fields):
+    return update_fields is None or not FACET_FIELDS.isdisjoint(update_fields)
+
+
+@receiver(pre_save, sender=RefundRequest)
+def load_stored_facet_values(sender, instance, update_fields, **kwargs):
+    # The instance may be stale or not loaded from the database
+    instance._stored_facet_values = []
+    if instance.pk is None or not counts_facets(update_fields):
+        return
+
+    stored_instance = (
+        RefundRequest.objects.filter(pk=instance.pk)
+        .only(*FACET_FIELDS)
+        .select_for_update()
+        .first()
+    )
+    if stored_instance:
+        instance._stored_facet_values = stored_instance.get_facet_values()
+
+
+@receiver(post_save, sender=RefundRequest)
+def count_saved_refund_request(sender, instance, update_fields, **kwargs):
+    if not counts_facets(update_fields):
+        return
+
+    deltas = Counter(instance.get_facet_values())
+    deltas.subtract(instance._stored_facet_values)
+    RefundRequestFacetCount.update_counts(deltas)
+
+
+@receiver(post_delete, sender=RefundRequest)
+def count_deleted_refund_request(sender, instance, **kwargs):
+    RefundRequestFacetCount.update_counts(
+        Counter({key: -1 for key in instance.get_facet_values()})
+    )
+
+
+@receiver(post_delete, sender=ExportJob)
+def delete_export_file(sender, instance, **kwargs):
+    if instance.file:
+        instance.file.delete(save=False)
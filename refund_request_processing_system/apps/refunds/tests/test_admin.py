@@ -1,16 +1,26 @@
+import csv
+import gzip
+import io
+from unittest import skipUnless
 from unittest.mock import patch
 
 from django.contrib.admin.sites import AdminSite
 from django.contrib.auth.models import User
+from django.db import DatabaseError, connection
+from django.forms.models import model_to_dict
 from django.test import RequestFactory, TestCase
+from django.urls import reverse
+from django.utils import timezone
 from django.utils.safestring import SafeString
 
-from apps.refunds.admin import RefundRequestAdmin
-from apps.refunds.enums import RefundStatus
-from apps.refunds.models import RefundRequest
+from apps.core.mixins import FlushRedisDBTestMixin
+from apps.refunds.admin import RefundRequestAdmin, RefundRequestResource
+from apps.refunds.email import RefundRequestStatusChangeEmailMessage
+from apps.refunds.enums import RefundFacet, RefundStatus
+from apps.refunds.models import RefundRequest, RefundRequestFacetCount
 
 
-class RefundRequestAdminTests(TestCase):
+class RefundRequestAdminTests(FlushRedisDBTestMixin, TestCase):
     @classmethod
     def setUpTestData(cls):
         cls.admin_user = User.objects.create_superuser(
@@ -54,20 +64,20 @@ class RefundRequestAdminTests(TestCase):
         self.assertLess(len(preview), len(self.refund.notes))
         self.assertTrue(preview.endswith('[...]'))
 
-    @patch('apps.refunds.models.RefundRequest.emit_status_change_email')
-    def test_approve_refund_requests(self, mock_emit):
+    def test_approve_refund_requests(self):
         queryset = RefundRequest.objects.filter(id=self.refund.id)
         self.admin.approve_refund_requests(self.request, queryset)
 
         self.refund.refresh_from_db()
         self.assertEqual(self.refund.status, RefundStatus.APPROVED)
-        mock_emit.assert_called_once()
+        email_message = self.refund.status_change_emails.get()
+        self.assertEqual(email_message.new_status, RefundStatus.APPROVED)
+        self.assertEqual(
+            list(email_message.recipients.all()), [self.admin_user]
+        )
 
-    @patch('apps.refunds.models.RefundRequest.emit_status_change_email')
     @patch('apps.refunds.admin.RefundRequestAdmin.message_user')
-    def test_cannot_approve_rejected_refunds(
-        self, mock_message_user, mock_emit
-    ):
+    def test_cannot_approve_rejected_refunds(self, mock_message_user):
         self.refund.status = RefundStatus.REJECTED
         self.refund.save()
 
@@ -76,7 +86,7 @@ class RefundRequestAdminTests(TestCase):
 
         self.refund.refresh_from_db()
         self.assertEqual(self.refund.status, RefundStatus.REJECTED)
-        mock_emit.assert_not_called()
+        self.assertFalse(self.refund.status_change_emails.exists())
 
         mock_message_user.assert_called_once()
         self.assertIn(
@@ -84,18 +94,197 @@ class RefundRequestAdminTests(TestCase):
             mock_message_user.call_args[0][1],
         )
 
-    @patch('apps.refunds.models.RefundRequest.emit_status_change_email')
-    def test_reject_refund_requests(self, mock_emit):
+    def test_reject_refund_requests(self):
         queryset = RefundRequest.objects.filter(id=self.refund.id)
         self.admin.reject_refund_requests(self.request, queryset)
 
         self.refund.refresh_from_db()
         self.assertEqual(self.refund.status, RefundStatus.REJECTED)
-        mock_emit.assert_called_once()
+        self.assertEqual(self.refund.status_change_emails.count(), 1)
+
+    def test_status_change_uses_constant_number_of_queries(self):
+        for _ in range(5):
+            RefundRequest.objects.create(
+                **model_to_dict(self.refund, exclude=['id', 'user', 'status']),
+                user=self.admin_user,
+            )
+        queryset = RefundRequest.objects.all()
+
+        # Rejected refund requests check, select for update, update, email
+        # and recipients inserts, facet counts insert and update, and the
+        # savepoint
+        with self.assertNumQueries(9):
+            self.admin.approve_refund_requests(self.request, queryset)
+
+        self.assertEqual(
+            RefundRequest.objects.filter(status=RefundStatus.APPROVED).count(),
+            6,
+        )
+        self.assertEqual(
+            RefundRequestStatusChangeEmailMessage.recipients.through.objects.count(),
+            6,
+        )
+
+    def test_changelist_is_ordered_by_status_and_creation(self):
+        refund_data = model_to_dict(
+            self.refund, exclude=['id', 'user', 'status']
+        )
+        approved, rejected, pending = [
+            RefundRequest.objects.create(
+                **refund_data, user=self.admin_user, status=status
+            )
+            for status in [
+                RefundStatus.APPROVED,
+                RefundStatus.REJECTED,
+                RefundStatus.PENDING,
+            ]
+        ]
+
+        changelist = self.admin.get_changelist_instance(self.request)
+
+        self.assertEqual(
+            list(changelist.result_list),
+            [pending, self.refund, approved, rejected],
+        )
+
+    def test_facet_counts_follow_changes(self):
+        refund_data = model_to_dict(
+            self.refund, exclude=['id', 'user', 'status', 'country']
+        )
+        refund = RefundRequest.objects.create(
+            **refund_data, user=self.admin_user, country='PL'
+        )
+        self.admin.approve_refund_requests(
+            self.request, RefundRequest.objects.filter(id=refund.id)
+        )
+
+        self.assertEqual(
+            RefundRequestFacetCount.get_counts(RefundFacet.STATUS),
+            {RefundStatus.PENDING: 1, RefundStatus.APPROVED: 1},
+        )
+        self.assertEqual(
+            RefundRequestFacetCount.get_counts(RefundFacet.COUNTRY),
+            {'DE': 1, 'PL': 1},
+        )
+
+        RefundRequest.objects.filter(id=refund.id).delete()
+
+        self.assertEqual(
+            RefundRequestFacetCount.get_counts(RefundFacet.STATUS),
+            {RefundStatus.PENDING: 1},
+        )
+        self.assertEqual(
+            RefundRequestFacetCount.get_counts(RefundFacet.COUNTRY),
+            {'DE': 1},
+        )
+
+    def test_facet_counts_follow_saved_changes(self):
+        refund = RefundRequest.objects.get(id=self.refund.id)
+        refund.status = RefundStatus.REJECTED
+        refund.country = 'PL'
+        refund.save()
+        # Not loaded from the database
+        RefundRequest(
+            **model_to_dict(refund, exclude=['user', 'status']),
+            user=self.admin_user,
+            status=RefundStatus.APPROVED,
+            created_at=refund.created_at,
+        ).save()
+
+        self.assertEqual(
+            RefundRequestFacetCount.get_counts(RefundFacet.STATUS),
+            {RefundStatus.APPROVED: 1},
+        )
+        self.assertEqual(
+            RefundRequestFacetCount.get_counts(RefundFacet.COUNTRY),
+            {'PL': 1},
+        )
+
+    @patch('apps.refunds.signals.RefundRequestFacetCount.update_counts')
+    def test_save_is_rolled_back_with_facet_counts(self, mock_update_counts):
+        mock_update_counts.side_effect = DatabaseError
+        self.refund.status = RefundStatus.APPROVED
+
+        with self.assertRaises(DatabaseError):
+            self.refund.save()
+
+        self.refund.refresh_from_db()
+        self.assertEqual(self.refund.status, RefundStatus.PENDING)
+
+    def test_facet_counts_follow_imported_changes(self):
+        dataset = RefundRequestResource().export(
+            RefundRequest.objects.filter(id=self.refund.id)
+        )
+        del dataset['status']
+        dataset.append_col([RefundStatus.APPROVED], header='status')
+
+        result = RefundRequestResource().import_data(dataset)
+
+        self.assertFalse(result.has_errors())
+        self.assertEqual(
+            RefundRequestFacetCount.get_counts(RefundFacet.STATUS),
+            {RefundStatus.APPROVED: 1},
+        )
+
+    def test_facet_counts_are_rebuilt(self):
+        RefundRequestFacetCount.objects.all().delete()
+        RefundRequest.objects.bulk_create(
+            [
+                RefundRequest(
+                    **model_to_dict(self.refund, exclude=['id', 'user']),
+                    user=self.admin_user,
+                )
+            ]
+        )
+
+        RefundRequestFacetCount.rebuild()
+
+        self.assertEqual(
+            RefundRequestFacetCount.get_counts(RefundFacet.STATUS),
+            {RefundStatus.PENDING: 2},
+        )
+        month = timezone.localtime(self.refund.created_at).strftime('%Y-%m')
+        self.assertEqual(
+            RefundRequestFacetCount.get_counts(RefundFacet.CREATED_MONTH),
+            {month: 2},
+        )
+
+    def test_list_filters_use_facet_counts(self):
+        month = timezone.localtime(self.refund.created_at).strftime('%Y-%m')
+        request = self.request_factory.get('/admin', {'created_month': month})
+        request.user = self.admin_user
+
+        changelist = self.admin.get_changelist_instance(request)
+
+        self.assertEqual(list(changelist.result_list), [self.refund])
+        status_filter, month_filter, country_filter = changelist.filter_specs
+        self.assertEqual(
+            status_filter.lookup_choices, [('pending', 'Pending (1)')]
+        )
+        self.assertEqual(month_filter.lookup_choices, [(month, f'{month} (1)')])
+        self.assertEqual(country_filter.lookup_choices, [('DE', 'DE (1)')])
+
+    def test_malformed_month_filter_is_rejected(self):
+        self.client.force_login(self.admin_user)
+
+        response = self.client.get(
+            reverse('admin:refunds_refundrequest_changelist'),
+            {'created_month': '2024-13'},
+        )
+
+        self.assertRedirects(
+            response,
+            reverse('admin:refunds_refundrequest_changelist') + '?e=1',
+        )
+
+    def test_unchanged_status_is_not_notified(self):
+        queryset = RefundRequest.objects.filter(id=self.refund.id)
+        self.admin.mark_refund_requests_as_pending(self.request, queryset)
+
+        self.assertFalse(self.refund.status_change_emails.exists())
 
-    @patch('apps.refunds.models.RefundRequest.emit_status_change_email')
     @patch('apps.refunds.admin.RefundRequestAdmin.message_user')
-    def test_cannot_reject_approved_refunds(self, mock_message_user, mock_emit):
+    def test_cannot_reject_approved_refunds(self, mock_message_user):
         self.refund.status = RefundStatus.APPROVED
         self.refund.save()
 
@@ -104,7 +293,7 @@ class RefundRequestAdminTests(TestCase):
 
         self.refund.refresh_from_db()
         self.assertEqual(self.refund.status, RefundStatus.APPROVED)
-        mock_emit.assert_not_called()
+        self.assertFalse(self.refund.status_change_emails.exists())
 
         mock_message_user.assert_called_once()
         self.assertIn(
@@ -138,5 +327,178 @@ class RefundRequestAdminTests(TestCase):
         self.assertIn(str(self.refund.id), str(message))
         self.assertIn('Invalid IBAN', str(message))
 
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    @patch('apps.refunds.admin.RefundRequestAdmin.message_user')
+    def test_validate_iban_persists_result(
+        self, mock_message_user, mock_validate
+    ):
+        mock_validate.return_value = {'valid': True, 'country': 'DE'}
+        queryset = RefundRequest.objects.filter(id=self.refund.id)
+
+        self.admin.validate_iban(self.request, queryset)
+
+        self.refund.refresh_from_db()
+        self.assertTrue(self.refund.iban_verified)
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    @patch('apps.refunds.admin.RefundRequestAdmin.message_user')
+    def test_validate_iban_dedupes_pairs(
+        self, mock_message_user, mock_validate
+    ):
+        mock_validate.return_value = {'valid': True, 'country': 'DE'}
+        refund_data = model_to_dict(
+            self.refund, exclude=['id', 'user', 'iban_verified']
+        )
+        duplicate = RefundRequest.objects.create(
+            user=self.admin_user, **refund_data
+        )
+        queryset = RefundRequest.objects.filter(
+            id__in=[self.refund.id, duplicate.id]
+        )
+
+        # Refund requests, stored IBAN verifications, storing the new
+        # verification and updating the refund requests
+        with self.assertNumQueries(4):
+            self.admin.validate_iban(self.request, queryset)
+
+        mock_validate.assert_called_once()
+        self.assertEqual(queryset.filter(iban_verified=True).count(), 2)
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    @patch('apps.refunds.admin.RefundRequestAdmin.message_user')
+    def test_validate_iban_skips_verified(
+        self, mock_message_user, mock_validate
+    ):
+        RefundRequest.objects.filter(id=self.refund.id).update(
+            iban_verified=True
+        )
+        queryset = RefundRequest.objects.filter(id=self.refund.id)
+
+        self.admin.validate_iban(self.request, queryset)
+
+        mock_validate.assert_not_called()
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    @patch('apps.refunds.admin.RefundRequestAdmin.message_user')
+    def test_validate_iban_service_unavailable(
+        self, mock_message_user, mock_validate
+    ):
+        mock_validate.return_value = None
+        queryset = RefundRequest.objects.filter(id=self.refund.id)
+
+        self.admin.validate_iban(self.request, queryset)
+        message = mock_message_user.call_args[0][1]
+
+        self.assertIn('Validation service is unavailable.', str(message))
+        self.assertIn(str(self.refund.id), str(message))
+        self.assertEqual(mock_message_user.call_args[1]['level'], 'ERROR')
+        self.refund.refresh_from_db()
+        self.assertFalse(self.refund.iban_verified)
+
+    def get_stream_export(self, url_name, **params):
+        self.client.force_login(self.admin_user)
+        response = self.client.get(
+            reverse(f'admin:refunds_refundrequest_{url_name}'), params
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_stream_export(self):
+        refund_data = model_to_dict(
+            self.refund, exclude=['id', 'user', 'status']
+        )
+        approved = RefundRequest.objects.create(
+            **refund_data, user=self.admin_user, status=RefundStatus.APPROVED
+        )
+
+        rows = list(
+            csv.DictReader(
+                io.StringIO(self.get_stream_export('stream_export').decode())
+            )
+        )
+        self.assertEqual(
+            [row['id'] for row in rows], [str(self.refund.id), str(approved.id)]
+        )
+        self.assertNotIn('status_order', rows[0])
+
+        rows = list(
+            csv.DictReader(
+                io.StringIO(
+                    gzip.decompress(
+                        self.get_stream_export(
+                            'stream_export_gzip', status=RefundStatus.APPROVED
+                        )
+                    ).decode()
+                )
+            )
+        )
+        self.assertEqual([row['id'] for row in rows], [str(approved.id)])
+
+    def test_changelist_links_stream_export(self):
+        self.client.force_login(self.admin_user)
+
+        response = self.client.get(
+            reverse('admin:refunds_refundrequest_changelist'),
+            {'status': RefundStatus.PENDING},
+        )
+
+        self.assertContains(
+            response,
+            reverse('admin:refunds_refundrequest_stream_export_gzip')
+            + '?status=pending',
+        )
+
+    def search(self, search_term):
+        request = self.request_factory.get('/admin', {'q': search_term})
+        request.user = self.admin_user
+        return list(self.admin.get_changelist_instance(request).result_list)
+
+    def test_search(self):
+        refund_data = model_to_dict(
+            self.refund, exclude=['id', 'user', 'email', 'last_name']
+        )
+        other = RefundRequest.objects.create(
+            **refund_data,
+            user=self.admin_user,
+            email='jane.smith@example.com',
+            last_name='Smith',
+        )
+
+        self.assertEqual(self.search('ord123'), [other, self.refund])
+        self.assertEqual(self.search('jane.smith'), [other])
+        self.assertEqual(self.search('John Doe'), [self.refund])
+        self.assertEqual(self.search('Unknown'), [])
+
+        rows = list(
+            csv.DictReader(
+                io.StringIO(
+                    self.get_stream_export(
+                        'stream_export', q='jane.smith'
+                    ).decode()
+                )
+            )
+        )
+        self.assertEqual([row['id'] for row in rows], [str(other.id)])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Postgres trigram search')
+    def test_search_results_are_ranked(self):
+        refund_data = model_to_dict(
+            self.refund, exclude=['id', 'user', 'products']
+        )
+        exact_match = RefundRequest.objects.create(
+            **refund_data, user=self.admin_user, products='Charging case'
+        )
+        # Newer, so it would be listed first without ranking
+        partial_match = RefundRequest.objects.create(
+            **refund_data,
+            user=self.admin_user,
+            products='Headphones with a charging case',
+        )
+
+        self.assertEqual(
+            self.search('charging case')[:2], [exact_match, partial_match]
+        )
+
     def test_import_permission_denied(self):
         self.assertFalse(self.admin.has_import_permission(self.request))
@@ -35,6 +35,21 @@ class ValidateIBANViewTests(FlushRedisDBTestMixin, APITestCase):
         self.assertEqual(response.data, {'error': None})
         mock_get_error.assert_called_once()
 
+    @patch('apps.refunds.utils.IBANValidator.aget_error')
+    async def test_asgi_request_is_validated_asynchronously(
+        self, mock_get_error
+    ):
+        mock_get_error.return_value = None
+        await self.async_client.aforce_login(self.user)
+
+        response = await self.async_client.post(
+            self.validate_url, self.valid_data
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), {'error': None})
+        mock_get_error.assert_awaited_once()
+
     @patch('apps.refunds.utils.IBANValidator.get_error')
     def test_invalid_iban_returns_error(self, mock_get_error):
         mock_get_error.return_value = 'Provided number is not a valid IBAN.'
@@ -63,3 +78,101 @@ class ValidateIBANViewTests(FlushRedisDBTestMixin, APITestCase):
         data = response.json()
         self.assertIn('iban', data)
         self.assertIn('country', data)
+
+
+class ValidateIBANBatchViewTests(FlushRedisDBTestMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser(
+            username='admin', password='adminpass123'
+        )
+        cls.user = User.objects.create_user(
+            username='testuser', password='testpass123'
+        )
+        cls.validate_url = reverse('validate_iban_batch')
+        cls.valid_item = {'iban': 'DE89370400440532013000', 'country': 'DE'}
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(user=self.admin_user)
+
+    def test_admin_required(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.post(
+            self.validate_url, {'items': [self.valid_item]}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_empty_items_returns_400(self):
+        response = self.client.post(
+            self.validate_url, {'items': []}, format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_results_returned_per_item(self, mock_validate):
+        mock_validate.return_value = {'valid': True, 'country': 'DE'}
+        items = [
+            self.valid_item,
+            {'iban': 'DE89370400440532013001', 'country': 'DE'},
+            self.valid_item,
+        ]
+
+        response = self.client.post(
+            self.validate_url, {'items': items}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['results'],
+            [
+                self.valid_item | {'valid': True, 'error': None},
+                items[1]
+                | {
+                    'valid': False,
+                    'error': 'Provided number is not a valid IBAN.',
+                },
+                self.valid_item | {'valid': True, 'error': None},
+            ],
+        )
+        mock_validate.assert_called_once()
+
+    @patch('apps.refunds.utils.APINinjasClient.avalidate_iban')
+    async def test_asgi_request_is_validated_asynchronously(
+        self, mock_validate
+    ):
+        mock_validate.return_value = {'valid': True, 'country': 'DE'}
+        await self.async_client.aforce_login(self.admin_user)
+
+        response = await self.async_client.post(
+            self.validate_url,
+            {'items': [self.valid_item]},
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.json()['results'],
+            [self.valid_item | {'valid': True, 'error': None}],
+        )
+        mock_validate.assert_awaited_once()
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_service_unavailable_reported_per_item(self, mock_validate):
+        mock_validate.return_value = None
+
+        response = self.client.post(
+            self.validate_url, {'items': [self.valid_item]}, format='json'
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data['results'],
+            [
+                self.valid_item
+                | {
+                    'valid': None,
+                    'error': 'Validation service is unavailable.',
+                }
+            ],
+        )
@@ -1,18 +1,24 @@
+import asyncio
 from unittest.mock import patch
 
+import httpx
 import requests
 import responses
+from asgiref.sync import async_to_sync
 from django.conf import settings
 from django.test import TestCase, override_settings
+from responses.registries import OrderedRegistry
 
-from apps.refunds.clients import APINinjasClient
+from apps.core.circuit_breaker import CircuitBreaker
+from apps.core.mixins import FlushRedisDBTestMixin
+from apps.refunds.clients import APINinjasClient, AsyncRetryTransport
 
 
 @override_settings(
     API_NINJAS_IBAN_VALIDATION_URL='http://mocked-api-ninjas.com/iban/validate',
     API_NINJAS_API_KEY='mock-api-key',
 )
-class APINinjasClientTests(TestCase):
+class APINinjasClientTests(FlushRedisDBTestMixin, TestCase):
     @classmethod
     def setUpTestData(cls):
         cls.api_client = APINinjasClient()
@@ -66,7 +72,7 @@ class APINinjasClientTests(TestCase):
         self.assertIsNone(response)
         self.assertIn('Error parsing response', logs.output[0])
 
-    @patch('requests.request')
+    @patch('requests.Session.request')
     def test_connection_error(self, mock_request):
         mock_request.side_effect = requests.exceptions.ConnectionError(
             'mock connection error'
@@ -77,3 +83,231 @@ class APINinjasClientTests(TestCase):
 
         self.assertIsNone(response)
         self.assertIn('mock connection error', logs.output[0])
+
+    @patch('requests.Session.request')
+    def test_timeout_error(self, mock_request):
+        mock_request.side_effect = requests.exceptions.ReadTimeout(
+            'mock read timeout'
+        )
+
+        with self.assertLogs('django', level='ERROR') as logs:
+            response = self.api_client.validate_iban(self.valid_iban)
+
+        self.assertIsNone(response)
+        self.assertIn('mock read timeout', logs.output[0])
+
+    @patch('requests.Session.request')
+    def test_request_uses_timeouts(self, mock_request):
+        mock_request.return_value.status_code = 200
+        mock_request.return_value.json.return_value = {'valid': True}
+
+        self.api_client.validate_iban(self.valid_iban)
+
+        self.assertEqual(
+            mock_request.call_args.kwargs['timeout'],
+            (
+                settings.API_NINJAS_CONNECT_TIMEOUT,
+                settings.API_NINJAS_READ_TIMEOUT,
+            ),
+        )
+
+    def test_session_is_shared(self):
+        self.assertIs(
+            APINinjasClient().get_session(), APINinjasClient().get_session()
+        )
+
+    @responses.activate(registry=OrderedRegistry)
+    def test_retry_on_service_unavailable(self):
+        url = (
+            f'{settings.API_NINJAS_IBAN_VALIDATION_URL}?iban={self.valid_iban}'
+        )
+        responses.add(responses.GET, url, status=503)
+        responses.add(
+            responses.GET,
+            url,
+            json={'valid': True, 'country': 'DE'},
+            status=200,
+        )
+
+        response = self.api_client.validate_iban(self.valid_iban)
+
+        self.assertEqual(response['valid'], True)
+        self.assertEqual(len(responses.calls), 2)
+
+    @responses.activate
+    def test_stats_record_calls(self):
+        responses.add(
+            responses.GET,
+            f'{settings.API_NINJAS_IBAN_VALIDATION_URL}?iban={self.valid_iban}',
+            json={'valid': True, 'country': 'DE'},
+            status=200,
+        )
+        calls_before = APINinjasClient.get_stats()['calls']
+
+        self.api_client.validate_iban(self.valid_iban)
+        stats = APINinjasClient.get_stats()
+
+        self.assertEqual(stats['calls'], calls_before + 1)
+        self.assertIn('p95', stats['latency'])
+        self.assertIn('pools', stats)
+
+    @patch('requests.Session.request')
+    def test_open_circuit_skips_request(self, mock_request):
+        with self.assertLogs('django', level='WARNING'):
+            self.api_client.circuit_breaker.open()
+
+        with self.assertLogs('django', level='WARNING') as logs:
+            response = self.api_client.validate_iban(self.valid_iban)
+
+        self.assertIsNone(response)
+        self.assertIn('circuit is open', logs.output[0])
+        mock_request.assert_not_called()
+
+    @override_settings(
+        API_NINJAS_CIRCUIT_BREAKER={
+            'failure_rate_threshold': 0.5,
+            'slow_call_threshold': 3,
+            'min_calls': 2,
+            'window': 60,
+            'open_timeout': 30,
+        }
+    )
+    @responses.activate
+    def test_server_errors_open_circuit(self):
+        responses.add(
+            responses.GET,
+            f'{settings.API_NINJAS_IBAN_VALIDATION_URL}?iban={self.valid_iban}',
+            json={'error': 'Internal error'},
+            status=500,
+        )
+
+        with self.assertLogs('django', level='ERROR'):
+            self.api_client.validate_iban(self.valid_iban)
+            self.api_client.validate_iban(self.valid_iban)
+
+        self.assertEqual(
+            self.api_client.circuit_breaker.get_state(), CircuitBreaker.OPEN
+        )
+
+    @responses.activate
+    def test_client_errors_dont_count_as_failures(self):
+        responses.add(
+            responses.GET,
+            f'{settings.API_NINJAS_IBAN_VALIDATION_URL}?iban={self.valid_iban}',
+            json={'error': 'Bad request'},
+            status=400,
+        )
+
+        with self.assertLogs('django', level='ERROR'):
+            for _ in range(10):
+                self.api_client.validate_iban(self.valid_iban)
+
+        self.assertEqual(
+            self.api_client.circuit_breaker.get_state(), CircuitBreaker.CLOSED
+        )
+
+    async def test_avalidate_iban_open_circuit(self):
+        with self.assertLogs('django', level='WARNING'):
+            self.api_client.circuit_breaker.open()
+
+        with (
+            patch.object(APINinjasClient, 'get_async_client') as mock_client,
+            self.assertLogs('django', level='WARNING'),
+        ):
+            response = await self.api_client.avalidate_iban(self.valid_iban)
+
+        self.assertIsNone(response)
+        mock_client.assert_not_called()
+
+    async def test_avalidate_iban_success(self):
+        def handler(request):
+            self.assertEqual(request.headers['X-Api-Key'], 'mock-api-key')
+            self.assertEqual(request.url.params['iban'], self.valid_iban)
+            return httpx.Response(200, json={'valid': True, 'country': 'DE'})
+
+        mock_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with patch.object(
+            APINinjasClient, 'get_async_client', return_value=mock_client
+        ):
+            response = await self.api_client.avalidate_iban(self.valid_iban)
+
+        self.assertEqual(response, {'valid': True, 'country': 'DE'})
+
+    async def test_avalidate_iban_connection_error(self):
+        def handler(request):
+            raise httpx.ConnectError('mock connection error')
+
+        mock_client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        with (
+            patch.object(
+                APINinjasClient, 'get_async_client', return_value=mock_client
+            ),
+            self.assertLogs('django', level='ERROR') as logs,
+        ):
+            response = await self.api_client.avalidate_iban(self.valid_iban)
+
+        self.assertIsNone(response)
+        self.assertIn('mock connection error', logs.output[0])
+
+    async def test_async_client_is_reused_within_event_loop(self):
+        self.assertIs(
+            await APINinjasClient.get_async_client(),
+            await APINinjasClient.get_async_client(),
+        )
+
+    def test_async_client_is_closed_with_event_loop(self):
+        client = asyncio.run(APINinjasClient.get_async_client())
+        self.assertTrue(client.is_closed)
+
+        # As in async views run under WSGI
+        client = async_to_sync(APINinjasClient.get_async_client)()
+        self.assertTrue(client.is_closed)
+
+    def get_retrying_client(self, *responses):
+        responses = iter(responses)
+
+        def handler(request):
+            return next(responses)
+
+        return httpx.AsyncClient(
+            transport=AsyncRetryTransport(
+                httpx.MockTransport(handler), APINinjasClient.create_retry()
+            )
+        )
+
+    @override_settings(API_NINJAS_MAX_RETRIES=2)
+    @patch('apps.refunds.clients.asyncio.sleep')
+    async def test_async_client_retries_server_errors(self, mock_sleep):
+        mock_client = self.get_retrying_client(
+            httpx.Response(503, headers={'Retry-After': '1'}),
+            httpx.Response(502),
+            httpx.Response(200, json={'valid': True, 'country': 'DE'}),
+        )
+        with patch.object(
+            APINinjasClient, 'get_async_client', return_value=mock_client
+        ):
+            response = await self.api_client.avalidate_iban(self.valid_iban)
+
+        self.assertEqual(response, {'valid': True, 'country': 'DE'})
+        self.assertEqual(
+            [call.args[0] for call in mock_sleep.await_args_list],
+            [1, settings.API_NINJAS_RETRY_BACKOFF_FACTOR * 2],
+        )
+
+    @override_settings(API_NINJAS_MAX_RETRIES=1)
+    @patch('apps.refunds.clients.asyncio.sleep')
+    async def test_async_client_retries_are_limited(self, mock_sleep):
+        mock_client = self.get_retrying_client(
+            httpx.Response(504), httpx.Response(504), httpx.Response(200)
+        )
+        with (
+            patch.object(
+                APINinjasClient, 'get_async_client', return_value=mock_client
+            ),
+            self.assertLogs('django', level='ERROR') as logs,
+        ):
+            response = await self.api_client.avalidate_iban(self.valid_iban)
+
+        self.assertIsNone(response)
+        self.assertIn('status code 504', logs.output[0])
+        mock_sleep.assert_awaited_once()
@@ -0,0 +1,117 @@
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.template import engines
+from django.template.loader import render_to_string
+from django.test import TestCase, override_settings
+
+from apps.core.email import render_email_skeleton, render_email_template
+from apps.refunds.email import RefundRequestStatusChangeEmailMessage
+from apps.refunds.models import RefundRequest
+
+
+class RefundRequestStatusChangeEmailMessageTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            first_name='<b>John</b> & Co',
+            email='john@example.com',
+        )
+        cls.refund = RefundRequest.objects.create(
+            user=cls.user,
+            order_number='ORD<123>',
+            order_date='2024-03-10',
+            products='Test Product',
+            reason='Test Reason',
+            first_name='John',
+            last_name='Doe',
+            phone_number='+48123456789',
+            email='john@example.com',
+            address='Test Street 123',
+            postal_code='12345',
+            city='Test City',
+            country='DE',
+            iban='DE89370400440532013000',
+            bank_name='Test Bank',
+            account_type='personal',
+        )
+
+    def setUp(self):
+        render_email_skeleton.cache_clear()
+
+    def create_email_message(self, new_status='approved'):
+        return RefundRequestStatusChangeEmailMessage(
+            refund_request=self.refund, new_status=new_status
+        )
+
+    def test_content_matches_full_rendering(self):
+        email_message = self.create_email_message()
+        context = email_message.get_email_context(self.user)
+
+        for extension in ('txt', 'html'):
+            self.assertEqual(
+                email_message.get_content(
+                    f'{email_message.template_name}.{extension}', self.user
+                ),
+                render_to_string(
+                    f'{email_message.template_name}.{extension}', context
+                ),
+            )
+
+        html_content = email_message.get_html_content(self.user)
+        self.assertIn('&lt;b&gt;John&lt;/b&gt; &amp; Co', html_content)
+        self.assertIn('ORD&lt;123&gt;', html_content)
+
+    def test_template_is_rendered_once_per_status(self):
+        email_messages = [
+            self.create_email_message(new_status)
+            for new_status in ['approved', 'rejected'] * 10
+        ]
+
+        with patch(
+            'django.template.backends.django.Template.render',
+            autospec=True,
+            side_effect=lambda template, context: ' '.join(
+                map(str, context.values())
+            ),
+        ) as mock_render:
+            for email_message in email_messages:
+                email_message.get_html_content(self.user)
+
+        self.assertEqual(mock_render.call_count, 2)
+
+    def test_changed_personal_fields_are_rendered_in_full(self):
+        template = engines['django'].from_string(
+            '{% if first_name %}Dear {{ first_name|upper }}{% else %}Hello'
+            '{% endif %}, {{ new_status }}'
+        )
+
+        with patch('apps.core.email.get_template', return_value=template):
+            for first_name, content in [
+                ('John', 'Dear JOHN, approved'),
+                ('', 'Hello, approved'),
+            ]:
+                self.assertEqual(
+                    render_email_template(
+                        'emails/test.txt',
+                        {'new_status': 'approved'},
+                        {'first_name': first_name},
+                    ),
+                    content,
+                )
+
+    @override_settings(DEBUG=True)
+    def test_templates_are_rendered_in_full_in_debug_mode(self):
+        email_message = self.create_email_message()
+
+        with patch(
+            'django.template.backends.django.Template.render',
+            autospec=True,
+            return_value='Status changed',
+        ) as mock_render:
+            for _ in range(2):
+                email_message.get_html_content(self.user)
+
+        self.assertEqual(mock_render.call_count, 2)
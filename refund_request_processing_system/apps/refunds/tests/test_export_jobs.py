@@ -0,0 +1,156 @@
+import csv
+import gzip
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest.mock import patch
+from urllib.parse import urlencode
+
+from django.contrib.auth.models import User
+from django.core.files.storage import FileSystemStorage
+from django.core.management import call_command
+from django.forms.models import model_to_dict
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from apps.core.mixins import FlushRedisDBTestMixin
+from apps.refunds.enums import ExportFormat, ExportJobStatus, RefundStatus
+from apps.refunds.models import ExportJob, RefundRequest
+
+
+class ExportJobTests(FlushRedisDBTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpass123'
+        )
+        cls.refund = RefundRequest.objects.create(
+            user=cls.admin_user,
+            order_number='ORD123',
+            order_date='2024-03-10',
+            products='Test Product',
+            reason='Test Reason',
+            first_name='John',
+            last_name='Doe',
+            phone_number='+48123456789',
+            email='john@example.com',
+            address='Test Street 123',
+            postal_code='12345',
+            city='Test City',
+            country='DE',
+            iban='DE89370400440532013000',
+            bank_name='Test Bank',
+            account_type='personal',
+        )
+        cls.approved = RefundRequest.objects.create(
+            **model_to_dict(cls.refund, exclude=['id', 'user', 'status']),
+            user=cls.admin_user,
+            status=RefundStatus.APPROVED,
+        )
+
+    def setUp(self):
+        super().setUp()
+        export_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, export_root)
+        storage_patcher = patch.object(
+            ExportJob._meta.get_field('file'),
+            'storage',
+            FileSystemStorage(location=export_root),
+        )
+        storage_patcher.start()
+        self.addCleanup(storage_patcher.stop)
+
+        self.client.force_login(self.admin_user)
+
+    def request_export(self, export_format, **filters):
+        response = self.client.post(
+            reverse('admin:refunds_refundrequest_export_job')
+            + f'?{urlencode(filters)}',
+            {'format': export_format},
+        )
+        self.assertRedirects(
+            response, reverse('admin:refunds_exportjob_changelist')
+        )
+        return ExportJob.objects.latest('id')
+
+    def run_export_jobs(self):
+        call_command('run_export_jobs', '--once', stdout=io.StringIO())
+
+    def download(self, export_job):
+        response = self.client.get(
+            reverse('admin:refunds_exportjob_download', args=[export_job.pk])
+        )
+        self.assertEqual(response.status_code, 200)
+        return gzip.decompress(b''.join(response.streaming_content)).decode()
+
+    def test_export_form_is_shown(self):
+        response = self.client.get(
+            reverse('admin:refunds_refundrequest_export_job')
+        )
+
+        self.assertContains(response, 'JSONL')
+        self.assertFalse(ExportJob.objects.exists())
+
+    def test_csv_export_job(self):
+        export_job = self.request_export(
+            ExportFormat.CSV, status=RefundStatus.APPROVED
+        )
+        self.assertEqual(export_job.status, ExportJobStatus.PENDING)
+
+        self.run_export_jobs()
+
+        export_job.refresh_from_db()
+        self.assertEqual(export_job.status, ExportJobStatus.DONE)
+        self.assertEqual(export_job.exported_rows, 1)
+        self.assertEqual(export_job.progress, 100)
+        rows = list(csv.DictReader(io.StringIO(self.download(export_job))))
+        self.assertEqual([row['id'] for row in rows], [str(self.approved.id)])
+
+    def test_jsonl_export_job(self):
+        export_job = self.request_export(ExportFormat.JSONL)
+
+        self.run_export_jobs()
+
+        rows = [
+            json.loads(line) for line in self.download(export_job).splitlines()
+        ]
+        self.assertEqual(
+            [row['id'] for row in rows],
+            [str(self.refund.id), str(self.approved.id)],
+        )
+        self.assertEqual(rows[0]['order_number'], 'ORD123')
+
+    def test_unfinished_job_cannot_be_downloaded(self):
+        export_job = self.request_export(ExportFormat.CSV)
+
+        response = self.client.get(
+            reverse('admin:refunds_exportjob_download', args=[export_job.pk])
+        )
+
+        self.assertEqual(response.status_code, 404)
+
+    @patch('apps.refunds.management.commands.run_export_jobs.iter_export_rows')
+    def test_failed_job_records_error(self, mock_rows):
+        mock_rows.side_effect = RuntimeError('Connection lost')
+        export_job = self.request_export(ExportFormat.CSV)
+
+        with self.assertLogs('django', level='ERROR'):
+            self.run_export_jobs()
+
+        export_job.refresh_from_db()
+        self.assertEqual(export_job.status, ExportJobStatus.FAILED)
+        self.assertEqual(export_job.error, 'Connection lost')
+
+    def test_abandoned_job_is_claimed_again(self):
+        export_job = self.request_export(ExportFormat.CSV)
+        self.assertEqual(ExportJob.claim(), export_job)
+        self.assertIsNone(ExportJob.claim())
+
+        ExportJob.objects.update(
+            heartbeat_at=timezone.now() - timedelta(hours=1)
+        )
+
+        self.assertEqual(ExportJob.claim(), export_job)
@@ -1,7 +1,7 @@
 from unittest.mock import patch
 
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
 from apps.core.mixins import FlushRedisDBTestMixin
@@ -9,6 +9,7 @@ from apps.core.models import UserProfile
 from apps.refunds.enums import RefundReason, RefundStatus
 from apps.refunds.forms import RefundRequestForm
 from apps.refunds.models import RefundRequest
+from apps.refunds.utils import IBANValidator
 
 
 class RefundRequestFormTests(FlushRedisDBTestMixin, TestCase):
@@ -116,6 +117,39 @@ class RefundRequestFormTests(FlushRedisDBTestMixin, TestCase):
         self.assertTrue(form.is_valid())
         mock_validate.assert_not_called()
 
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_deferred_verification_cache_miss(self, mock_validate):
+        form = RefundRequestForm(self.base_data_form)
+
+        self.assertTrue(form.is_valid())
+        instance = form.save(commit=False)
+        self.assertFalse(instance.iban_verified)
+        mock_validate.assert_not_called()
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_deferred_verification_cached_error(self, mock_validate):
+        mock_validate.return_value = {'valid': False}
+        IBANValidator(
+            self.base_data_form['iban'], self.base_data_form['country']
+        ).get_error()
+
+        form = RefundRequestForm(self.base_data_form)
+
+        self.assertFalse(form.is_valid())
+        self.assertIn('valid IBAN', form.errors['__all__'][0])
+        mock_validate.assert_called_once()
+
+    def test_deferred_verification_cached_valid_iban(self):
+        IBANValidator(
+            self.base_data_form['iban'], self.base_data_form['country']
+        ).cache_valid_iban()
+
+        form = RefundRequestForm(self.base_data_form)
+
+        self.assertTrue(form.is_valid())
+        instance = form.save(commit=False)
+        self.assertTrue(instance.iban_verified)
+
     def test_reason_choice_from_standard_reason(self):
         refund_request = RefundRequest.objects.create(
             **self.base_data_model
@@ -166,6 +200,7 @@ class RefundRequestFormTests(FlushRedisDBTestMixin, TestCase):
         self.assertFalse(form.is_valid())
         self.assertIn('other_reason', form.errors)
 
+    @override_settings(IBAN_DEFERRED_VERIFICATION=False)
     @patch('apps.refunds.utils.APINinjasClient.validate_iban')
     def test_iban_validation_success(self, mock_validate):
         mock_validate.return_value = {'valid': True, 'country': 'DE'}
@@ -175,6 +210,7 @@ class RefundRequestFormTests(FlushRedisDBTestMixin, TestCase):
         instance = form.save(commit=False)
         self.assertTrue(instance.iban_verified)
 
+    @override_settings(IBAN_DEFERRED_VERIFICATION=False)
     @patch('apps.refunds.utils.APINinjasClient.validate_iban')
     def test_iban_validation_failure(self, mock_validate):
         mock_validate.return_value = {'valid': False}
@@ -184,12 +220,32 @@ class RefundRequestFormTests(FlushRedisDBTestMixin, TestCase):
         self.assertIn('__all__', form.errors)
         self.assertIn('valid IBAN', form.errors['__all__'][0])
 
+    @override_settings(IBAN_DEFERRED_VERIFICATION=False)
     @patch('apps.refunds.utils.APINinjasClient.validate_iban')
     def test_iban_validation_service_unavailable(self, mock_validate):
         mock_validate.return_value = None
-        form = RefundRequestForm(self.base_data_form)
-        form.instance.user = self.user
 
-        self.assertTrue(form.is_valid())
-        instance = form.save()
-        self.assertFalse(instance.iban_verified)
+        for fallback, iban_verified in [('unverified', False), ('local', True)]:
+            with (
+                self.subTest(fallback=fallback),
+                override_settings(IBAN_VALIDATION_FALLBACK=fallback),
+            ):
+                form = RefundRequestForm(self.base_data_form)
+                form.instance.user = self.user
+
+                self.assertTrue(form.is_valid())
+                instance = form.save()
+                self.assertEqual(instance.iban_verified, iban_verified)
+
+    @override_settings(IBAN_VALIDATION_FALLBACK='local')
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_iban_validation_local_fallback_rejects_invalid_iban(
+        self, mock_validate
+    ):
+        mock_validate.return_value = None
+        data = self.base_data_form.copy()
+        data['iban'] = 'DE89370400440532013001'
+        form = RefundRequestForm(data)
+
+        self.assertFalse(form.is_valid())
+        self.assertIn('valid IBAN', form.errors['__all__'][0])
@@ -0,0 +1,60 @@
+from django.test import SimpleTestCase
+
+from apps.refunds.iban import LocalIBANValidator
+
+
+class LocalIBANValidatorTests(SimpleTestCase):
+    def test_valid_ibans(self):
+        valid_ibans = [
+            ('DE89370400440532013000', 'DE'),
+            ('GB82WEST12345698765432', 'GB'),
+            ('PL61109010140000071219812874', 'PL'),
+            ('FR1420041010050500013M02606', 'FR'),
+            ('NL91ABNA0417164300', 'NL'),
+            ('MU17BOMM0101101030300200000MUR', 'MU'),
+        ]
+        for iban, country in valid_ibans:
+            with self.subTest(iban=iban):
+                self.assertIsNone(LocalIBANValidator(iban, country).get_error())
+
+    def test_whitespace_and_case_are_ignored(self):
+        validator = LocalIBANValidator(
+            'pl61 1090 1014 0000 0712 1981 2874', 'pl'
+        )
+        self.assertIsNone(validator.get_error())
+
+    def test_invalid_checksum(self):
+        validator = LocalIBANValidator('DE89370400440532013001', 'DE')
+        self.assertEqual(
+            validator.get_error(), 'Provided number is not a valid IBAN.'
+        )
+
+    def test_invalid_length(self):
+        validator = LocalIBANValidator('DE8937040044053201300', 'DE')
+        self.assertEqual(
+            validator.get_error(), 'Provided number is not a valid IBAN.'
+        )
+
+    def test_invalid_bban_structure(self):
+        # Letters are not allowed in German BBAN
+        validator = LocalIBANValidator('DE12A70400440532013000', 'DE')
+        self.assertFalse(validator.is_valid())
+
+    def test_unknown_country_code(self):
+        validator = LocalIBANValidator('XX89370400440532013000', 'XX')
+        self.assertEqual(
+            validator.get_error(), 'Provided number is not a valid IBAN.'
+        )
+
+    def test_empty_iban(self):
+        self.assertEqual(
+            LocalIBANValidator(None, 'DE').get_error(),
+            'Provided number is not a valid IBAN.',
+        )
+
+    def test_country_mismatch(self):
+        validator = LocalIBANValidator('DE89370400440532013000', 'FR')
+        self.assertEqual(
+            validator.get_error(),
+            'Provided IBAN number comes from DE, while FR was provided.',
+        )
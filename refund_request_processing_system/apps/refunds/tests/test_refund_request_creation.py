@@ -1,7 +1,7 @@
 from unittest.mock import patch
 
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
 
 from apps.core.mixins import FlushRedisDBTestMixin
@@ -66,6 +66,7 @@ class CreateRefundRequestViewTests(FlushRedisDBTestMixin, TestCase):
 
         mock_initial.assert_called_once_with(self.user)
 
+    @override_settings(IBAN_DEFERRED_VERIFICATION=False)
     @patch('apps.refunds.utils.APINinjasClient.validate_iban')
     def test_valid_post_creates_refund(self, mock_validate):
         mock_validate.return_value = {'valid': True, 'country': 'DE'}
@@ -93,6 +94,7 @@ class CreateRefundRequestViewTests(FlushRedisDBTestMixin, TestCase):
         refund = RefundRequest.objects.first()
         self.assertEqual(refund.reason, 'Custom reason text')
 
+    @override_settings(IBAN_DEFERRED_VERIFICATION=False)
     @patch('apps.refunds.utils.APINinjasClient.validate_iban')
     def test_invalid_iban_shows_error(self, mock_validate):
         mock_validate.return_value = {'valid': False}
@@ -108,6 +110,7 @@ class CreateRefundRequestViewTests(FlushRedisDBTestMixin, TestCase):
         )
         self.assertEqual(RefundRequest.objects.count(), 0)
 
+    @override_settings(IBAN_DEFERRED_VERIFICATION=False)
     @patch('apps.refunds.utils.APINinjasClient.validate_iban')
     def test_service_unavailable_creates_unverified(self, mock_validate):
         mock_validate.return_value = None
@@ -119,6 +122,17 @@ class CreateRefundRequestViewTests(FlushRedisDBTestMixin, TestCase):
         refund = RefundRequest.objects.first()
         self.assertFalse(refund.iban_verified)
 
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_deferred_verification_creates_unverified(self, mock_validate):
+        self.client.force_login(self.user)
+
+        response = self.client.post(self.create_url, self.valid_data)
+
+        self.assertRedirects(response, reverse('refund_list'))
+        refund = RefundRequest.objects.first()
+        self.assertFalse(refund.iban_verified)
+        mock_validate.assert_not_called()
+
     def test_form_validation_required_fields(self):
         self.client.force_login(self.user)
         response = self.client.post(self.create_url, {})
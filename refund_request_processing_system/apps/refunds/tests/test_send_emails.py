@@ -0,0 +1,322 @@
+import json
+from datetime import timedelta
+from io import StringIO
+from smtplib import SMTPException
+from unittest.mock import patch
+
+from django.contrib.admin.sites import AdminSite
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from apps.core.enums import EmailPriority
+from apps.core.mixins import FlushRedisDBTestMixin
+from apps.refunds.admin import RefundRequestAdmin
+from apps.refunds.email import RefundRequestStatusChangeEmailMessage
+from apps.refunds.models import RefundRequest
+
+
+@override_settings(EMAIL_OUTBOX_MAX_ATTEMPTS=2, EMAIL_OUTBOX_RETRY_BACKOFF=60)
+class SendEmailsCommandTests(FlushRedisDBTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin_user = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='adminpass123'
+        )
+        cls.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            first_name='John',
+            email='john@example.com',
+        )
+        cls.refund = RefundRequest.objects.create(
+            user=cls.user,
+            order_number='ORD123',
+            order_date='2024-03-10',
+            products='Test Product',
+            reason='Test Reason',
+            first_name='John',
+            last_name='Doe',
+            phone_number='+48123456789',
+            email='john@example.com',
+            address='Test Street 123',
+            postal_code='12345',
+            city='Test City',
+            country='DE',
+            iban='DE89370400440532013000',
+            bank_name='Test Bank',
+            account_type='personal',
+        )
+
+    def call_command(self):
+        stdout = StringIO()
+        call_command(
+            'send_emails', '--once', '--concurrency', '1', stdout=stdout
+        )
+        return stdout.getvalue()
+
+    def approve_refund(self):
+        request = RequestFactory().get('/admin')
+        request.user = self.admin_user
+        RefundRequestAdmin(RefundRequest, AdminSite()).approve_refund_requests(
+            request, RefundRequest.objects.filter(id=self.refund.id)
+        )
+        return RefundRequestStatusChangeEmailMessage.objects.get()
+
+    def test_status_change_email_is_sent_by_worker(self):
+        email_message = self.approve_refund()
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertIsNone(email_message.sent_at)
+
+        output = self.call_command()
+
+        email_message.refresh_from_db()
+        self.assertIsNotNone(email_message.sent_at)
+        self.assertEqual(email_message.attempts, 1)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['john@example.com'])
+        self.assertIn('sent 1, failed 0', output)
+
+        self.call_command()
+        self.assertEqual(len(mail.outbox), 1)
+
+    @patch('django.core.mail.backends.locmem.EmailBackend.send_messages')
+    def test_failed_email_is_retried_with_backoff(self, mock_send):
+        mock_send.side_effect = SMTPException('Connection refused')
+        email_message = self.approve_refund()
+
+        output = self.call_command()
+
+        email_message.refresh_from_db()
+        self.assertIsNone(email_message.sent_at)
+        self.assertIsNone(email_message.dead_at)
+        self.assertEqual(email_message.last_error, 'Connection refused')
+        self.assertGreater(
+            email_message.next_attempt_at,
+            timezone.now() + timedelta(seconds=50),
+        )
+        self.assertIn('sent 0, failed 1', output)
+
+        # Not retried before the backoff passes
+        self.call_command()
+        self.assertEqual(mock_send.call_count, 1)
+
+    @patch('django.core.mail.backends.locmem.EmailBackend.send_messages')
+    def test_email_is_dead_lettered_after_max_attempts(self, mock_send):
+        mock_send.side_effect = SMTPException('Connection refused')
+        email_message = self.approve_refund()
+
+        for _ in range(2):
+            RefundRequestStatusChangeEmailMessage.objects.update(
+                next_attempt_at=timezone.now()
+            )
+            self.call_command()
+
+        email_message.refresh_from_db()
+        self.assertEqual(email_message.attempts, 2)
+        self.assertIsNotNone(email_message.dead_at)
+        self.assertFalse(RefundRequestStatusChangeEmailMessage.get_pending())
+
+    def approve_refund_email(self, priority=EmailPriority.NORMAL):
+        return (
+            RefundRequestStatusChangeEmailMessage.bulk_create_with_recipients(
+                [
+                    RefundRequestStatusChangeEmailMessage(
+                        refund_request=self.refund,
+                        new_status='approved',
+                        priority=priority,
+                    )
+                ],
+                [[self.user.id]],
+            )[0]
+        )
+
+    def test_batch_is_sent_with_constant_number_of_queries(self):
+        for _ in range(5):
+            self.approve_refund_email()
+
+        # Due priorities of both email models, claim (savepoints, select,
+        # update, recipients and digest refund requests prefetch) and
+        # marking as sent
+        with self.assertNumQueries(9):
+            self.call_command()
+
+        self.assertEqual(len(mail.outbox), 5)
+        self.assertFalse(
+            RefundRequestStatusChangeEmailMessage.objects.filter(
+                sent_at__isnull=True
+            ).exists()
+        )
+
+    def test_emails_share_one_connection(self):
+        for _ in range(3):
+            self.approve_refund_email()
+
+        with patch(
+            'apps.core.email.get_connection', wraps=get_connection
+        ) as mock_get_connection:
+            errors = RefundRequestStatusChangeEmailMessage.send_many(
+                list(RefundRequestStatusChangeEmailMessage.objects.all())
+            )
+
+        self.assertEqual(errors, [None, None, None])
+        mock_get_connection.assert_called_once()
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(
+            RefundRequestStatusChangeEmailMessage.objects.filter(
+                sent_at__isnull=True
+            ).exists()
+        )
+
+    @override_settings(
+        EMAIL_RELAYS={'default': {'rate_per_minute': 60, 'burst': 2}}
+    )
+    def test_emails_over_rate_limit_wait_in_outbox(self):
+        for _ in range(3):
+            self.approve_refund_email()
+
+        self.call_command()
+        self.assertEqual(len(mail.outbox), 2)
+
+        self.call_command()
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(
+            RefundRequestStatusChangeEmailMessage.get_pending().count(), 1
+        )
+
+        stdout = StringIO()
+        call_command('email_outbox_stats', '--json', stdout=stdout)
+        relay_stats = json.loads(stdout.getvalue())['default']
+        self.assertEqual(relay_stats['sent_last_minute'], 2)
+        # Once after sending the burst, and once in the second run
+        self.assertEqual(relay_stats['throttled_last_minute'], 2)
+        self.assertEqual(
+            relay_stats['queues'][
+                'refunds.RefundRequestStatusChangeEmailMessage'
+            ]['normal'],
+            {'due': 1, 'scheduled': 0},
+        )
+
+    @override_settings(
+        EMAIL_RELAYS={'default': {'rate_per_minute': 60, 'burst': 1}}
+    )
+    def test_emails_are_sent_by_priority(self):
+        self.approve_refund_email(EmailPriority.LOW)
+        self.approve_refund_email(EmailPriority.NORMAL)
+        email_message = self.approve_refund_email(EmailPriority.HIGH)
+
+        self.call_command()
+
+        email_message.refresh_from_db()
+        self.assertIsNotNone(email_message.sent_at)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_claimed_email_is_skipped(self):
+        self.approve_refund()
+
+        claimed = RefundRequestStatusChangeEmailMessage.claim_pending(10)
+
+        self.assertEqual(len(claimed), 1)
+        self.assertEqual(
+            RefundRequestStatusChangeEmailMessage.claim_pending(10), []
+        )
+        self.call_command()
+        self.assertEqual(len(mail.outbox), 0)
+
+
+@override_settings(REFUND_STATUS_CHANGE_DIGEST_WINDOW=300)
+class StatusChangeDigestTests(FlushRedisDBTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{i}',
+                first_name=f'User {i}',
+                email=f'user{i}@example.com',
+            )
+            for i in range(2)
+        ]
+        cls.refunds = [
+            RefundRequest.objects.create(
+                user=user,
+                order_number=f'ORD{i}',
+                order_date='2024-03-10',
+                products='Test Product',
+                reason='Test Reason',
+                first_name='John',
+                last_name='Doe',
+                phone_number='+48123456789',
+                email='john@example.com',
+                address='Test Street 123',
+                postal_code='12345',
+                city='Test City',
+                country='DE',
+                iban='DE89370400440532013000',
+                bank_name='Test Bank',
+                account_type='personal',
+            )
+            for i, user in enumerate(cls.users * 3)
+        ]
+
+    def change_status(self, refunds, status):
+        RefundRequest.bulk_change_status(
+            RefundRequest.objects.filter(
+                id__in=[refund.id for refund in refunds]
+            ),
+            status,
+        )
+
+    def send_due_digests(self):
+        RefundRequestStatusChangeEmailMessage.objects.update(
+            next_attempt_at=timezone.now()
+        )
+        call_command('send_emails', '--once', stdout=StringIO())
+
+    def test_status_changes_are_coalesced_per_user(self):
+        self.change_status(self.refunds[:4], 'approved')
+        self.change_status(self.refunds[4:], 'rejected')
+
+        digests = RefundRequestStatusChangeEmailMessage.objects.all()
+        self.assertEqual(digests.count(), 2)
+        for digest in digests:
+            self.assertTrue(digest.is_digest)
+            self.assertEqual(digest.priority, EmailPriority.LOW)
+            self.assertEqual(digest.refund_requests.count(), 3)
+            self.assertGreater(digest.next_attempt_at, timezone.now())
+
+        call_command('send_emails', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+
+        self.send_due_digests()
+
+        self.assertEqual(len(mail.outbox), 2)
+        email = next(
+            email for email in mail.outbox if email.to == ['user0@example.com']
+        )
+        self.assertIn('Dear User 0', email.body)
+        for refund in self.refunds[0::2]:
+            self.assertIn(f'refund request #{refund.id}', email.body)
+
+    def test_sent_digest_is_not_extended(self):
+        self.change_status(self.refunds[:1], 'approved')
+        self.send_due_digests()
+
+        self.change_status(self.refunds[2:3], 'approved')
+
+        self.assertEqual(
+            RefundRequestStatusChangeEmailMessage.objects.filter(
+                sent_at__isnull=True
+            ).count(),
+            1,
+        )
+
+    def test_digests_use_constant_number_of_queries(self):
+        # Savepoints, select for update, update, select open digests,
+        # digests, recipients and refund requests inserts, and facet counts
+        # insert and update
+        with self.assertNumQueries(12):
+            self.change_status(self.refunds, 'approved')
@@ -1,9 +1,17 @@
-from unittest.mock import patch
+import asyncio
+import threading
+import time
+from datetime import timedelta
+from unittest.mock import ANY, patch
 
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
 
+from apps.core.cache import TieredCache
 from apps.core.mixins import FlushRedisDBTestMixin
-from apps.refunds.utils import IBANValidator
+from apps.refunds.models import IBANVerification
+from apps.refunds.utils import IBANValidator, iban_results_cache
 
 
 class IBANValidatorTests(FlushRedisDBTestMixin, TestCase):
@@ -40,6 +48,15 @@ class IBANValidatorTests(FlushRedisDBTestMixin, TestCase):
         ):
             self.validator.get_error()
 
+    @override_settings(IBAN_VALIDATION_FALLBACK='local')
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_service_unavailable_local_fallback(self, mock_validate):
+        mock_validate.return_value = None
+
+        self.assertIsNone(self.validator.get_error())
+        self.assertTrue(self.validator.used_fallback)
+        self.assertIsNone(cache.get(self.validator.cache_key))
+
     @patch('apps.refunds.utils.APINinjasClient.validate_iban')
     def test_result_is_cached(self, mock_validate):
         mock_validate.return_value = {'valid': True, 'country': 'DE'}
@@ -51,6 +68,303 @@ class IBANValidatorTests(FlushRedisDBTestMixin, TestCase):
         self.assertEqual(first_result, second_result)
         mock_validate.assert_called_once()
 
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_locally_invalid_iban_skips_external_validation(
+        self, mock_validate
+    ):
+        validator = IBANValidator('DE89370400440532013001', 'DE')
+
+        self.assertEqual(
+            validator.get_error(), 'Provided number is not a valid IBAN.'
+        )
+        mock_validate.assert_not_called()
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_local_country_mismatch_skips_external_validation(
+        self, mock_validate
+    ):
+        validator = IBANValidator(self.valid_iban, 'FR')
+
+        self.assertEqual(
+            validator.get_error(),
+            'Provided IBAN number comes from DE, while FR was provided.',
+        )
+        mock_validate.assert_not_called()
+
+    @patch('apps.refunds.utils.APINinjasClient.avalidate_iban')
+    async def test_aget_error_valid_iban(self, mock_validate):
+        mock_validate.return_value = {'valid': True, 'country': 'DE'}
+        self.assertIsNone(await self.validator.aget_error())
+
+    @patch('apps.refunds.utils.APINinjasClient.avalidate_iban')
+    async def test_aget_error_result_is_cached(self, mock_validate):
+        mock_validate.return_value = {'valid': False}
+
+        first_result = await self.validator.aget_error()
+        second_result = await self.validator.aget_error()
+
+        self.assertEqual(first_result, 'Provided number is not a valid IBAN.')
+        self.assertEqual(first_result, second_result)
+        mock_validate.assert_awaited_once()
+
+    @patch('apps.refunds.utils.APINinjasClient.avalidate_iban')
+    async def test_aget_error_service_unavailable(self, mock_validate):
+        mock_validate.return_value = None
+        with self.assertRaisesRegex(
+            RuntimeError, 'Validation service is unavailable.'
+        ):
+            await self.validator.aget_error()
+
+    @patch('apps.refunds.utils.APINinjasClient.avalidate_iban')
+    async def test_aget_errors_uses_cache_and_dedupes(self, mock_validate):
+        mock_validate.return_value = {'valid': True, 'country': 'DE'}
+        cached_validator = IBANValidator('GB82WEST12345698765432', 'GB')
+        await cache.aset(
+            cached_validator.cache_key,
+            {'error': 'Cached error', 'fresh_until': time.time() + 60},
+        )
+        validators = [
+            self.validator,
+            IBANValidator(self.valid_iban, 'DE'),
+            cached_validator,
+            IBANValidator('DE89370400440532013001', 'DE'),
+        ]
+
+        errors = await IBANValidator.aget_errors(validators, max_concurrency=2)
+
+        self.assertEqual(
+            errors,
+            {
+                self.validator.cache_key: None,
+                cached_validator.cache_key: 'Cached error',
+                validators[3].cache_key: 'Provided number is not a valid IBAN.',
+            },
+        )
+        mock_validate.assert_awaited_once_with(self.valid_iban)
+        cache_entry = await cache.aget(self.validator.cache_key)
+        self.assertIsNone(cache_entry['error'])
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_get_errors_uses_cache_and_dedupes(self, mock_validate):
+        mock_validate.return_value = {'valid': False}
+        cached_validator = IBANValidator('GB82WEST12345698765432', 'GB')
+        cached_validator.cache_valid_iban()
+        validators = [
+            self.validator,
+            IBANValidator(self.valid_iban, 'de'),
+            cached_validator,
+            IBANValidator('DE89370400440532013001', 'DE'),
+        ]
+
+        errors = IBANValidator.get_errors(validators, max_workers=2)
+
+        self.assertEqual(
+            errors,
+            {
+                self.validator.cache_key: 'Provided number is not a valid IBAN.',
+                cached_validator.cache_key: None,
+                validators[3].cache_key: 'Provided number is not a valid IBAN.',
+            },
+        )
+        mock_validate.assert_called_once_with(self.valid_iban)
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_get_errors_service_unavailable(self, mock_validate):
+        mock_validate.return_value = None
+
+        errors = IBANValidator.get_errors([self.validator], max_workers=1)
+
+        self.assertEqual(
+            errors, {self.validator.cache_key: IBANValidator.UNAVAILABLE}
+        )
+
+    @override_settings(IBAN_VALIDATION_FALLBACK='local')
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_get_errors_fallback_is_unavailable(self, mock_validate):
+        mock_validate.return_value = None
+
+        errors = IBANValidator.get_errors([self.validator], max_workers=1)
+
+        self.assertEqual(
+            errors, {self.validator.cache_key: IBANValidator.UNAVAILABLE}
+        )
+
+    @patch('apps.refunds.utils.APINinjasClient.avalidate_iban')
+    async def test_aget_errors_service_unavailable(self, mock_validate):
+        mock_validate.return_value = None
+
+        errors = await IBANValidator.aget_errors(
+            [self.validator], max_concurrency=1
+        )
+
+        self.assertEqual(
+            errors, {self.validator.cache_key: IBANValidator.UNAVAILABLE}
+        )
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_lock_is_released_after_validation(self, mock_validate):
+        mock_validate.return_value = {'valid': True, 'country': 'DE'}
+
+        self.validator.get_error()
+
+        self.assertIsNone(cache.get(self.validator.lock_key))
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_lock_is_released_when_service_unavailable(self, mock_validate):
+        mock_validate.return_value = None
+
+        with self.assertRaises(RuntimeError):
+            self.validator.get_error()
+
+        self.assertIsNone(cache.get(self.validator.lock_key))
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_concurrent_miss_waits_for_lock_holder(self, mock_validate):
+        cache.add(self.validator.lock_key, True)
+        timer = threading.Timer(
+            0.2,
+            cache.set,
+            args=(
+                self.validator.cache_key,
+                {'error': 'Lock holder error', 'fresh_until': time.time() + 60},
+            ),
+        )
+        timer.start()
+
+        result = self.validator.get_error()
+        timer.join()
+
+        self.assertEqual(result, 'Lock holder error')
+        mock_validate.assert_not_called()
+
+    @override_settings(IBAN_VALIDATION_LOCK_WAIT_TIMEOUT=0.1)
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_concurrent_miss_wait_timeout(self, mock_validate):
+        cache.add(self.validator.lock_key, True)
+
+        with self.assertRaisesRegex(
+            RuntimeError, 'Validation service is unavailable.'
+        ):
+            self.validator.get_error()
+
+        mock_validate.assert_not_called()
+
+    @patch('apps.refunds.utils.APINinjasClient.avalidate_iban')
+    async def test_aget_error_concurrent_misses_are_coalesced(
+        self, mock_validate
+    ):
+        async def validate_iban(iban):
+            await asyncio.sleep(0.1)
+            return {'valid': True, 'country': 'DE'}
+
+        mock_validate.side_effect = validate_iban
+        validators = [IBANValidator(self.valid_iban, 'DE') for _ in range(5)]
+
+        results = await asyncio.gather(
+            *(validator.aget_error() for validator in validators)
+        )
+
+        self.assertEqual(results, [None] * 5)
+        mock_validate.assert_awaited_once()
+
+    def clear_cache(self):
+        cache.clear()
+        TieredCache.clear_all_local()
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_result_is_stored(self, mock_validate):
+        mock_validate.return_value = {'valid': False}
+
+        self.validator.get_error()
+
+        verification = IBANVerification.objects.get()
+        self.assertEqual(verification.iban_hash, self.validator.iban_hash)
+        self.assertEqual(verification.country, 'DE')
+        self.assertFalse(verification.is_valid)
+        self.assertEqual(
+            verification.error, 'Provided number is not a valid IBAN.'
+        )
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_stored_result_is_used_after_cache_loss(self, mock_validate):
+        mock_validate.return_value = {'valid': True, 'country': 'DE'}
+        self.validator.get_error()
+        self.clear_cache()
+        stats_before = IBANValidator.get_stats()
+
+        self.assertIsNone(IBANValidator(self.valid_iban, 'DE').get_error())
+
+        mock_validate.assert_called_once()
+        self.assertEqual(
+            IBANValidator.get_stats()['store_hits'],
+            stats_before['store_hits'] + 1,
+        )
+        self.assertIsNotNone(cache.get(self.validator.cache_key))
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_expired_stored_result_is_ignored(self, mock_validate):
+        mock_validate.return_value = {'valid': True, 'country': 'DE'}
+        IBANVerification.objects.create(
+            iban_hash=self.validator.iban_hash,
+            country='DE',
+            is_valid=False,
+            error='Stored error',
+            verified_at=timezone.now() - timedelta(days=365),
+        )
+
+        self.assertIsNone(self.validator.get_error())
+        self.assertTrue(IBANVerification.objects.get().is_valid)
+
+    @patch('apps.refunds.utils.APINinjasClient.avalidate_iban')
+    async def test_aget_error_uses_stored_result(self, mock_validate):
+        await IBANVerification.objects.acreate(
+            iban_hash=self.validator.iban_hash,
+            country='DE',
+            is_valid=False,
+            error='Stored error',
+            verified_at=timezone.now(),
+        )
+
+        self.assertEqual(await self.validator.aget_error(), 'Stored error')
+        mock_validate.assert_not_called()
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_get_errors_uses_store_in_bulk(self, mock_validate):
+        mock_validate.return_value = {'valid': True, 'country': 'GB'}
+        IBANVerification.objects.create(
+            iban_hash=self.validator.iban_hash,
+            country='DE',
+            is_valid=True,
+            verified_at=timezone.now(),
+        )
+        other_validator = IBANValidator('GB82WEST12345698765432', 'GB')
+
+        with self.assertNumQueries(2):
+            errors = IBANValidator.get_errors(
+                [self.validator, other_validator], max_workers=2
+            )
+
+        self.assertEqual(
+            errors,
+            {self.validator.cache_key: None, other_validator.cache_key: None},
+        )
+        mock_validate.assert_called_once_with('GB82WEST12345698765432')
+        self.assertEqual(IBANVerification.objects.count(), 2)
+
+    def test_get_cached_error_uses_store(self):
+        IBANVerification.objects.create(
+            iban_hash=self.validator.iban_hash,
+            country='DE',
+            is_valid=True,
+            verified_at=timezone.now(),
+        )
+
+        self.assertIsNone(self.validator.get_cached_error())
+        self.assertEqual(
+            IBANValidator('GB82WEST12345698765432', 'GB').get_cached_error(),
+            IBANValidator.NOT_CACHED,
+        )
+
     def test_cache_key_generation(self):
         validator1 = IBANValidator('iban1', 'DE')
         validator2 = IBANValidator('iban1', 'DE')
@@ -59,10 +373,180 @@ class IBANValidatorTests(FlushRedisDBTestMixin, TestCase):
         self.assertEqual(validator1.cache_key, validator2.cache_key)
         self.assertNotEqual(validator1.cache_key, validator3.cache_key)
 
+    def test_cache_key_is_canonical(self):
+        validator = IBANValidator('de89 3704 0044 0532 0130 00', ' de ')
+
+        self.assertEqual(validator.iban, self.valid_iban)
+        self.assertEqual(validator.country, 'DE')
+        self.assertEqual(validator.cache_key, self.validator.cache_key)
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_canonical_inputs_share_cached_result(self, mock_validate):
+        mock_validate.return_value = {'valid': True, 'country': 'DE'}
+
+        self.assertIsNone(
+            IBANValidator('DE89 3704 0044 0532 0130 00', 'de').get_error()
+        )
+        self.assertIsNone(self.validator.get_error())
+        mock_validate.assert_called_once_with(self.valid_iban)
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_stats(self, mock_validate):
+        stats_before = IBANValidator.get_stats()
+        mock_validate.return_value = {'valid': True, 'country': 'DE'}
+        self.validator.get_error()
+        self.validator.get_error()
+        IBANValidator('DE89370400440532013001', 'DE').get_error()
+        mock_validate.return_value = None
+        with self.assertRaises(RuntimeError):
+            IBANValidator('GB82WEST12345698765432', 'GB').get_error()
+
+        stats = IBANValidator.get_stats()
+        for name, expected_change in [
+            ('hits', 1),
+            ('misses', 2),
+            ('local_errors', 1),
+            ('upstream_valid', 1),
+            ('upstream_invalid', 0),
+            ('upstream_unavailable', 1),
+        ]:
+            with self.subTest(name=name):
+                self.assertEqual(
+                    stats[name] - stats_before[name], expected_change
+                )
+        self.assertIn('local_cache', stats)
+
     @patch('django.core.cache.cache.set')
     def test_cache_valid_iban(self, mock_cache_set):
         self.validator.cache_valid_iban()
-        mock_cache_set.assert_called_once_with(self.validator.cache_key, None)
+        mock_cache_set.assert_called_once_with(
+            self.validator.cache_key, {'error': None, 'fresh_until': ANY}, ANY
+        )
+
+    @override_settings(
+        IBAN_VALIDATION_VALID_TTL=1000,
+        IBAN_VALIDATION_INVALID_TTL=100,
+        IBAN_VALIDATION_STALE_TTL=500,
+        IBAN_VALIDATION_TTL_JITTER=0.1,
+    )
+    @patch('django.core.cache.cache.set')
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_valid_and_invalid_results_ttls(self, mock_validate, mock_set):
+        mock_validate.return_value = {'valid': True, 'country': 'DE'}
+        self.validator.get_error()
+        mock_validate.return_value = {'valid': False}
+        IBANValidator('GB82WEST12345698765432', 'GB').get_error()
+
+        (_, valid_entry, valid_timeout), (_, invalid_entry, invalid_timeout) = (
+            call.args for call in mock_set.call_args_list
+        )
+        now = time.time()
+        self.assertAlmostEqual(
+            valid_entry['fresh_until'] - now, 1000, delta=101
+        )
+        self.assertAlmostEqual(valid_timeout, 1500, delta=101)
+        self.assertAlmostEqual(
+            invalid_entry['fresh_until'] - now, 100, delta=11
+        )
+        self.assertAlmostEqual(invalid_timeout, 600, delta=11)
+
+    @patch('apps.refunds.utils.threading.Thread')
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_stale_result_is_served_and_refreshed(
+        self, mock_validate, mock_thread
+    ):
+        mock_validate.return_value = {'valid': False}
+        cache.set(
+            self.validator.cache_key,
+            {'error': None, 'fresh_until': time.time() - 1},
+        )
+
+        self.assertIsNone(self.validator.get_error())
+        mock_validate.assert_not_called()
+        mock_thread.assert_called_once_with(
+            target=self.validator._refresh_in_thread, daemon=True
+        )
+
+        self.validator._refresh()
+        self.assertEqual(
+            self.validator.get_error(), 'Provided number is not a valid IBAN.'
+        )
+        self.assertIsNone(cache.get(self.validator.lock_key))
+
+    @patch('apps.refunds.utils.threading.Thread')
+    def test_stale_result_is_refreshed_once(self, mock_thread):
+        cache.set(
+            self.validator.cache_key,
+            {'error': None, 'fresh_until': time.time() - 1},
+        )
+
+        self.validator.get_error()
+        self.validator.get_error()
+
+        mock_thread.assert_called_once()
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_stale_result_kept_when_service_unavailable(self, mock_validate):
+        mock_validate.return_value = None
+        stale_entry = {'error': None, 'fresh_until': time.time() - 1}
+        cache.set(self.validator.cache_key, stale_entry)
+
+        self.validator._refresh()
+
+        self.assertEqual(cache.get(self.validator.cache_key), stale_entry)
+        self.assertIsNone(cache.get(self.validator.lock_key))
+
+    @patch('apps.refunds.utils.threading.Thread')
+    @patch('apps.refunds.utils.APINinjasClient.avalidate_iban')
+    async def test_aget_error_serves_stale_result(
+        self, mock_validate, mock_thread
+    ):
+        await cache.aset(
+            self.validator.cache_key,
+            {'error': 'Stale error', 'fresh_until': time.time() - 1},
+        )
+
+        self.assertEqual(await self.validator.aget_error(), 'Stale error')
+        mock_validate.assert_not_called()
+        mock_thread.assert_called_once()
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_repeated_validation_uses_local_cache(self, mock_validate):
+        mock_validate.return_value = {'valid': True, 'country': 'DE'}
+        self.validator.get_error()
+
+        with patch('django.core.cache.cache.get') as mock_cache_get:
+            self.assertIsNone(IBANValidator(self.valid_iban, 'DE').get_error())
+
+        mock_cache_get.assert_not_called()
+
+    @patch('apps.refunds.utils.threading.Thread')
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_stale_local_result_refreshed_from_shared_cache(
+        self, mock_validate, mock_thread
+    ):
+        iban_results_cache.set_local(
+            self.validator.cache_key,
+            {'error': None, 'fresh_until': time.time() - 1},
+        )
+        cache.set(
+            self.validator.cache_key,
+            {'error': 'Shared error', 'fresh_until': time.time() + 60},
+        )
+
+        self.assertIsNone(self.validator.get_error())
+        self.validator._refresh()
+
+        self.assertEqual(self.validator.get_error(), 'Shared error')
+        mock_validate.assert_not_called()
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_legacy_cache_value_is_ignored(self, mock_validate):
+        mock_validate.return_value = {'valid': True, 'country': 'DE'}
+        cache.set(self.validator.cache_key, 'Legacy error')
+
+        self.assertIsNone(self.validator.get_error())
+        mock_validate.assert_called_once()
 
     def test_country_case_insensitive(self):
         validator = IBANValidator(self.valid_iban, 'de')
@@ -0,0 +1,108 @@
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase
+
+from apps.core.mixins import FlushRedisDBTestMixin
+from apps.refunds.enums import RefundReason
+from apps.refunds.models import RefundRequest
+
+
+class VerifyIBANsCommandTests(FlushRedisDBTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username='testuser',
+            password='testpass123',
+            first_name='John',
+            email='john@example.com',
+        )
+        cls.refund_data = {
+            'user': cls.user,
+            'order_number': 'ORD123',
+            'order_date': '2024-03-10',
+            'products': 'Test Product',
+            'reason': RefundReason.WRONG_PRODUCT,
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'phone_number': '+48123456789',
+            'email': 'john@example.com',
+            'address': 'Test Street 123',
+            'postal_code': '12345',
+            'city': 'Test City',
+            'country': 'DE',
+            'iban': 'DE89370400440532013000',
+            'bank_name': 'Test Bank',
+            'account_type': 'private',
+        }
+
+    def call_command(self, *args):
+        stdout = StringIO()
+        call_command('verify_ibans', '--once', *args, stdout=stdout)
+        return stdout.getvalue()
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_valid_ibans_are_verified(self, mock_validate):
+        mock_validate.return_value = {'valid': True, 'country': 'DE'}
+        for _ in range(3):
+            RefundRequest.objects.create(**self.refund_data)
+
+        output = self.call_command('--batch-size', '2')
+
+        self.assertFalse(
+            RefundRequest.objects.filter(iban_verified=False).exists()
+        )
+        mock_validate.assert_called_once()
+        self.assertIn('Verified: 2', output)
+        self.assertIn('Verified: 1', output)
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_invalid_iban_is_reported(self, mock_validate):
+        mock_validate.return_value = {'valid': False}
+        refund = RefundRequest.objects.create(**self.refund_data)
+
+        self.call_command()
+
+        refund.refresh_from_db()
+        self.assertFalse(refund.iban_verified)
+        self.assertEqual(
+            refund.iban_verification_error,
+            'Provided number is not a valid IBAN.',
+        )
+        # The email is sent by the outbox worker
+        self.assertEqual(len(mail.outbox), 0)
+        call_command(
+            'send_emails', '--once', '--concurrency', '1', stdout=StringIO()
+        )
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['john@example.com'])
+        self.assertIn(f'#{refund.id}', mail.outbox[0].subject)
+        self.assertEqual(refund.iban_verification_failed_emails.count(), 1)
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_failed_ibans_are_not_reverified(self, mock_validate):
+        RefundRequest.objects.create(
+            **self.refund_data,
+            iban_verification_error='Provided number is not a valid IBAN.',
+        )
+
+        self.call_command()
+
+        mock_validate.assert_not_called()
+        self.assertEqual(len(mail.outbox), 0)
+
+    @patch('apps.refunds.utils.APINinjasClient.validate_iban')
+    def test_unavailable_ibans_stay_queued(self, mock_validate):
+        mock_validate.return_value = None
+        refund = RefundRequest.objects.create(**self.refund_data)
+
+        output = self.call_command()
+
+        refund.refresh_from_db()
+        self.assertFalse(refund.iban_verified)
+        self.assertEqual(refund.iban_verification_error, '')
+        self.assertIn('unavailable: 1', output)
+        self.assertEqual(len(mail.outbox), 0)
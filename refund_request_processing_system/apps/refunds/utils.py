@@ -1,47 +1,592 @@
+import asyncio
 import hashlib
+import random
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
 
+from django.conf import settings
 from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Q
+from django.utils import timezone
 
+from apps.core.cache import TieredCache
 from apps.refunds.clients import APINinjasClient
+from apps.refunds.iban import (
+    COUNTRY_MISMATCH_ERROR,
+    INVALID_IBAN_ERROR,
+    LocalIBANValidator,
+    canonicalize_country,
+    canonicalize_iban,
+)
+from apps.refunds.models import IBANVerification, RefundRequest
+
+SERVICE_UNAVAILABLE_ERROR = 'Validation service is unavailable.'
+
+iban_results_cache = TieredCache(cache, 'iban-validation')
+
+
+class IBANValidationStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+
+    def increment(self, name):
+        with self.lock:
+            self.counts[name] += 1
+
+    def as_dict(self):
+        with self.lock:
+            stats = {
+                name: self.counts[name]
+                for name in (
+                    'local_errors',
+                    'hits',
+                    'stale_hits',
+                    'coalesced',
+                    'misses',
+                    'store_hits',
+                    'upstream_valid',
+                    'upstream_invalid',
+                    'upstream_unavailable',
+                )
+            }
+
+        lookups = sum(
+            stats[name]
+            for name in ('hits', 'stale_hits', 'coalesced', 'misses')
+        )
+        stats['hit_ratio'] = (
+            (lookups - stats['misses']) / lookups if lookups else None
+        )
+        return stats
 
 
 class IBANValidator:
+    UNAVAILABLE = '_UNAVAILABLE'
     NOT_CACHED = '_NOT_CACHED'
+    stats = IBANValidationStats()
 
     def __init__(self, iban, country):
-        self.iban = iban
-        self.country = country
+        self.iban = canonicalize_iban(iban)
+        self.country = canonicalize_country(country)
+        self.used_fallback = False
+        # Unset when a batch of validators uses the store in bulk
+        self.use_store = True
+        self.validated_upstream = False
+
+        self.iban_hash = hashlib.sha256(self.iban.encode()).hexdigest()
+        self.cache_key = hashlib.md5(
+            f'{self.iban}-{self.country}'.encode()
+        ).hexdigest()
+        self.lock_key = f'{self.cache_key}-lock'
 
-        self.cache_key = hashlib.md5(f'{iban}-{country}'.encode()).hexdigest()
+    @classmethod
+    def get_stats(cls):
+        return cls.stats.as_dict() | {
+            'local_cache': iban_results_cache.get_stats()
+        }
 
     def get_error(self):
-        if (
-            cached_result := cache.get(self.cache_key, self.NOT_CACHED)
-        ) is not self.NOT_CACHED:
-            return cached_result
+        if error := self._get_local_validation_error():
+            return error
+
+        # Only the caller holding the lock asks the validation service, while
+        # the others wait for its result to be cached
+        wait_deadline = (
+            time.monotonic() + settings.IBAN_VALIDATION_LOCK_WAIT_TIMEOUT
+        )
+        waited = False
+        while True:
+            if cache_entry := self._unpack_cache_entry(
+                iban_results_cache.get(self.cache_key)
+            ):
+                self._record_hit(cache_entry, waited)
+                if self._is_stale(cache_entry):
+                    self._refresh_in_background()
+                return cache_entry['error']
+
+            if cache.add(
+                self.lock_key, True, settings.IBAN_VALIDATION_LOCK_TIMEOUT
+            ):
+                self.stats.increment('misses')
+                try:
+                    return self._validate_and_cache()
+                finally:
+                    cache.delete(self.lock_key)
+
+            if time.monotonic() >= wait_deadline:
+                raise RuntimeError(SERVICE_UNAVAILABLE_ERROR)
+
+            waited = True
+            time.sleep(settings.IBAN_VALIDATION_LOCK_POLL_INTERVAL)
+
+    async def aget_error(self):
+        if error := self._get_local_validation_error():
+            return error
+
+        wait_deadline = (
+            time.monotonic() + settings.IBAN_VALIDATION_LOCK_WAIT_TIMEOUT
+        )
+        waited = False
+        while True:
+            if cache_entry := self._unpack_cache_entry(
+                await iban_results_cache.aget(self.cache_key)
+            ):
+                self._record_hit(cache_entry, waited)
+                if self._is_stale(cache_entry):
+                    await self._arefresh_in_background()
+                return cache_entry['error']
+
+            if await cache.aadd(
+                self.lock_key, True, settings.IBAN_VALIDATION_LOCK_TIMEOUT
+            ):
+                self.stats.increment('misses')
+                try:
+                    return await self._avalidate_and_cache()
+                finally:
+                    await cache.adelete(self.lock_key)
+
+            if time.monotonic() >= wait_deadline:
+                raise RuntimeError(SERVICE_UNAVAILABLE_ERROR)
+
+            waited = True
+            await asyncio.sleep(settings.IBAN_VALIDATION_LOCK_POLL_INTERVAL)
+
+    @classmethod
+    def get_errors(cls, validators, max_workers):
+        # Returns a mapping of cache keys to errors (or UNAVAILABLE)
+        results, pending = cls._group_validators(validators)
+
+        cached_errors, stale_validators = cls._pop_cached_errors(
+            pending, iban_results_cache.get_many(pending.keys())
+        )
+        for validator in stale_validators:
+            validator._refresh_in_background()
+
+        stored_errors = cls._get_stored_errors(pending.values())
+        for cache_key, error in stored_errors.items():
+            pending.pop(cache_key)._use_stored_error(error)
+
+        def get_error(validator):
+            validator.use_store = False
+            try:
+                return validator._get_batch_error(validator.get_error())
+            except RuntimeError:
+                return cls.UNAVAILABLE
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            errors = dict(
+                zip(pending.keys(), executor.map(get_error, pending.values()))
+            )
+
+        cls._store_errors(pending.values(), errors)
+        return results | cached_errors | stored_errors | errors
+
+    @classmethod
+    async def aget_errors(cls, validators, max_concurrency):
+        # Same as get_errors, with upstream calls made concurrently
+        results, pending = cls._group_validators(validators)
+
+        cached_errors, stale_validators = cls._pop_cached_errors(
+            pending, await iban_results_cache.aget_many(pending.keys())
+        )
+        for validator in stale_validators:
+            await validator._arefresh_in_background()
+
+        stored_errors = await cls._aget_stored_errors(pending.values())
+        for cache_key, error in stored_errors.items():
+            await pending.pop(cache_key)._ause_stored_error(error)
+
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def get_error(validator):
+            validator.use_store = False
+            async with semaphore:
+                try:
+                    return validator._get_batch_error(
+                        await validator.aget_error()
+                    )
+                except RuntimeError:
+                    return cls.UNAVAILABLE
+
+        errors = dict(
+            zip(
+                pending.keys(),
+                await asyncio.gather(
+                    *(get_error(validator) for validator in pending.values())
+                ),
+            )
+        )
+
+        await cls._astore_errors(pending.values(), errors)
+        return results | cached_errors | stored_errors | errors
+
+    @classmethod
+    def _group_validators(cls, validators):
+        results = {}
+        pending = {}
+        for validator in validators:
+            if validator.cache_key in results or validator.cache_key in pending:
+                continue
+
+            if error := validator._get_local_validation_error():
+                results[validator.cache_key] = error
+            else:
+                pending[validator.cache_key] = validator
+
+        return results, pending
+
+    @classmethod
+    def _pop_cached_errors(cls, pending, cached_results):
+        errors = {}
+        stale_validators = []
+        for cache_key, cache_entry in cached_results.items():
+            if not (cache_entry := cls._unpack_cache_entry(cache_entry)):
+                continue
+
+            validator = pending.pop(cache_key)
+            validator._record_hit(cache_entry, waited=False)
+            if cls._is_stale(cache_entry):
+                stale_validators.append(validator)
+            errors[cache_key] = cache_entry['error']
+
+        return errors, stale_validators
+
+    def _get_batch_error(self, error):
+        # IBANs accepted by the fallback are not reported as valid in batches
+        return self.UNAVAILABLE if self.used_fallback else error
+
+    def get_cached_error(self):
+        # Returns NOT_CACHED instead of calling the service on a cache miss
+        if error := self._get_local_validation_error():
+            return error
+
+        if cache_entry := self._unpack_cache_entry(
+            iban_results_cache.get(self.cache_key)
+        ):
+            self._record_hit(cache_entry, waited=False)
+            if self._is_stale(cache_entry):
+                self._refresh_in_background()
+            return cache_entry['error']
+
+        self.stats.increment('misses')
+        stored_errors = self._get_stored_errors([self])
+        if self.cache_key in stored_errors:
+            return self._use_stored_error(stored_errors[self.cache_key])
+
+        return self.NOT_CACHED
+
+    def cache_valid_iban(self):
+        self._cache_result(None)
+
+    def _record_hit(self, cache_entry, waited):
+        if waited:
+            self.stats.increment('coalesced')
+        elif self._is_stale(cache_entry):
+            self.stats.increment('stale_hits')
+        else:
+            self.stats.increment('hits')
+
+    @staticmethod
+    def _unpack_cache_entry(cache_entry):
+        # Anything else is treated as a cache miss
+        if isinstance(cache_entry, dict) and 'fresh_until' in cache_entry:
+            return cache_entry
+        return None
+
+    @staticmethod
+    def _is_stale(cache_entry):
+        return cache_entry['fresh_until'] <= time.time()
+
+    def _get_cache_entry(self, error):
+        fresh_ttl = (
+            settings.IBAN_VALIDATION_VALID_TTL
+            if error is None
+            else settings.IBAN_VALIDATION_INVALID_TTL
+        )
+        jitter = settings.IBAN_VALIDATION_TTL_JITTER
+        fresh_ttl *= random.uniform(1 - jitter, 1 + jitter)
+
+        cache_entry = {'error': error, 'fresh_until': time.time() + fresh_ttl}
+        return cache_entry, int(fresh_ttl + settings.IBAN_VALIDATION_STALE_TTL)
+
+    def _cache_result(self, error):
+        cache_entry, timeout = self._get_cache_entry(error)
+        iban_results_cache.set(self.cache_key, cache_entry, timeout)
+
+    async def _acache_result(self, error):
+        cache_entry, timeout = self._get_cache_entry(error)
+        await iban_results_cache.aset(self.cache_key, cache_entry, timeout)
+
+    def _refresh_in_background(self):
+        if cache.add(
+            self.lock_key, True, settings.IBAN_VALIDATION_LOCK_TIMEOUT
+        ):
+            threading.Thread(
+                target=self._refresh_in_thread, daemon=True
+            ).start()
+
+    async def _arefresh_in_background(self):
+        # A thread outlives event loops created for a single request
+        if await cache.aadd(
+            self.lock_key, True, settings.IBAN_VALIDATION_LOCK_TIMEOUT
+        ):
+            threading.Thread(
+                target=self._refresh_in_thread, daemon=True
+            ).start()
+
+    def _refresh_in_thread(self):
+        try:
+            self._refresh()
+        finally:
+            connections.close_all()
+
+    def _refresh(self):
+        try:
+            # The shared entry may have been refreshed by another process
+            cache_entry = self._unpack_cache_entry(cache.get(self.cache_key))
+            if cache_entry and not self._is_stale(cache_entry):
+                iban_results_cache.set_local(self.cache_key, cache_entry)
+            else:
+                self._validate_and_cache()
+        except RuntimeError:
+            # The stale result is served until the service is back
+            pass
+        finally:
+            cache.delete(self.lock_key)
+
+    def _get_local_validation_error(self):
+        error = LocalIBANValidator(self.iban, self.country).get_error()
+        if error:
+            self.stats.increment('local_errors')
+        return error
+
+    def _validate_and_cache(self):
+        if self.use_store:
+            stored_errors = self._get_stored_errors([self])
+            if self.cache_key in stored_errors:
+                return self._use_stored_error(stored_errors[self.cache_key])
 
         validation_response = self._get_iban_validation_response()
         if not validation_response:
-            raise RuntimeError('Validation service is unavailable.')
+            return self._get_fallback_error()
 
         result = self._get_external_validation_error(validation_response)
-        cache.set(self.cache_key, result)
+        self.validated_upstream = True
+        self._record_upstream_result(result)
+        self._cache_result(result)
+        if self.use_store:
+            self._store_errors([self], {self.cache_key: result})
 
         return result
 
-    def cache_valid_iban(self):
-        cache.set(self.cache_key, None)
+    async def _avalidate_and_cache(self):
+        if self.use_store:
+            stored_errors = await self._aget_stored_errors([self])
+            if self.cache_key in stored_errors:
+                return await self._ause_stored_error(
+                    stored_errors[self.cache_key]
+                )
+
+        validation_response = await self._aget_iban_validation_response()
+        if not validation_response:
+            return self._get_fallback_error()
+
+        result = self._get_external_validation_error(validation_response)
+        self.validated_upstream = True
+        self._record_upstream_result(result)
+        await self._acache_result(result)
+        if self.use_store:
+            await self._astore_errors([self], {self.cache_key: result})
+
+        return result
+
+    @classmethod
+    def _get_stored_queryset(cls, validators):
+        now = timezone.now()
+        return IBANVerification.objects.filter(
+            Q(
+                is_valid=True,
+                verified_at__gte=now
+                - timedelta(seconds=settings.IBAN_VERIFICATION_STORE_VALID_TTL),
+            )
+            | Q(
+                is_valid=False,
+                verified_at__gte=now
+                - timedelta(
+                    seconds=settings.IBAN_VERIFICATION_STORE_INVALID_TTL
+                ),
+            ),
+            iban_hash__in={validator.iban_hash for validator in validators},
+        )
+
+    @classmethod
+    def _map_stored_errors(cls, validators, verifications):
+        validators_by_key = {
+            (validator.iban_hash, validator.country): validator
+            for validator in validators
+        }
+        stored_errors = {}
+        for verification in verifications:
+            validator = validators_by_key.get(
+                (verification.iban_hash, verification.country)
+            )
+            if validator is not None:
+                stored_errors[validator.cache_key] = verification.error or None
+        return stored_errors
+
+    @classmethod
+    def _get_stored_errors(cls, validators):
+        validators = list(validators)
+        if not validators:
+            return {}
+
+        return cls._map_stored_errors(
+            validators, cls._get_stored_queryset(validators)
+        )
+
+    @classmethod
+    async def _aget_stored_errors(cls, validators):
+        validators = list(validators)
+        if not validators:
+            return {}
+
+        verifications = [
+            verification
+            async for verification in cls._get_stored_queryset(validators)
+        ]
+        return cls._map_stored_errors(validators, verifications)
+
+    def _use_stored_error(self, error):
+        self.stats.increment('store_hits')
+        self._cache_result(error)
+        return error
+
+    async def _ause_stored_error(self, error):
+        self.stats.increment('store_hits')
+        await self._acache_result(error)
+        return error
+
+    @classmethod
+    def _get_store_objects(cls, validators, errors):
+        verified_at = timezone.now()
+        return [
+            IBANVerification(
+                iban_hash=validator.iban_hash,
+                country=validator.country,
+                is_valid=errors[validator.cache_key] is None,
+                error=errors[validator.cache_key] or '',
+                verified_at=verified_at,
+            )
+            for validator in validators
+            if validator.validated_upstream
+            and errors[validator.cache_key] != cls.UNAVAILABLE
+        ]
+
+    @classmethod
+    def _store_errors(cls, validators, errors):
+        if verifications := cls._get_store_objects(validators, errors):
+            IBANVerification.objects.bulk_create(
+                verifications, **cls._get_store_upsert_kwargs()
+            )
+
+    @classmethod
+    async def _astore_errors(cls, validators, errors):
+        if verifications := cls._get_store_objects(validators, errors):
+            await IBANVerification.objects.abulk_create(
+                verifications, **cls._get_store_upsert_kwargs()
+            )
+
+    @staticmethod
+    def _get_store_upsert_kwargs():
+        return {
+            'update_conflicts': True,
+            'unique_fields': ['iban_hash', 'country'],
+            'update_fields': ['is_valid', 'error', 'verified_at'],
+        }
+
+    def _record_upstream_result(self, result):
+        self.stats.increment(
+            'upstream_valid' if result is None else 'upstream_invalid'
+        )
+
+    def _get_fallback_error(self):
+        self.stats.increment('upstream_unavailable')
+        # Results accepted by the fallback are not cached
+        if settings.IBAN_VALIDATION_FALLBACK == 'local':
+            self.used_fallback = True
+            return None
+
+        raise RuntimeError(SERVICE_UNAVAILABLE_ERROR)
 
     def _get_iban_validation_response(self):
         client = APINinjasClient()
         return client.validate_iban(self.iban)
 
+    async def _aget_iban_validation_response(self):
+        client = APINinjasClient()
+        return await client.avalidate_iban(self.iban)
+
     def _get_external_validation_error(self, validation_response):
         if not validation_response.get('valid'):
-            return 'Provided number is not a valid IBAN.'
+            return INVALID_IBAN_ERROR
 
         iban_country = validation_response.get('country')
         if iban_country.lower() != self.country.lower():
-            return f'Provided IBAN number comes from {iban_country}, while {self.country} was provided.'
+            return COUNTRY_MISMATCH_ERROR.format(
+                iban_country=iban_country, country=self.country
+            )
 
         return None
+
+
+def verify_refund_request_ibans(refund_requests):
+    # Returns ids of verified refund requests, errors by refund request id
+    # and ids of refund requests which couldn't be validated
+    validators = [
+        IBANValidator(refund_request.iban, refund_request.country)
+        for refund_request in refund_requests
+    ]
+    validation_errors = IBANValidator.get_errors(
+        validators, settings.IBAN_BATCH_MAX_CONCURRENCY
+    )
+
+    verified_ids = []
+    errors = {}
+    unavailable_ids = []
+    newly_failed_refund_requests = defaultdict(list)
+    for refund_request, validator in zip(refund_requests, validators):
+        error = validation_errors[validator.cache_key]
+        if error == IBANValidator.UNAVAILABLE:
+            unavailable_ids.append(refund_request.id)
+        elif error:
+            errors[refund_request.id] = error
+            if refund_request.iban_verification_error != error:
+                newly_failed_refund_requests[error].append(refund_request)
+        else:
+            verified_ids.append(refund_request.id)
+
+    if verified_ids:
+        RefundRequest.objects.filter(id__in=verified_ids).update(
+            iban_verified=True, iban_verification_error=''
+        )
+
+    for error, failed_refund_requests in newly_failed_refund_requests.items():
+        with transaction.atomic():
+            RefundRequest.objects.filter(
+                id__in=[
+                    refund_request.id
+                    for refund_request in failed_refund_requests
+                ]
+            ).update(iban_verification_error=error)
+            for refund_request in failed_refund_requests:
+                refund_request.iban_verification_error = error
+            RefundRequest.emit_iban_verification_failed_emails(
+                failed_refund_requests
+            )
+
+    return verified_ids, errors, unavailable_ids
@@ -1,15 +1,20 @@
+from adrf.views import APIView
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
 from django.views.generic import CreateView, DetailView, ListView
 from rest_framework import status
+from rest_framework.permissions import IsAdminUser
 from rest_framework.response import Response
-from rest_framework.views import APIView
 
 from apps.core.mixins import OnlyOwnedObjectsViewMixin
+from apps.core.paginator import EstimatedCountPaginator
+from apps.core.utils import is_asgi_request
 from apps.refunds.forms import RefundRequestForm
 from apps.refunds.models import RefundRequest
-from apps.refunds.serializers import IBANSerializer
-from apps.refunds.utils import IBANValidator
+from apps.refunds.serializers import IBANBatchSerializer, IBANSerializer
+from apps.refunds.utils import SERVICE_UNAVAILABLE_ERROR, IBANValidator
 
 
 class CreateRefundRequestView(LoginRequiredMixin, CreateView):
@@ -33,6 +38,7 @@ class RefundRequestListView(
     template_name = 'refunds/list.html'
     context_object_name = 'refund_requests'
     paginate_by = 10
+    paginator_class = EstimatedCountPaginator
 
 
 class RefundRequestDetailView(
@@ -44,13 +50,63 @@ class RefundRequestDetailView(
 
 
 class ValidateIBANView(APIView):
-    def post(self, request):
+    # Under WSGI every request runs in a new event loop, so the pooled sync
+    # client is used instead of the async one
+    async def post(self, request):
         serializer = IBANSerializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         data = serializer.validated_data
 
         try:
             validator = IBANValidator(**data)
-            return Response({'error': validator.get_error()})
+            if is_asgi_request(request):
+                error = await validator.aget_error()
+            else:
+                error = await sync_to_async(validator.get_error)()
+            return Response({'error': error})
         except RuntimeError as e:
             return Response({'error': str(e)}, status.HTTP_400_BAD_REQUEST)
+
+
+class ValidateIBANBatchView(APIView):
+    permission_classes = [IsAdminUser]
+
+    async def post(self, request):
+        serializer = IBANBatchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        items = serializer.validated_data['items']
+        validators = [IBANValidator(**item) for item in items]
+        if is_asgi_request(request):
+            errors = await IBANValidator.aget_errors(
+                validators, settings.IBAN_BATCH_MAX_CONCURRENCY
+            )
+        else:
+            errors = await sync_to_async(IBANValidator.get_errors)(
+                validators, settings.IBAN_BATCH_MAX_CONCURRENCY
+            )
+
+        return Response(
+            {
+                'results': [
+                    self.get_result(item, errors[validator.cache_key])
+                    for item, validator in zip(items, validators)
+                ]
+            }
+        )
+
+    def get_result(self, item, error):
+        if error == IBANValidator.UNAVAILABLE:
+            return {
+                'iban': item['iban'],
+                'country': item['country'],
+                'valid': None,
+                'error': SERVICE_UNAVAILABLE_ERROR,
+            }
+
+        return {
+            'iban': item['iban'],
+            'country': item['country'],
+            'valid': error is None,
+            'error': error,
+        }
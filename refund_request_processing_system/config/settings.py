@@ -22,12 +22,16 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'import_export',
     'apps.core',
     'apps.refunds',
 ]
 
+if DEBUG:
+    INSTALLED_APPS += ['apps.loadtest']
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -129,10 +133,97 @@ EMAIL_PORT = int(os.getenv('EMAIL_PORT', 25))
 
 DEFAULT_FROM_EMAIL = 'no-reply@example.com'
 
+# Messages per SMTP session
+EMAIL_SEND_BATCH_SIZE = int(os.getenv('EMAIL_SEND_BATCH_SIZE', 100))
+# Seconds, 0 sends an email for every status change
+REFUND_STATUS_CHANGE_DIGEST_WINDOW = int(
+    os.getenv('REFUND_STATUS_CHANGE_DIGEST_WINDOW', 0)
+)
+# Rendered email templates kept in memory, per template and shared context
+EMAIL_TEMPLATE_CACHE_SIZE = 256
+
+EMAIL_OUTBOX_BATCH_SIZE = int(os.getenv('EMAIL_OUTBOX_BATCH_SIZE', 100))
+EMAIL_OUTBOX_POLL_INTERVAL = int(os.getenv('EMAIL_OUTBOX_POLL_INTERVAL', 5))
+EMAIL_OUTBOX_CONCURRENCY = int(os.getenv('EMAIL_OUTBOX_CONCURRENCY', 4))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 5))
+EMAIL_OUTBOX_RETRY_BACKOFF = 60
+EMAIL_OUTBOX_CLAIM_TIMEOUT = 300
+# `options` are passed to django.core.mail.get_connection
+EMAIL_RELAYS = {
+    'default': {
+        'rate_per_minute': int(os.getenv('EMAIL_RATE_LIMIT_PER_MINUTE', 600)),
+        'burst': int(os.getenv('EMAIL_RATE_LIMIT_BURST', 100)),
+        'options': {},
+    },
+}
+
+PAGINATOR_EXACT_COUNT_THRESHOLD = int(
+    os.getenv('PAGINATOR_EXACT_COUNT_THRESHOLD', 100000)
+)
+
 LOGIN_REDIRECT_URL = reverse_lazy('refund_list')
 
 API_NINJAS_API_KEY = os.getenv('API_NINJAS_API_KEY')
-API_NINJAS_IBAN_VALIDATION_URL = 'https://api.api-ninjas.com/v1/iban'
+API_NINJAS_IBAN_VALIDATION_URL = os.getenv(
+    'API_NINJAS_IBAN_VALIDATION_URL', 'https://api.api-ninjas.com/v1/iban'
+)
+API_NINJAS_CONNECT_TIMEOUT = float(
+    os.getenv('API_NINJAS_CONNECT_TIMEOUT', 3.05)
+)
+API_NINJAS_READ_TIMEOUT = float(os.getenv('API_NINJAS_READ_TIMEOUT', 5))
+API_NINJAS_MAX_RETRIES = int(os.getenv('API_NINJAS_MAX_RETRIES', 2))
+API_NINJAS_RETRY_BACKOFF_FACTOR = float(
+    os.getenv('API_NINJAS_RETRY_BACKOFF_FACTOR', 0.2)
+)
+API_NINJAS_POOL_CONNECTIONS = int(os.getenv('API_NINJAS_POOL_CONNECTIONS', 1))
+API_NINJAS_POOL_MAXSIZE = int(os.getenv('API_NINJAS_POOL_MAXSIZE', 10))
+API_NINJAS_ASYNC_MAX_CONNECTIONS = int(
+    os.getenv('API_NINJAS_ASYNC_MAX_CONNECTIONS', 100)
+)
+API_NINJAS_CIRCUIT_BREAKER = {
+    'failure_rate_threshold': float(
+        os.getenv('API_NINJAS_CIRCUIT_BREAKER_FAILURE_RATE', 0.5)
+    ),
+    'slow_call_threshold': float(
+        os.getenv('API_NINJAS_CIRCUIT_BREAKER_SLOW_CALL_THRESHOLD', 3)
+    ),
+    'min_calls': int(os.getenv('API_NINJAS_CIRCUIT_BREAKER_MIN_CALLS', 10)),
+    'window': int(os.getenv('API_NINJAS_CIRCUIT_BREAKER_WINDOW', 60)),
+    'open_timeout': int(
+        os.getenv('API_NINJAS_CIRCUIT_BREAKER_OPEN_TIMEOUT', 30)
+    ),
+}
+
+# 'unverified' or 'local' (IBANs which passed the local validation are valid)
+IBAN_VALIDATION_FALLBACK = os.getenv('IBAN_VALIDATION_FALLBACK', 'unverified')
+
+# Stale results are served for IBAN_VALIDATION_STALE_TTL while being refreshed
+IBAN_VALIDATION_VALID_TTL = 24 * 3600
+IBAN_VALIDATION_INVALID_TTL = 3600
+IBAN_VALIDATION_STALE_TTL = 7 * 24 * 3600
+IBAN_VALIDATION_TTL_JITTER = 0.1
+
+# The lock timeout should exceed the longest upstream call, including retries
+IBAN_VALIDATION_LOCK_TIMEOUT = 30
+IBAN_VALIDATION_LOCK_WAIT_TIMEOUT = 10
+IBAN_VALIDATION_LOCK_POLL_INTERVAL = 0.05
+
+IBAN_VERIFICATION_STORE_VALID_TTL = 90 * 24 * 3600
+IBAN_VERIFICATION_STORE_INVALID_TTL = 30 * 24 * 3600
+
+# Uncached IBANs are saved as not verified and verified by `verify_ibans`
+IBAN_DEFERRED_VERIFICATION = bool(
+    int(os.getenv('IBAN_DEFERRED_VERIFICATION', 1))
+)
+IBAN_VERIFICATION_BATCH_SIZE = int(
+    os.getenv('IBAN_VERIFICATION_BATCH_SIZE', 100)
+)
+IBAN_VERIFICATION_POLL_INTERVAL = int(
+    os.getenv('IBAN_VERIFICATION_POLL_INTERVAL', 10)
+)
+
+IBAN_BATCH_MAX_SIZE = 1000
+IBAN_BATCH_MAX_CONCURRENCY = int(os.getenv('IBAN_BATCH_MAX_CONCURRENCY', 10))
 
 REDIS_HOSTNAME = os.getenv('REDIS_HOSTNAME', 'redis')
 REDIS_MAIN_DB = os.getenv('REDIS_MAIN_DB', 0)
@@ -145,4 +236,16 @@ REDIS_CACHE = {
 }
 CACHES = {'default': REDIS_CACHE}
 
+# In-process cache tier in front of Redis (see apps.core.cache.TieredCache)
+LOCAL_CACHE_MAX_SIZE = int(os.getenv('LOCAL_CACHE_MAX_SIZE', 1024))
+LOCAL_CACHE_TIMEOUT = int(os.getenv('LOCAL_CACHE_TIMEOUT', 60))
+LOCAL_CACHE_BROADCAST_INVALIDATIONS = bool(
+    int(os.getenv('LOCAL_CACHE_BROADCAST_INVALIDATIONS', 0))
+)
+
 IMPORT_EXPORT_FORMATS = [CSV]
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', 2000))
+EXPORT_BUFFER_SIZE = 64 * 1024
+EXPORT_ROOT = Path(os.getenv('EXPORT_ROOT', BASE_DIR / 'exports'))
+EXPORT_JOB_POLL_INTERVAL = int(os.getenv('EXPORT_JOB_POLL_INTERVAL', 5))
+EXPORT_JOB_TIMEOUT = 600
@@ -20,6 +20,7 @@ from apps.refunds.views import (
     CreateRefundRequestView,
     RefundRequestDetailView,
     RefundRequestListView,
+    ValidateIBANBatchView,
     ValidateIBANView,
 )
 
@@ -99,6 +100,11 @@ urlpatterns = [
     path(
         'api/validate-iban/', ValidateIBANView.as_view(), name='validate_iban'
     ),
+    path(
+        'api/validate-iban/batch/',
+        ValidateIBANBatchView.as_view(),
+        name='validate_iban_batch',
+    ),
 ]
 
 handler404 = handler_404